@@ -1,44 +1,63 @@
 import atexit
 import hashlib
+import os
 import threading
+import time
+from concurrent.futures import Executor
 from functools import partial
 from typing import Optional, Callable, Any, Tuple
 
 from .arm import Arm
 from .cache import AssignmentCache
 from .common import (
+    CoarseClock,
     LoadError,
     MissingFeatureError,
     NoAssignment,
     NoConfig,
     NoReload,
     SkipLog,
+    StickyTimeoutError,
     ValidationError,
     encode_json,
     simple_object,
     default_now,
     NowFn,
 )
-from .feature import Feature
+from .dispatch import SyncRunner
+from .feature import Feature, StickyTimeoutPolicy
+from .dedup import ExposureDeduper
 from .events import EventLogger
 from .log import (
+    AsyncNetworkLogger,
     DeferrableLogger,
+    FileLogger,
     NetworkLogger,
     ObjectLogger,
+    OverflowPolicy,
     PrintLogger,
+    RollupLogger,
+    SlowCallLogger,
     default_logger,
+    deferral_scope,
     log,
 )
 from .parse import load_config, parse_yaml, ConfigSource
+from .metrics import Metrics, MetricsWriter, Phase
 from .population import Population
 from .rand import seed
 from .rollout import Rollout
+from .sink import AssignmentSink, PendingAssignment
+from .spool import Spool
 from .value import CallType, Value
 from .variant import Variant
 
 
 StickyFn = Callable[[Feature, Any], Tuple[str, Any, int]]
 
+_OUTCOMES = {t: t.value for t in CallType}
+"""Metrics counter for each type of call (cheaper than the enum's `value`)."""
+
 
 class Alligater:
     """The Alligater object represents the universe of available features.
@@ -61,11 +80,18 @@ class Alligater:
         self,
         features: list[Feature] | dict[str, Feature] | None = None,
         yaml: ConfigSource | None = None,
-        logger: EventLogger = default_logger,
+        logger: EventLogger | None = default_logger,
         reload_interval: float = 0,
         sticky: StickyFn | None = None,
         loader_kwargs: dict | None = None,
         now: NowFn = default_now,
+        sync_executor: Executor | None = None,
+        sync_concurrency: int | None = None,
+        sticky_timeout: float | None = None,
+        sticky_timeout_policy: str | StickyTimeoutPolicy = StickyTimeoutPolicy.RAISE,
+        assignment_sink: AssignmentSink | None = None,
+        assignment_snapshot: str | None = None,
+        metrics: Metrics | None = None,
     ):
         """Create a new feature gater.
 
@@ -82,7 +108,29 @@ class Alligater:
             input entity. This will skip full evaluation.
             loader_kwargs - Arguments to pass to the config loader. See the
             method in `parse.py` for details.
-            now - Function to call to get the current time.
+            now - Function to call to get the current time. It's read once
+            per evaluation. For high throughput, consider a `CoarseClock`.
+            sync_executor - Optional executor to run synchronous callbacks
+            (the `sticky` fetcher and `functor` Variant values) in, so they
+            don't block the event loop.
+            sync_concurrency - Maximum number of synchronous callbacks to run
+            at once. Passing this without `sync_executor` creates a private
+            thread pool of this size.
+            sticky_timeout - Latency budget (in seconds) for the `sticky`
+            lookup. By default there is no budget. Can be overridden per
+            feature.
+            sticky_timeout_policy - What to do when the `sticky` lookup runs
+            out of time: raise, serve the default rollout, or evaluate as an
+            exposure-only call. See `StickyTimeoutPolicy`.
+            assignment_sink - Optional sink to persist new sticky assignments
+            in the background. Assignments stay pinned in the local cache
+            until the sink has written them.
+            assignment_snapshot - Optional path to a snapshot of the local
+            assignment cache. If the file exists it's loaded on startup, and
+            the cache is written back to it on `stop`. This avoids a thundering
+            herd on the `sticky` store after a deploy.
+            metrics - Optional metrics registry to record per-feature counters
+            and latencies in. See `stats`.
         """
         log.info("🐊 Loading alligater ...")
 
@@ -109,11 +157,34 @@ class Alligater:
         self._loader_kwargs = loader_kwargs if loader_kwargs else {}
         # Sticky assignment fetcher
         self._sticky = sticky
+        # Latency budget for the sticky fetcher and what to do when it's blown
+        self._sticky_timeout = sticky_timeout
+        self._sticky_timeout_policy = StickyTimeoutPolicy(sticky_timeout_policy)
         # Whether loader thread is stopped
         self._stopped = True
         # Background thread
         self._thread = None
         self._local_assignments = AssignmentCache()
+        # Path to snapshot the local assignment cache to
+        self._assignment_snapshot = assignment_snapshot
+        if assignment_snapshot and os.path.exists(assignment_snapshot):
+            try:
+                n = self._local_assignments.load(assignment_snapshot)
+                log.info("🧊 Loaded {} cached assignments".format(n))
+            except Exception as e:
+                log.error("😵 Failed to load assignment snapshot: {}".format(e))
+        # Write-behind persistence for new sticky assignments
+        self._assignment_sink = assignment_sink
+        if assignment_sink:
+            assignment_sink.bind(self._local_assignments)
+        # Runner for blocking callbacks (inline on the event loop if None)
+        self._sync_runner = (
+            SyncRunner(executor=sync_executor, max_concurrency=sync_concurrency)
+            if sync_executor or sync_concurrency
+            else None
+        )
+        # Per-feature counters and latency histograms
+        self._metrics = metrics
 
         # Start reloading. This will load one initial time on the main thread,
         # then (if `reload_interval` and `yaml` options are passed) will reload
@@ -162,6 +233,19 @@ class Alligater:
         Returns:
             Wrapped value of the variant to return.
         """
+        metrics = self._metrics
+        if metrics:
+            return await self._call_measured(
+                metrics, feature, entity, silent, deferred, now
+            )
+        return await self._call(feature, entity, silent, deferred, now)
+
+    async def _call(self, feature, entity, silent, deferred, now, timings=None):
+        """Evaluate an entity against the given feature.
+
+        See `__call__` for the arguments. If a `timings` dictionary is passed,
+        the time taken by each phase of the evaluation is recorded in it.
+        """
         logger = self._logger if not silent else None
         now_func = now if now else self._now
         value = await feature(
@@ -169,9 +253,14 @@ class Alligater:
             log=logger,
             sticky=self._sticky,
             assignment_cache=self._local_assignments,
+            assignment_sink=self._assignment_sink,
             gater=self,
             now=now_func,
+            sticky_timeout=self._sticky_timeout,
+            sticky_timeout_policy=self._sticky_timeout_policy,
+            timings=timings,
         )
+        start = time.perf_counter() if timings is not None else 0.0
         # Note that Logger implementations that aren't DeferrableLoggers
         # log immediately and calling `log` is just a no-op.
         if value.call_type == CallType.ASSIGNMENT:
@@ -180,15 +269,74 @@ class Alligater:
         # Log an exposure immediately unless it's deferred.
         if not deferred:
             value.log()
+            # Nothing will write the log again, so don't keep the record.
+            value.drop_log()
 
+        if timings is not None:
+            timings[Phase.LOG] = time.perf_counter() - start
         return value
 
+    async def _call_measured(self, metrics, feature, entity, silent, deferred, now):
+        """Evaluate an entity against the given feature and record metrics."""
+        fm = metrics.feature(feature.name)
+        timings: dict[str, float] = {}
+        outcome = "errors"
+        start = time.perf_counter()
+        try:
+            value = await self._call(feature, entity, silent, deferred, now, timings)
+            outcome = _OUTCOMES[value.call_type]
+            return value
+        finally:
+            timings[Phase.TOTAL] = time.perf_counter() - start
+            fm.observe(outcome, timings)
+
+    @property
+    def sync_runner(self) -> SyncRunner | None:
+        """Runner used to dispatch synchronous callbacks, if configured."""
+        return self._sync_runner
+
+    def stats(self) -> dict:
+        """Get a snapshot of the gater's instrumentation.
+
+        Returns:
+            Dictionary with the per-feature metrics (if enabled), and the
+            counters of the assignment cache, sink, sync runner, and logger
+            where they're available.
+        """
+        stats: dict[str, Any] = {"cache": self._local_assignments.stats()}
+        if self._metrics:
+            stats["features"] = self._metrics.snapshot()
+        if self._assignment_sink:
+            stats["sink"] = self._assignment_sink.stats()
+        if self._sync_runner:
+            stats["sync_runner"] = self._sync_runner.stats()
+        if self._logger and hasattr(self._logger, "stats"):
+            stats["logger"] = self._logger.stats()
+        return stats
+
     def stop(self):
         """Stop the background reloader."""
         # Make sure that the logger stops if it can.
         if self._logger and hasattr(self._logger, "stop"):
             self._logger.stop()
 
+        # Flush assignments that haven't been persisted yet.
+        if self._assignment_sink:
+            self._assignment_sink.stop()
+
+        if self._assignment_snapshot:
+            try:
+                n = self._local_assignments.dump(self._assignment_snapshot)
+                log.info("🧊 Saved {} cached assignments".format(n))
+            except Exception as e:
+                log.error("😵 Failed to save assignment snapshot: {}".format(e))
+
+        if self._sync_runner:
+            self._sync_runner.shutdown()
+
+        if self._metrics:
+            self._metrics.stop()
+
         # Stop internal loader thread if necessary.
         if self._stopped or not self._thread:
             return
@@ -291,10 +439,27 @@ __all__ = [
     "log",
     "encode_json",
     "simple_object",
+    "CoarseClock",
+    "Metrics",
+    "MetricsWriter",
+    "Phase",
     "DeferrableLogger",
+    "deferral_scope",
     "NetworkLogger",
+    "AsyncNetworkLogger",
+    "Spool",
+    "FileLogger",
+    "ExposureDeduper",
     "ObjectLogger",
+    "OverflowPolicy",
     "PrintLogger",
+    "RollupLogger",
+    "SlowCallLogger",
+    "SyncRunner",
+    "StickyTimeoutError",
+    "StickyTimeoutPolicy",
+    "AssignmentSink",
+    "PendingAssignment",
     "NoAssignment",
     "SkipLog",
     "CallType",
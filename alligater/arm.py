@@ -8,6 +8,8 @@ class Arm:
     name of a variant, which is the treatment this group will receive.
     """
 
+    __slots__ = ("variant_name", "weight")
+
     def __init__(self, variant_name, weight=None):
         """Create a new Arm representing the given variant.
 
@@ -1,39 +1,44 @@
+import os
+import pickle
+import sqlite3
 from threading import Lock
-from typing import TYPE_CHECKING, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Tuple
 from datetime import datetime
 
+from .common import EntityId, get_entity_id
+from .log import log
+
 if TYPE_CHECKING:
     from .feature import Feature
 
 
-EntityId = Tuple[str, str]
-"""Composite ID of an entity: class name and ID attribute."""
-
 CachedAssignment = Tuple[str, Any, datetime]
 """Cached variant name and value and assignment time."""
 
-AssignmentsCache = dict[str, dict[EntityId, CachedAssignment]]
-"""Dictionary containing assignments."""
-
+CacheEntry = Tuple[str, Any, datetime, bool, Optional[str]]
+"""Cached assignment plus whether it's pinned and the variant's fingerprint."""
 
-def _entity_id(entity: Any) -> EntityId:
-    """Get the ID from an entity.
+AssignmentsCache = dict[str, dict[EntityId, CacheEntry]]
+"""Dictionary containing assignments."""
 
-    Args:
-        entity - Anything with an ID
+_SNAPSHOT_SCHEMA = """
+CREATE TABLE assignments (
+    feature TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    entity_id BLOB NOT NULL,
+    variant TEXT NOT NULL,
+    value BLOB NOT NULL,
+    ts BLOB NOT NULL,
+    fingerprint TEXT
+)
+"""
+"""Table that cache snapshots are stored in."""
 
-    Returns:
-        Tuple with typename and ID.
-    """
-    entity_id = None
-    if hasattr(entity, "id"):
-        entity_id = entity.id
-    elif "id" in entity:
-        entity_id = entity["id"]
-    else:
-        entity_id = repr(entity_id)
+_SNAPSHOT_VERSION = 2
+"""Version of the snapshot schema, stored as the SQLite `user_version`.
 
-    return type(entity).__name__, entity_id
+Version 1 (stored as 0, the SQLite default) didn't have fingerprints.
+"""
 
 
 class AssignmentCache:
@@ -41,19 +46,44 @@ class AssignmentCache:
 
     Currently cache is unbounded since there is the life of the service is not
     long enough for it to matter, but could add TTL.
+
+    Entries can be "pinned," which means they are the only authoritative copy
+    of the assignment (e.g., it hasn't been persisted by the `AssignmentSink`
+    yet). Pinned entries survive `clear`.
+
+    Entries are tagged with the fingerprint of the variant they were assigned.
+    When a reload changes a feature, stale entries are handled lazily the next
+    time they're looked up: if the variant was removed, or it's nested and its
+    definition changed, the entry is dropped (so the entity is looked up or
+    evaluated again); if only a literal value changed, the entry is upgraded
+    to the new value. Entries for unchanged variants are kept as-is. Pinned
+    entries are never dropped or upgraded.
     """
 
     def __init__(self):
         self.cache = AssignmentsCache()
         self.lock = Lock()
+        self._invalidated = 0
+        self._upgraded = 0
 
     def clear(self):
-        """Clear the cache."""
+        """Clear the cache, except for pinned entries."""
         with self.lock:
-            self.cache.clear()
+            for name in list(self.cache):
+                pinned = {k: e for k, e in self.cache[name].items() if e[3]}
+                if pinned:
+                    self.cache[name] = pinned
+                else:
+                    del self.cache[name]
 
     def set(
-        self, feature: "Feature", entity: Any, variant: str, value: Any, ts: datetime
+        self,
+        feature: "Feature",
+        entity: Any,
+        variant: str,
+        value: Any,
+        ts: datetime,
+        pinned: bool = False,
     ):
         """Add a new item to the cache.
 
@@ -63,11 +93,38 @@ class AssignmentCache:
             variant - Name of variant to set
             value - Value of the variant to set
             ts - Timestamp of the assignment
+            pinned - Whether the entry is authoritative and must be kept
         """
+        v = feature.variants.get(variant)
+        fingerprint = v.fingerprint if v else None
         with self.lock:
             if feature.name not in self.cache:
                 self.cache[feature.name] = {}
-            self.cache[feature.name][_entity_id(entity)] = (variant, value, ts)
+            self.cache[feature.name][get_entity_id(entity)] = (
+                variant,
+                value,
+                ts,
+                pinned,
+                fingerprint,
+            )
+
+    def unpin(self, feature: "Feature", entity: Any, ts: datetime):
+        """Release a pinned entry so it's treated as a normal cache entry.
+
+        Nothing happens if the entry was replaced by a different assignment
+        since it was pinned.
+
+        Args:
+            feature - Feature to look up
+            entity - Entity to look up
+            ts - Timestamp of the pinned assignment
+        """
+        with self.lock:
+            entries = self.cache.get(feature.name, {})
+            key = get_entity_id(entity)
+            entry = entries.get(key)
+            if entry and entry[3] and entry[2] == ts:
+                entries[key] = (entry[0], entry[1], entry[2], False, entry[4])
 
     def get(self, feature: "Feature", entity: Any) -> Optional[CachedAssignment]:
         """Look up cached assignment.
@@ -79,5 +136,165 @@ class AssignmentCache:
         Returns:
             Tuple of cached variant name and value and ts, if it exists, or N
         """
+        key = get_entity_id(entity)
         with self.lock:
-            return self.cache.get(feature.name, {}).get(_entity_id(entity), None)
+            entries = self.cache.get(feature.name)
+            entry = entries.get(key) if entries else None
+            if not entry:
+                return None
+
+            variant_name, value, ts, pinned, fingerprint = entry
+            variant = feature.variants.get(variant_name)
+            if pinned or (variant and variant.fingerprint == fingerprint):
+                return variant_name, value, ts
+
+            # The feature was reloaded with a different definition of this
+            # variant (or without it) since the entry was cached.
+            if not variant or variant.is_nested:
+                del entries[key]
+                self._invalidated += 1
+                return None
+
+            entries[key] = (variant_name, variant.value, ts, False, variant.fingerprint)
+            self._upgraded += 1
+            return variant_name, variant.value, ts
+
+    def stats(self) -> dict:
+        """Get a snapshot of the cache's counters.
+
+        Returns:
+            Dictionary of counters.
+        """
+        with self.lock:
+            return {
+                "features": len(self.cache),
+                "entries": sum(len(e) for e in self.cache.values()),
+                "pinned": sum(e[3] for d in self.cache.values() for e in d.values()),
+                "invalidated": self._invalidated,
+                "upgraded": self._upgraded,
+            }
+
+    def dump(self, path: str) -> int:
+        """Write a snapshot of the cache to a SQLite file.
+
+        The snapshot is written to a temporary file and moved into place, so
+        `path` always contains a complete snapshot. The cache is only locked
+        while each feature's entries are being copied, not while writing.
+
+        Values and IDs are pickled; entries that can't be pickled are skipped.
+
+        Args:
+            path - File to write
+
+        Returns:
+            Number of entries written.
+        """
+        tmp = f"{path}.tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        with self.lock:
+            names = list(self.cache)
+
+        written = 0
+        conn = sqlite3.connect(tmp)
+        try:
+            conn.execute(_SNAPSHOT_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {_SNAPSHOT_VERSION}")
+            for name in names:
+                with self.lock:
+                    items = list(self.cache.get(name, {}).items())
+                cur = conn.executemany(
+                    "INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._snapshot_rows(name, items),
+                )
+                written += cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(tmp, path)
+        return written
+
+    def load(self, path: str, chunk_size: int = 10_000) -> int:
+        """Load entries from a snapshot written by `dump`.
+
+        Rows are read from the file in chunks, so the whole snapshot is never
+        held in memory at once. Entries that are already in the cache are
+        newer than the snapshot, so they are not overwritten.
+
+        Snapshots written with a different version of the schema are
+        discarded (with a warning), since their entries can't be validated
+        against the current variants.
+
+        Snapshots are unpickled, so only load files you trust!
+
+        Args:
+            path - Snapshot file to read
+            chunk_size - Number of rows to read at a time
+
+        Returns:
+            Number of entries loaded.
+        """
+        loaded = 0
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version != _SNAPSHOT_VERSION:
+                log.warning(
+                    "🧊 Discarding assignment snapshot {} with schema version {} "
+                    "(expected {})".format(path, version or 1, _SNAPSHOT_VERSION)
+                )
+                return 0
+            cur = conn.execute(
+                "SELECT feature, entity_type, entity_id, variant, value, ts, "
+                "fingerprint FROM assignments"
+            )
+            while rows := cur.fetchmany(chunk_size):
+                with self.lock:
+                    for name, etype, eid, variant, value, ts, fingerprint in rows:
+                        entries = self.cache.setdefault(name, {})
+                        key = (etype, pickle.loads(eid))
+                        if key in entries:
+                            continue
+                        entries[key] = (
+                            variant,
+                            pickle.loads(value),
+                            pickle.loads(ts),
+                            False,
+                            fingerprint,
+                        )
+                        loaded += 1
+        finally:
+            conn.close()
+        return loaded
+
+    def _snapshot_rows(
+        self, name: str, items: list[tuple[EntityId, CacheEntry]]
+    ) -> Iterator[tuple[str, str, bytes, str, bytes, bytes, Optional[str]]]:
+        """Serialize cache entries as snapshot rows.
+
+        Args:
+            name - Feature name
+            items - Entries for the feature
+
+        Returns:
+            Generator of rows.
+        """
+        for (etype, eid), (variant, value, ts, _, fingerprint) in items:
+            try:
+                yield (
+                    name,
+                    etype,
+                    pickle.dumps(eid),
+                    variant,
+                    pickle.dumps(value),
+                    pickle.dumps(ts),
+                    fingerprint,
+                )
+            except Exception as e:
+                log.warning(
+                    "🥒 Skipping {} assignment for {} in snapshot: {}".format(
+                        name, eid, e
+                    )
+                )
@@ -1,12 +1,16 @@
 import collections.abc
 import dataclasses
+import enum
 import json
-import uuid
-from datetime import date, datetime
-from typing import Any, Callable
+import operator
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as time_of_day
+from typing import Any, Callable, Tuple
 
-from crocodsl.common import utcnow
-from .rand import getrandbits
+from crocodsl.common import get_entity_field, utcnow
+from .rand import unique_int
 
 
 NowFn = Callable[[], datetime]
@@ -16,17 +20,94 @@ default_now: NowFn = utcnow
 """Default function to get the current time."""
 
 
+def freeze_now(now: NowFn) -> NowFn:
+    """Take a snapshot of the current time.
+
+    This is used to give everything in one evaluation the same timestamp, and
+    to avoid calling a slow `now` function over and over.
+
+    Args:
+        now - Function to get the current time
+
+    Returns:
+        Function that always returns the time at which this was called.
+    """
+    ts = now()
+    return lambda: ts
+
+
+class CoarseClock:
+    """Clock that only reads the time every so often.
+
+    Getting the time as a `datetime` is relatively slow. This clock reuses
+    the last reading until `resolution` seconds have passed (measured with the
+    much cheaper monotonic clock), so it can be used as the `now` function for
+    high-throughput deployments that don't need precise timestamps.
+    """
+
+    def __init__(self, resolution: float = 0.01, now: NowFn = utcnow):
+        """Create a coarse clock.
+
+        Args:
+            resolution - Seconds to reuse a reading of the time for.
+            now - Function to read the time with.
+        """
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        self.resolution = resolution
+        self._now = now
+        self._lock = threading.Lock()
+        self._expires = float("-inf")
+        self._ts: datetime = datetime.min
+
+    def __call__(self) -> datetime:
+        """Get the (approximate) current time."""
+        if time.monotonic() < self._expires:
+            return self._ts
+        with self._lock:
+            t = time.monotonic()
+            if t >= self._expires:
+                self._ts = self._now()
+                self._expires = t + self.resolution
+            return self._ts
+
+
 def get_uuid() -> str:
-    """Get a UUID (v4).
+    """Get a unique ID, formatted as a UUID.
+
+    IDs are a random per-process base plus a counter (see `unique_int`), so
+    they're cheap to generate. In tests this can be made deterministic either
+    by patching or seeding the random number generator.
+
+    Returns:
+        UUID-formatted string
+    """
+    h = f"{unique_int():032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
 
-    In tests this can be made deterministic either by patching or seeding the
-    random number generator.
+EntityId = Tuple[str, str]
+"""Composite ID of an entity: class name and ID attribute."""
+
+
+def get_entity_id(entity: Any) -> EntityId:
+    """Get the ID from an entity.
+
+    Args:
+        entity - Anything with an ID
 
     Returns:
-        UUIDv4 as a string
+        Tuple with typename and ID.
     """
-    # Call into `random` explicitly so it can be seeded for tests.
-    return str(uuid.UUID(int=getrandbits(128)))
+    entity_id = None
+    if hasattr(entity, "id"):
+        entity_id = entity.id
+    elif "id" in entity:
+        entity_id = entity["id"]
+    else:
+        entity_id = repr(entity_id)
+
+    return type(entity).__name__, entity_id
 
 
 def seq_id(current_id: str) -> str:
@@ -62,6 +143,9 @@ def is_non_string_iterable(c: Any) -> bool:
 def simple_object(value: Any, with_type=False):
     """Try to simplify an arbitrary object to a simple object.
 
+    The way to convert a value is worked out once per type and cached (see
+    `_make_converter`).
+
     Args:
         value - Value to simplify
         with_type - Include type information in the object
@@ -69,27 +153,202 @@ def simple_object(value: Any, with_type=False):
     Returns:
         Hopefully a simple JSON-type object.
     """
-    if is_non_string_iterable(value):
-        return [simple_object(v) for v in value]
+    convert = _converters.get(type(value))
+    if convert is None:
+        convert = _converters[type(value)] = _make_converter(type(value))
+    d = convert(value)
+
+    if not with_type or convert is _simple_iterable:
+        return d
+    return {
+        "type": type(value).__name__,
+        "value": d,
+    }
+
+
+_Converter = Callable[[Any], Any]
+"""Converts a value of a specific type to a simple object."""
+
+_converters = dict[type, _Converter]()
+"""Cached `simple_object` converters by type."""
+
+_scalars = dict[type, _Converter]()
+"""Cached JSON scalar converters by type."""
+
+_ATOMIC = frozenset(
+    {
+        type(None),
+        bool,
+        int,
+        float,
+        complex,
+        str,
+        bytes,
+        datetime,
+        date,
+        time_of_day,
+        timedelta,
+    }
+)
+"""Immutable types that `dataclasses.asdict` would copy as-is."""
+
+
+class _NotSimple(Exception):
+    """A dataclass field can't be handled by the fast `asdict`."""
+
+
+def _make_converter(cls: type) -> _Converter:
+    """Work out how to simplify values of the given type.
+
+    In order of precedence:
+      - Iterables (other than strings) become lists, item by item.
+      - Dataclass instances become dicts, like `dataclasses.asdict`. A
+        synthetic `id` property is included too.
+      - Objects with an `asdict`, `to_dict`, or `to_json` method are
+        converted by calling it.
+      - Anything else becomes what it would be after a round-trip through
+        `encode_json`; see `_make_scalar`.
+
+    The methods are looked up on the type, but instances can have them as
+    attributes too; for types whose instances can have attributes, the
+    instance is checked before falling back to a scalar.
+    """
+    if issubclass(cls, collections.abc.Iterable) and not issubclass(cls, str):
+        return _simple_iterable
+    if dataclasses.is_dataclass(cls) and not issubclass(cls, type):
+        return _simple_dataclass
+    for method in _SIMPLE_METHODS:
+        if hasattr(cls, method):
+            return operator.methodcaller(method)
+    scalar = _get_scalar(cls)
+    if cls in _ATOMIC or not (cls.__dictoffset__ or hasattr(cls, "__getattr__")):
+        return scalar
+
+    def convert(value: Any) -> Any:
+        for method in _SIMPLE_METHODS:
+            if hasattr(value, method):
+                return getattr(value, method)()
+        return scalar(value)
+
+    return convert
+
+
+_SIMPLE_METHODS = ("asdict", "to_dict", "to_json")
+"""Methods that convert an object to a simple object, by precedence."""
+
+
+def _simple_iterable(value: Any) -> list:
+    """Simplify each item of an iterable."""
+    return [simple_object(v) for v in value]
 
-    d = {}
 
-    # Check if this is a dataclass instance (and not a DataClass type)
-    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+def _simple_dataclass(value: Any) -> dict:
+    """Convert a dataclass instance to a dict."""
+    try:
+        d = _fast_asdict(value)
+    except _NotSimple:
         d = dataclasses.asdict(value)
-        # If a dataclass defines a synthetic `id` using the `@property`
-        # decorator, make sure it gets included in the serialization.
-        if hasattr(value, "id"):
-            d["id"] = value.id
-    elif hasattr(value, "asdict"):
-        d = value.asdict()
-    elif hasattr(value, "to_dict"):
-        d = value.to_dict()
-    elif hasattr(value, "to_json"):
-        d = value.to_json()
-    else:
-        d = json.loads(encode_json(value))
+    # If a dataclass defines a synthetic `id` using the `@property`
+    # decorator, make sure it gets included in the serialization.
+    if hasattr(value, "id"):
+        d["id"] = value.id
+    return d
+
+
+def _fast_asdict(value: Any) -> dict:
+    """Equivalent of `dataclasses.asdict` for the common cases.
+
+    Raises:
+        `_NotSimple` if a field has a value that isn't a common case.
+    """
+    return {
+        f.name: _fast_asdict_value(getattr(value, f.name))
+        for f in dataclasses.fields(value)
+    }
+
+
+def _fast_asdict_value(obj: Any) -> Any:
+    """Convert a dataclass field value like `dataclasses.asdict` does."""
+    cls = type(obj)
+    if cls in _ATOMIC or isinstance(obj, enum.Enum):
+        return obj
+    if cls is list:
+        return [_fast_asdict_value(v) for v in obj]
+    if cls is tuple:
+        return tuple(_fast_asdict_value(v) for v in obj)
+    if cls is dict:
+        return {_fast_asdict_value(k): _fast_asdict_value(v) for k, v in obj.items()}
+    if dataclasses.is_dataclass(cls):
+        return _fast_asdict(obj)
+    raise _NotSimple()
+
+
+def _get_scalar(cls: type) -> _Converter:
+    """Get the (cached) JSON scalar converter for a type."""
+    convert = _scalars.get(cls)
+    if convert is None:
+        convert = _scalars[cls] = _make_scalar(cls)
+    return convert
+
+
+def _make_scalar(cls: type) -> _Converter:
+    """Work out how to convert a value that isn't a container to JSON.
+
+    The result is the same as encoding the value with `encode_json` and
+    parsing it again: subclasses of JSON types (like `IntEnum` and `StrEnum`)
+    become the plain type, dates become ISO strings, and anything else is
+    converted with `str`.
+    """
+    if cls in (type(None), bool, int, float, str):
+        return _identity
+    if issubclass(cls, str):
+        return str.__str__
+    if issubclass(cls, int):
+        return int.__int__
+    if issubclass(cls, float):
+        return float.__float__
+    if issubclass(cls, (datetime, date)):
+        return operator.methodcaller("isoformat")
+    return str
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+FieldPath = Tuple[str, ...]
+"""Path of names to a (possibly nested) field of an entity."""
+
+_Projector = Callable[[Any], dict]
+"""Extracts a projection of an entity of a specific type."""
+
+_projectors = dict[Tuple[type, frozenset], _Projector]()
+
+
+def project_object(value: Any, paths: frozenset, with_type=False):
+    """Simplify only some fields of an object.
+
+    This is like `simple_object`, but only the given fields are extracted.
+    Nested paths are nested in the result, e.g. `("a", "b")` becomes
+    `{"a": {"b": ...}}`. Callable fields are left out.
+
+    The way to look up the top-level fields is worked out once per type of
+    object and set of paths, then cached.
+
+    Args:
+        value - Value to project
+        paths - Set of field paths to include
+        with_type - Include type information in the object
 
+    Returns:
+        Dictionary with the projected fields.
+    """
+    key = (type(value), paths)
+    projector = _projectors.get(key)
+    if projector is None:
+        projector = _projectors[key] = _make_projector(type(value), paths)
+
+    d = projector(value)
     if not with_type:
         return d
     return {
@@ -98,18 +357,93 @@ def simple_object(value: Any, with_type=False):
     }
 
 
-def _json_default_encoder(obj: Any) -> str:
+def _make_projector(cls: type, paths: frozenset) -> _Projector:
+    """Create a function to extract the given fields from objects of a type.
+
+    Top-level fields are found the same way as `get_entity_field`: attributes
+    first, then items. Whether a field is a class attribute (properties,
+    methods, etc.) or an item of a mapping is known from the type alone.
+    """
+    # Paths nested under another path are included with their parent.
+    kept = list[FieldPath]()
+    for path in sorted(paths, key=len):
+        if not any(path[: len(p)] == p for p in kept):
+            kept.append(path)
+
+    mapping = issubclass(cls, collections.abc.Mapping)
+    getters = list[tuple[FieldPath, Callable[[Any], Any]]]()
+    for path in kept:
+        name = path[0]
+        if hasattr(cls, name) or not mapping:
+            getters.append((path, _attr_getter(name)))
+        else:
+            getters.append((path, _item_getter(name)))
+
+    def project(value: Any) -> dict:
+        d = dict[str, Any]()
+        for path, get in getters:
+            result = get(value)
+            for name in path[1:]:
+                result = get_entity_field(result, name)
+            if callable(result):
+                continue
+            target = d
+            for name in path[:-1]:
+                target = target.setdefault(name, {})
+            target[path[-1]] = _simple_field(result)
+        return d
+
+    return project
+
+
+def _attr_getter(name: str) -> Callable[[Any], Any]:
+    """Get an attribute, falling back to an item, like `get_entity_field`."""
+
+    def get(value: Any) -> Any:
+        try:
+            return getattr(value, name)
+        except AttributeError:
+            return get_entity_field(value, name)
+        except Exception:
+            # A property that fails is a missing field.
+            return None
+
+    return get
+
+
+def _item_getter(name: str) -> Callable[[Any], Any]:
+    """Get an item from a mapping."""
+
+    def get(value: Any) -> Any:
+        try:
+            return value.get(name)
+        except Exception:
+            return None
+
+    return get
+
+
+def _simple_field(value: Any) -> Any:
+    """Simplify the value of a projected field."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, collections.abc.Mapping):
+        return json.loads(encode_json(value))
+    return simple_object(value)
+
+
+def _json_default_encoder(obj: Any) -> Any:
     """Default serializer to user with json.dumps.
 
+    This shares the cached converters with `simple_object`.
+
     Args:
         obj - anything
 
     Returns:
         A simple JSON type
     """
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    return str(obj)
+    return _get_scalar(type(obj))(obj)
 
 
 def encode_json(data: Any) -> str:
@@ -172,6 +506,14 @@ class NoAssignment(Exception):
     pass
 
 
+class StickyTimeoutError(TimeoutError):
+    """Thrown when the sticky assignment lookup exceeds its latency budget."""
+
+    def __init__(self, message: str, timeout: float):
+        super().__init__(message)
+        self.timeout = timeout
+
+
 class SkipLog(Exception):
     """Raise this exception to prevent logging."""
 
@@ -0,0 +1,161 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .common import NowFn, default_now
+
+DedupKey = tuple[str, Any, str]
+"""Feature name, entity ID, and variant name of an exposure."""
+
+
+class _Shard:
+    """One lock's worth of the de-duplication state."""
+
+    __slots__ = ("lock", "seen", "suppressed", "evicted")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Time each key was last let through, oldest first.
+        self.seen = collections.OrderedDict[DedupKey, float]()
+        # Suppressed exposures since the last summary, by (feature, variant).
+        self.suppressed = collections.Counter[tuple[str, str]]()
+        self.evicted = 0
+
+
+class ExposureDeduper:
+    """Suppress repeat exposures of the same variant to the same entity.
+
+    The first exposure of a (feature, entity, variant) is always let through.
+    Repeats within `window` seconds of it are suppressed and counted, and the
+    counts can be collected periodically with `summary`.
+
+    Memory is bounded by `max_entries`: when it's full, the least recently
+    let through keys are evicted (so their next exposure is let through).
+    State is split across `shards` locks to limit contention.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        max_entries: int = 100_000,
+        shards: int = 16,
+        summary_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Create a new de-duplicator.
+
+        Args:
+            window - Seconds during which repeat exposures are suppressed.
+            max_entries - Maximum number of keys to remember.
+            shards - Number of independently locked shards.
+            summary_interval - Seconds between summary records, for loggers
+            that emit them.
+            clock - Monotonic clock, in seconds.
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.window = window
+        self.summary_interval = summary_interval
+        self._clock = clock
+        self._shards = [_Shard() for _ in range(shards)]
+        self._max_per_shard = max(1, max_entries // shards)
+
+    def seen(self, key: DedupKey) -> bool:
+        """Record an exposure and check whether it's a repeat.
+
+        Args:
+            key - Feature name, entity ID, and variant name
+
+        Returns:
+            True if the exposure should be suppressed.
+        """
+        if self.is_repeat(key):
+            return True
+        self.let_through(key)
+        return False
+
+    def is_repeat(self, key: DedupKey) -> bool:
+        """Check whether an exposure should be suppressed, counting it if so.
+
+        Exposures that aren't repeats aren't remembered until `let_through`
+        is called, so that the caller can check first and only record the
+        exposure once it's actually been written.
+
+        Args:
+            key - Feature name, entity ID, and variant name
+
+        Returns:
+            True if the exposure should be suppressed.
+        """
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            last = shard.seen.get(key)
+            if last is not None and now - last < self.window:
+                shard.suppressed[key[0], key[2]] += 1
+                return True
+            return False
+
+    def let_through(self, key: DedupKey):
+        """Remember that an exposure was let through.
+
+        Args:
+            key - Feature name, entity ID, and variant name
+        """
+        shard = self._shard(key)
+        now = self._clock()
+        with shard.lock:
+            shard.seen[key] = now
+            shard.seen.move_to_end(key)
+            if len(shard.seen) > self._max_per_shard:
+                shard.seen.popitem(last=False)
+                shard.evicted += 1
+
+    def _shard(self, key: DedupKey) -> _Shard:
+        """Get the shard that holds a key."""
+        return self._shards[hash(key) % len(self._shards)]
+
+    def summary(self, now: NowFn = default_now) -> Optional[dict]:
+        """Collect (and reset) the counts of suppressed exposures.
+
+        Args:
+            now - Function to get the current time
+
+        Returns:
+            A summary record, or None if nothing was suppressed.
+        """
+        counts = collections.Counter[tuple[str, str]]()
+        for shard in self._shards:
+            with shard.lock:
+                counts.update(shard.suppressed)
+                shard.suppressed.clear()
+
+        if not counts:
+            return None
+
+        return {
+            "record": "dedup_summary",
+            "ts": now(),
+            "window": self.window,
+            "suppressed": [
+                {"feature": feature, "variant": variant, "count": n}
+                for (feature, variant), n in sorted(counts.items())
+            ],
+            "total": sum(counts.values()),
+        }
+
+    def stats(self) -> dict:
+        """Get a snapshot of the de-duplicator's counters.
+
+        Returns:
+            Dictionary of counters. `pending` is the number of suppressed
+            exposures that haven't been summarized yet.
+        """
+        entries = pending = evicted = 0
+        for shard in self._shards:
+            with shard.lock:
+                entries += len(shard.seen)
+                pending += sum(shard.suppressed.values())
+                evicted += shard.evicted
+        return {"entries": entries, "pending": pending, "evicted": evicted}
@@ -0,0 +1,167 @@
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class SyncRunner:
+    """Run blocking (non-coroutine) callbacks off of the event loop.
+
+    User-supplied callbacks like the `sticky` fetcher or `functor` Variant
+    values are often synchronous and may do blocking IO. Calling them inline
+    from a coroutine stalls the whole event loop. The runner dispatches them to
+    a `concurrent.futures` executor with `run_in_executor` instead.
+
+    The runner tracks how long callbacks wait before they start running (i.e.,
+    time spent queued behind the concurrency limit / busy workers), which is
+    useful for sizing the pool.
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        """Create a new runner.
+
+        Args:
+            executor - Executor to dispatch calls to. If not given, a private
+            ThreadPoolExecutor is created (and shut down with the runner).
+            max_concurrency - Maximum number of callbacks running at once. When
+            the runner owns its executor this is the number of worker threads.
+            With a shared executor, calls beyond the limit wait on the event
+            loop before they are submitted.
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="Alligater-sync"
+        )
+        # The private pool enforces the limit itself; a shared pool needs a
+        # semaphore. asyncio primitives are bound to a loop, so keep one each.
+        self._max_concurrency = max_concurrency if executor else None
+        self._semaphores = weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ]()
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+        self._raised = 0
+        self._in_flight = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking function in the executor and wait for the result.
+
+        Args:
+            fn - Synchronous function to call
+            *args - Positional arguments for the function
+            **kwargs - Keyword arguments for the function
+
+        Returns:
+            Whatever the function returns.
+        """
+        loop = asyncio.get_running_loop()
+        queued = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+
+        call = functools.partial(self._invoke, queued, fn, args, kwargs)
+        sem = self._semaphore(loop)
+        try:
+            if sem:
+                async with sem:
+                    return await loop.run_in_executor(self._executor, call)
+            return await loop.run_in_executor(self._executor, call)
+        except BaseException:
+            with self._lock:
+                self._raised += 1
+            raise
+        finally:
+            with self._lock:
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """Get a snapshot of the runner's counters.
+
+        Returns:
+            Dictionary of counters. Wait times are in seconds.
+        """
+        with self._lock:
+            started = self._started
+            return {
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "raised": self._raised,
+                "in_flight": self._in_flight,
+                "queue_wait_total": self._wait_total,
+                "queue_wait_max": self._wait_max,
+                "queue_wait_mean": self._wait_total / started if started else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the executor if it's owned by this runner.
+
+        Args:
+            wait - Whether to wait for running callbacks to finish.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+    def _semaphore(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> Optional[asyncio.Semaphore]:
+        """Get the concurrency limiter for the given loop, if any."""
+        if not self._max_concurrency:
+            return None
+        with self._lock:
+            sem = self._semaphores.get(loop)
+            if sem is None:
+                sem = asyncio.Semaphore(self._max_concurrency)
+                self._semaphores[loop] = sem
+            return sem
+
+    def _invoke(self, queued: float, fn: Callable[..., Any], args, kwargs) -> Any:
+        """[THREAD] Record queue wait time and call the function."""
+        wait = time.perf_counter() - queued
+        with self._lock:
+            self._started += 1
+            self._in_flight += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+async def call_maybe_async(
+    fn: Callable[..., Any], *args, runner: Optional[SyncRunner] = None, **kwargs
+) -> Any:
+    """Call a function that might be a coroutine function.
+
+    Coroutine functions are awaited directly. Synchronous functions are sent
+    through the `runner` if one is given, otherwise they are called inline.
+
+    Args:
+        fn - Function to call
+        *args - Positional arguments for the function
+        runner - Optional runner for synchronous functions
+        **kwargs - Keyword arguments for the function
+
+    Returns:
+        Result of the function.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args, **kwargs)
+    if runner:
+        return await runner.run(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
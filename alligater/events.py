@@ -1,5 +1,7 @@
 import abc
+import functools
 import inspect
+import weakref
 from typing import Any, Optional, Sequence
 
 from .common import ValidationError, simple_object, NowFn, default_now
@@ -25,6 +27,8 @@ class _EventInstance:
     The fields available depend on the event.
     """
 
+    __slots__ = ("name", "args")
+
     def __init__(self, name: str, **kwargs):
         self.name = name
         self.args = kwargs
@@ -76,6 +80,40 @@ class _EventInstance:
         return d
 
 
+def _accepts_now(log: Any) -> bool:
+    """Check whether a logger takes a `now` argument.
+
+    Inspecting the signature is slow, so the answer is cached by logger. The
+    cache holds loggers weakly, so it doesn't keep them alive after they're
+    stopped.
+    """
+    # Bound methods are created on every attribute access, so use the
+    # function underneath.
+    key = getattr(log, "__func__", log)
+    try:
+        return _accepts_now_cache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable, or can't be weakly referenced (like builtins).
+        if inspect.isbuiltin(log):
+            return _builtin_accepts_now(log)
+        return "now" in inspect.signature(log).parameters
+
+    result = "now" in inspect.signature(log).parameters
+    _accepts_now_cache[key] = result
+    return result
+
+
+_accepts_now_cache = weakref.WeakKeyDictionary[Any, bool]()
+"""Whether each logger takes a `now` argument."""
+
+
+@functools.lru_cache(maxsize=64)
+def _builtin_accepts_now(log: Any) -> bool:
+    return "now" in inspect.signature(log).parameters
+
+
 class _Event:
     """An abstract event for building loggers."""
 
@@ -104,8 +142,7 @@ class _Event:
         # This lets us support our own advanced loggers while keeping
         # backwards-compatibility for using the `print` function.
         if now_fn:
-            params = inspect.signature(log).parameters
-            if "now" in params:
+            if _accepts_now(log):
                 log_kwargs["now"] = now_fn
             else:
                 ts = now_fn()
@@ -166,6 +203,17 @@ Attributes:
 """
 
 
+StickyTimeout = _Event("StickyTimeout", ("timeout", "policy"))
+"""StickyTimeout is fired when the sticky assignment lookup runs out of time.
+
+This is followed by a StickyAssignment event with `assigned=False`.
+
+Attributes:
+    timeout - The latency budget that was exceeded, in seconds.
+    policy - The policy applied to the timeout (see `StickyTimeoutPolicy`).
+"""
+
+
 ChoseVariant = _Event(
     "ChoseVariant",
     (
@@ -1,19 +1,39 @@
 import asyncio
+import hashlib
+import time
+from enum import Enum
+from functools import cached_property
 from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Union, cast
 from datetime import datetime
 
 import alligater.events as events
+import crocodsl.field as field
+import crocodsl.profiler as profiler
+from crocodsl.func import FieldPaths
 
 from .arm import Arm
-from .common import NoAssignment, ValidationError, get_uuid, default_now, NowFn
+from .common import (
+    NoAssignment,
+    StickyTimeoutError,
+    ValidationError,
+    encode_json,
+    freeze_now,
+    get_uuid,
+    default_now,
+    NowFn,
+)
+from .dispatch import SyncRunner, call_maybe_async
 from .log import log as iolog
+from .metrics import Phase
 from .population import Population
 from .rollout import Rollout
+from .sink import PendingAssignment
 from .value import CallType, Value
 
 if TYPE_CHECKING:
     from . import Alligater
     from .cache import AssignmentCache
+    from .sink import AssignmentSink
     from .variant import Variant
 
 
@@ -30,6 +50,19 @@ AssignmentFetcher = Union[AsyncAssignmentFetcher, SyncAssignmentFetcher]
 """Function to fetch existing assignments for a given feature/entity."""
 
 
+class StickyTimeoutPolicy(Enum):
+    """What to do when the sticky assignment lookup runs out of time."""
+
+    RAISE = "raise"
+    """Raise a `StickyTimeoutError`."""
+
+    DEFAULT = "default"
+    """Serve the default rollout. No assignment is made."""
+
+    EXPOSURE = "exposure"
+    """Evaluate the rollouts as usual, but don't make a sticky assignment."""
+
+
 class Feature:
     """A Feature assigns a treatment using an arbitrary set of rules.
 
@@ -57,6 +90,9 @@ class Feature:
         variants: Optional[list["Variant"]] = None,
         rollouts: Optional[list[Rollout]] = None,
         default_arm: Optional[Union[str, Arm]] = None,
+        sticky_timeout: Optional[float] = None,
+        sticky_timeout_policy: Optional[Union[str, StickyTimeoutPolicy]] = None,
+        sample_rate: Optional[float] = None,
     ):
         """Create a new feature gate.
 
@@ -71,6 +107,13 @@ class Feature:
             default Rollout is included in the `rollouts` list). Can either be
             a string name of a variant, or an Arm object. If the weight is
             specified of the Arm, it must be `1.0`.
+            sticky_timeout - Optional latency budget (in seconds) for the
+            sticky assignment lookup. Overrides the gater's budget.
+            sticky_timeout_policy - Optional policy to apply when the lookup
+            times out. Overrides the gater's policy. See `StickyTimeoutPolicy`.
+            sample_rate - Optional fraction of exposures to log. Sampling is
+            deterministic by entity, so a sampled entity is always logged.
+            Rollouts can override this, and it overrides the logger's default.
 
         Raises:
             ValidationError if the configuration isn't correct.
@@ -79,6 +122,13 @@ class Feature:
         # Store variants as a map for faster lookup
         self.variants = {v.name: v for v in variants or []}
         self.rollouts = rollouts or []
+        self.sticky_timeout = sticky_timeout
+        self.sticky_timeout_policy = (
+            StickyTimeoutPolicy(sticky_timeout_policy)
+            if sticky_timeout_policy
+            else None
+        )
+        self.sample_rate = sample_rate
 
         # Create a default rollout if one was specified
         if default_arm:
@@ -130,6 +180,12 @@ class Feature:
 
         [r.validate(self.variants) for r in self.rollouts]
 
+        if self.sticky_timeout is not None and self.sticky_timeout <= 0:
+            raise ValidationError("Sticky timeout must be positive")
+
+        if self.sample_rate is not None and not 0.0 <= self.sample_rate <= 1.0:
+            raise ValidationError("Sample rate must be between 0 and 1")
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Feature):
             return False
@@ -139,6 +195,9 @@ class Feature:
                 self.name == other.name,
                 self.variants == other.variants,
                 self.rollouts == other.rollouts,
+                self.sticky_timeout == other.sticky_timeout,
+                self.sticky_timeout_policy == other.sticky_timeout_policy,
+                self.sample_rate == other.sample_rate,
             ]
         )
 
@@ -146,6 +205,16 @@ class Feature:
         return "<Feature name={}>".format(self.name)
 
     def to_dict(self) -> dict:
+        """Get the feature's definition as a simple object.
+
+        Features are treated as immutable once created (reloading config
+        creates new ones), so this is computed once and cached. Don't modify
+        the result.
+        """
+        return self._definition
+
+    @cached_property
+    def _definition(self) -> dict:
         return {
             "type": "Feature",
             "name": self.name,
@@ -153,6 +222,41 @@ class Feature:
             "rollouts": [r.to_dict() for r in self.rollouts],
         }
 
+    @cached_property
+    def fingerprint(self) -> str:
+        """Content hash of the feature's definition.
+
+        Features with the same definition have the same fingerprint, so this
+        identifies a version of a feature.
+        """
+        return hashlib.sha256(encode_json(self.to_dict()).encode("utf-8")).hexdigest()
+
+    @cached_property
+    def entity_fields(self) -> Optional[FieldPaths]:
+        """Entity fields the feature reads, as a set of field paths.
+
+        This is worked out from the expressions in the populations and
+        randomizers of this feature and any nested features. The `id` field
+        is always included. None means any part of the entity might be read,
+        for example by a functor variant.
+        """
+        paths = {field.ID.names}
+        for rollout in self.rollouts:
+            fields = rollout.entity_fields()
+            if fields is None:
+                return None
+            paths |= fields
+        for variant in self.variants.values():
+            if not variant.is_nested:
+                continue
+            if not isinstance(variant.value, Feature):
+                return None
+            fields = variant.value.entity_fields
+            if fields is None:
+                return None
+            paths |= fields
+        return frozenset(paths)
+
     async def __call__(
         self,
         entity: Any,
@@ -160,8 +264,14 @@ class Feature:
         call_id: Optional[str] = None,
         sticky: Optional[AssignmentFetcher] = None,
         assignment_cache: Optional["AssignmentCache"] = None,
+        assignment_sink: Optional["AssignmentSink"] = None,
         gater: Optional["Alligater"] = None,
         now: NowFn = default_now,
+        sticky_timeout: Optional[float] = None,
+        sticky_timeout_policy: Union[str, StickyTimeoutPolicy] = (
+            StickyTimeoutPolicy.RAISE
+        ),
+        timings: Optional[dict[str, float]] = None,
     ) -> Value[Any]:
         """Apply the gate to the given entity.
 
@@ -172,12 +282,21 @@ class Feature:
             assignment_cache - optional local cache of assignments. This is
             only checked if `sticky` is also passed. It should be used to
             avoid race conditions.
+            assignment_sink - optional sink to persist new sticky assignments.
+            sticky_timeout - optional latency budget for `sticky`, in seconds.
+            The feature's own `sticky_timeout` takes precedence.
+            sticky_timeout_policy - what to do if `sticky` runs out of time.
+            The feature's own `sticky_timeout_policy` takes precedence.
+            timings - optional dictionary to record the time taken by each
+            phase of the evaluation in (see `Phase`).
 
         Internal Args:
             call_id - the ID of the feature invocation that this call is
                       nested within. This is None if the call is not nested.
             gater - the Alligater instance
-            now - function to get the current time
+            now - function to get the current time. A top-level evaluation
+                  reads it once, and that time is used for everything in the
+                  evaluation (events, expressions, and the returned Value).
 
         Returns:
             Variant that the entity should receive and the CallID.
@@ -189,7 +308,10 @@ class Feature:
         value = None
         ts = None
         source: Optional[str] = None
+        # Set if the sticky lookup timed out and we're serving a fallback.
+        fallback: Optional[StickyTimeoutPolicy] = None
         if not nested:
+            now = freeze_now(now)
             call_id = get_uuid()
             events.EnterGate(log, feature=self, entity=entity, call_id=call_id, now=now)
 
@@ -197,6 +319,7 @@ class Feature:
 
         if sticky:
             has_assignment = False
+            start = time.perf_counter() if timings is not None else 0.0
 
             try:
                 # Look up the assignment in the local cache first if possible.
@@ -210,18 +333,34 @@ class Feature:
                     source = "local"
                     variant_name, value, ts = cached
                 else:
-                    if asyncio.iscoroutinefunction(sticky):
-                        variant_name, value, ts = await cast(
-                            AsyncAssignmentFetcher, sticky
-                        )(self, entity)
-                    else:
-                        variant_name, value, ts = cast(SyncAssignmentFetcher, sticky)(
-                            self, entity
-                        )
+                    variant_name, value, ts = await self._fetch_assignment(
+                        entity,
+                        sticky,
+                        timeout=(
+                            self.sticky_timeout
+                            if self.sticky_timeout is not None
+                            else sticky_timeout
+                        ),
+                        runner=gater.sync_runner if gater else None,
+                    )
                     source = "remote"
                 has_assignment = True
             except NoAssignment:
                 pass
+            except StickyTimeoutError as e:
+                policy = self.sticky_timeout_policy or StickyTimeoutPolicy(
+                    sticky_timeout_policy
+                )
+                events.StickyTimeout(
+                    log,
+                    timeout=e.timeout,
+                    policy=policy.value,
+                    call_id=call_id,
+                    now=now,
+                )
+                if policy == StickyTimeoutPolicy.RAISE:
+                    raise
+                fallback = policy
             except Exception as e:
                 events.Error(
                     log,
@@ -237,6 +376,8 @@ class Feature:
                 # exceptions should be handled in the `sticky` function itself.
                 raise
             finally:
+                if timings is not None:
+                    timings[Phase.STICKY] = time.perf_counter() - start
                 events.StickyAssignment(
                     log,
                     variant=variant_name,
@@ -259,11 +400,24 @@ class Feature:
                         now=lambda: cast(datetime, ts),
                     )
 
-        for r in self.rollouts:
-            variant_name = await r(
-                cast(str, call_id), entity, log=log, gater=gater, now=now
-            )
+        # When the lookup timed out we don't know whether the entity already has
+        # an assignment, so we never make a new one. Either serve the default
+        # rollout, or evaluate normally but only as an exposure.
+        rollouts = self.rollouts
+        if fallback == StickyTimeoutPolicy.DEFAULT:
+            rollouts = rollouts[-1:]
+
+        start = time.perf_counter() if timings is not None else 0.0
+        for r in rollouts:
+            evaluate = r(cast(str, call_id), entity, log=log, gater=gater, now=now)
+            if profiler.active():
+                with profiler.label(f"{self.name}/{r.name}"):
+                    variant_name = await evaluate
+            else:
+                variant_name = await evaluate
             if variant_name:
+                if timings is not None:
+                    timings[Phase.POPULATION] = time.perf_counter() - start
                 variant = self.variants[variant_name]
 
                 # By default, this assignment will be permanent if we have a
@@ -271,7 +425,9 @@ class Feature:
                 # the rollout level, which can specify explicitly whether or
                 # not we want the assignment to be permanent.
                 is_sticky_assignment = bool(sticky) if r.sticky is None else r.sticky
-                if is_sticky_assignment and not sticky:
+                if fallback:
+                    is_sticky_assignment = False
+                elif is_sticky_assignment and not sticky:
                     iolog.warning(
                         f"🏒 Rollout {r.name} requests a persistent (sticky) assignment, "
                         "but no sticky assignment fetcher was passed into Alligater. "
@@ -286,17 +442,31 @@ class Feature:
                     call_id=call_id,
                     now=now,
                 )
+                start = time.perf_counter() if timings is not None else 0.0
                 value = await variant(call_id, entity, log=log, gater=gater, now=now)
+                if timings is not None:
+                    timings[Phase.VARIANT] = time.perf_counter() - start
 
                 events.LeaveFeature(log, value=value, call_id=call_id, now=now)
                 if not nested:
                     events.LeaveGate(log, value=value, call_id=call_id, now=now)
 
                 v = Value(
-                    value, variant_name, call_id, CallType.ASSIGNMENT, log=log, now=now
+                    value,
+                    variant_name,
+                    call_id,
+                    CallType.EXPOSURE if fallback else CallType.ASSIGNMENT,
+                    log=log,
+                    now=now,
                 )
-                if assignment_cache:
+                if assignment_cache and not fallback:
                     assignment_cache.set(self, entity, variant_name, value, v.ts)
+                # Queue the new assignment to be persisted. (The sink pins it in
+                # the cache until it's written.)
+                if assignment_sink and is_sticky_assignment:
+                    assignment_sink.put(
+                        PendingAssignment(self, entity, variant_name, value, v.ts)
+                    )
                 return v
 
         # This code is probably unreachable since there has to be a default
@@ -308,3 +478,51 @@ class Feature:
             events.LeaveGate(log, value=None, call_id=call_id, now=now)
 
         raise RuntimeError("No variant found")
+
+    async def _fetch_assignment(
+        self,
+        entity: Any,
+        sticky: AssignmentFetcher,
+        timeout: Optional[float] = None,
+        runner: Optional[SyncRunner] = None,
+    ) -> ExistingAssignment:
+        """Look up an existing assignment within the latency budget.
+
+        Synchronous fetchers are sent to the `runner` (if there is one) so they
+        don't block the event loop. If there's a budget and no runner, they run
+        in the loop's default executor, since a blocking call on the loop
+        itself can't be timed out.
+
+        Args:
+            entity - Entity to look up
+            sticky - Assignment fetcher
+            timeout - Optional latency budget in seconds
+            runner - Optional runner for synchronous fetchers
+
+        Returns:
+            Existing assignment.
+
+        Raises:
+            StickyTimeoutError - if the budget was exceeded. (Note that a
+            fetcher running in a thread can't be interrupted; it will finish
+            in the background and its result is discarded.)
+            NoAssignment - if there's no existing assignment.
+        """
+        if timeout is None:
+            return await call_maybe_async(sticky, self, entity, runner=runner)
+
+        if runner or asyncio.iscoroutinefunction(sticky):
+            fetch = call_maybe_async(sticky, self, entity, runner=runner)
+        else:
+            fetch = asyncio.to_thread(sticky, self, entity)
+
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                return await fetch
+        except TimeoutError as e:
+            if not deadline.expired():
+                raise
+            raise StickyTimeoutError(
+                f"sticky assignment lookup exceeded {timeout}s for {self.name}",
+                timeout,
+            ) from e
@@ -1,10 +1,22 @@
 import abc
+import asyncio
 import atexit
+import collections
+import contextlib
+import contextvars
 import copy
+import gzip
+import json
 import logging
+import os
+import shutil
 import signal
 import threading
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from enum import Enum
+from typing import Any, BinaryIO, Callable, Optional, cast
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -13,7 +25,23 @@ from urllib3.util import Retry
 
 import alligater.events as events
 
-from .common import SkipLog, encode_json, seq_id, simple_object, default_now, NowFn
+from crocodsl.common import hash_id
+
+from .common import (
+    _ATOMIC,
+    EntityId,
+    NowFn,
+    SkipLog,
+    default_now,
+    encode_json,
+    get_entity_id,
+    project_object,
+    seq_id,
+    simple_object,
+)
+from .dedup import DedupKey, ExposureDeduper
+from .rand import random_float
+from .spool import Spool
 
 # Sys log (different than feature trace log)
 log = logging.getLogger("alligater")
@@ -36,13 +64,200 @@ class DeferrableLogger(events.EventLogger):
     def drop_log(self, call_id: str):
         """Clear the log with the given ID without writing.
 
-        This must be called to avoid memory leaks for dropped logs.
+        Loggers should also expire deferred logs on their own eventually, but
+        calling this (or using `deferral_scope`) frees them promptly.
         """
         ...
 
 
+_scope = contextvars.ContextVar[Optional[list[tuple[DeferrableLogger, str]]]](
+    "alligater_deferral_scope", default=None
+)
+"""Deferred logs created in the current deferral scope."""
+
+
+@contextlib.contextmanager
+def deferral_scope():
+    """Scope for deferred logs, such as a request.
+
+    Deferred logs created in the scope that haven't been written by the time
+    it exits are dropped. Logs can still be written more than once within the
+    scope. Scopes follow `contextvars`, so tasks started in the scope share it.
+
+    Example:
+        with deferral_scope():
+            v = await gater.my_feature(user, deferred=True)
+            if shown:
+                v.log()
+    """
+    calls = list[tuple[DeferrableLogger, str]]()
+    token = _scope.set(calls)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+        for logger, call_id in calls:
+            logger.drop_log(call_id)
+
+
+def track_deferred(logger: DeferrableLogger, call_id: str):
+    """Add a deferred log to the current deferral scope, if there is one.
+
+    Args:
+        logger - Logger that holds the log
+        call_id - ID of the log
+    """
+    calls = _scope.get()
+    if calls is not None:
+        calls.append((logger, call_id))
+
+
+class OverflowPolicy(Enum):
+    """What to do with a log when the write queue is full."""
+
+    BLOCK = "block"
+    """Wait (up to a timeout) for space in the queue, then drop the log.
+
+    This is only for synchronous callers: waiting on an event loop thread
+    would stall every coroutine on the loop, so logs written from one are
+    dropped right away when the queue is full, as with `DROP_NEWEST`.
+    """
+
+    DROP_NEWEST = "drop_newest"
+    """Drop the log that's being written."""
+
+    DROP_OLDEST = "drop_oldest"
+    """Drop the oldest log in the queue to make room."""
+
+    SAMPLE = "sample"
+    """Drop logs with increasing probability as the queue fills up.
+
+    Logs are always accepted while the queue is less than half full. Beyond
+    that, the chance of dropping a log grows linearly with the depth of the
+    queue, reaching certainty when the queue is full.
+    """
+
+
+class _Sample:
+    """Exposure sampling state for a call."""
+
+    __slots__ = ("hash", "feature_rate", "max_rate", "rollout", "rate")
+
+    def __init__(self, hash: float, feature_rate: float, max_rate: float):
+        self.hash = hash
+        self.feature_rate = feature_rate
+        self.max_rate = max_rate
+        self.rollout: Any = None
+        self.rate: Optional[float] = None
+
+
+def _on_event_loop() -> bool:
+    """Check whether the current thread is running an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _entity_id(entity: Any) -> Optional[EntityId]:
+    """Get the ID of an entity, or None if it doesn't have one."""
+    try:
+        if hasattr(entity, "id") or "id" in entity:
+            return get_entity_id(entity)
+    except TypeError:
+        pass
+    return None
+
+
+def _snapshot(value: Any) -> Any:
+    """Copy a value the caller might mutate after it's logged.
+
+    Values that are known to be immutable aren't copied. Plain dicts, lists,
+    and tuples (the shape of most variant values) are copied directly, which
+    is much cheaper than `deepcopy`; anything else is deep-copied.
+    """
+    try:
+        return _copy_plain(value)
+    except RecursionError:
+        # Probably a cycle, which `deepcopy` can handle.
+        pass
+    except Exception:
+        return value
+    try:
+        return copy.deepcopy(value)
+    except Exception:
+        return value
+
+
+def _copy_plain(value: Any) -> Any:
+    """Copy plain data, deep-copying anything else."""
+    cls = type(value)
+    if cls in _ATOMIC:
+        return value
+    if cls is dict:
+        return {k: _copy_plain(v) for k, v in value.items()}
+    if cls is list:
+        return [_copy_plain(v) for v in value]
+    if cls is tuple:
+        items = tuple(_copy_plain(v) for v in value)
+        # Tuples of immutable values are immutable.
+        if all(a is b for a, b in zip(items, value)):
+            return value
+        return items
+    return copy.deepcopy(value)
+
+
+class _Deferred:
+    """Field of a record that is serialized by a worker when it's written.
+
+    The result is computed once and shared by every record for the call.
+    """
+
+    __slots__ = ("_source", "_value")
+
+    def __init__(self, fn: Callable, *args):
+        self._source: Optional[tuple[Callable, tuple]] = (fn, args)
+        self._value: Any = None
+
+    def get(self) -> Any:
+        """Get the serialized value."""
+        # Read the source once: another worker might be about to clear it.
+        source = self._source
+        if source is not None:
+            # Two workers might both get here and serialize the same thing,
+            # which is only wasted work.
+            fn, args = source
+            self._value = fn(*args)
+            # Don't keep the source objects alive any longer than needed. The
+            # value is set first, so anyone who sees this cleared can use it.
+            self._source = None
+        return self._value
+
+
 class ObjectLogger(DeferrableLogger):
-    """Logger that aggregates event data as an object."""
+    """Logger that aggregates event data as an object.
+
+    The record for a call is built up while the feature is evaluated and is
+    frozen once the gate is left. Writing a record only copies its header
+    (`call_id`, `repeat`, and `extra`); the body (feature, entity, trace, etc.)
+    is shared between every record written for the call, so `write` callbacks
+    must treat records as read-only. The assigned value and `extra` data are
+    copied when they're captured, so the caller is free to mutate its own
+    copies afterwards.
+
+    With `lazy=True` the entity and trace are captured by reference and only
+    serialized by the worker threads, after the log is written. That takes
+    serialization off the request path, but it means the logger sees the
+    entity as it is when the worker gets to it, not as it was when the
+    feature was evaluated. So either:
+      - don't mutate entities after passing them to a feature, or
+      - pass a `snapshot` function, which is called on the request path and
+        should return a cheap copy that won't change (for example
+        `copy.copy`, or a tuple of the fields that matter).
+    Trace events are always kept by reference, so with `trace=True` anything
+    they refer to mustn't be mutated either.
+    """
 
     def __init__(
         self,
@@ -50,6 +265,19 @@ class ObjectLogger(DeferrableLogger):
         trace: bool = False,
         workers: int = 1,
         install_signals: bool = True,
+        max_queue: int = 100_000,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_NEWEST,
+        block_timeout: float = 1.0,
+        batch_size: int = 1,
+        batch_interval: float = 0.1,
+        write_batch: Optional[Callable[[list[dict]], None]] = None,
+        sample_rate: Optional[float] = None,
+        dedup: Optional[ExposureDeduper] = None,
+        feature_refs: bool = False,
+        project_entities: bool = False,
+        lazy: bool = False,
+        snapshot: Optional[Callable[[Any], Any]] = None,
+        deferred_ttl: Optional[float] = 60.0,
     ):
         """Create a new ObjectLogger with the given `write` callback.
 
@@ -60,14 +288,91 @@ class ObjectLogger(DeferrableLogger):
             install_signals - Whether to install signal handlers for cleanup.
                 If you are running in an environment like uvicorn, there may be
                 conflicts with signal handlers.
+            max_queue - Maximum number of logs waiting to be written.
+            overflow - What to do with logs when the queue is full.
+            block_timeout - Seconds to wait for space in the queue with the
+                `BLOCK` overflow policy before dropping the log.
+            batch_size - Maximum number of logs to hand to a worker at once.
+            batch_interval - Maximum number of seconds a worker waits for a
+                batch to fill up before writing a partial batch.
+            write_batch - Optional callback to write a whole batch of logs at
+                once. If not given, `write` is called for each log.
+            sample_rate - Default fraction of calls to log, for features and
+                rollouts that don't set their own `sample_rate`. Sampling is
+                deterministic by entity. Sampled records include the
+                `sample_rate` they were sampled at, for reweighting; records
+                of features without any sampling configured don't.
+            dedup - Optional de-duplicator to suppress repeat exposures of the
+                same variant to the same entity. Suppressed exposures are
+                counted and written periodically as a summary record with
+                `"record": "dedup_summary"`.
+            feature_refs - Whether to log features by reference. Records then
+                only contain the feature's name and `fingerprint` (a content
+                hash of its definition). The full definition is written once
+                per fingerprint as a `"record": "definition"` record, before
+                the first record that refers to it.
+            project_entities - Whether to log only the entity fields that the
+                feature reads (see `Feature.entity_fields`), plus its `id`.
+                Features that might read any field, for example through a
+                functor variant, still log the whole entity.
+            lazy - Whether to serialize entities and traces in the worker
+                threads instead of while the feature is evaluated. See the
+                class docs for the rules this imposes on entities.
+            snapshot - Optional function to copy an entity when `lazy` is on.
+                The copy is serialized instead of the entity.
+            deferred_ttl - Seconds to keep the record for a call, so that its
+                log can be written (or written again) later. Records that are
+                still around after this are dropped by a background thread.
+                None keeps records until they're dropped with `drop_log`,
+                for example by a `deferral_scope`.
         """
-        self._cv = threading.Condition()
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        lock = threading.RLock()
+        self._cv = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
         self._write = write
         self._cache = dict[str, dict]()
-        self._finished = list[dict]()
+        self._finished = collections.deque[dict]()
+        self._max_queue = max_queue
+        self._overflow = overflow
+        self._block_timeout = block_timeout
+        self._warned_block = False
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+        self._write_batch = write_batch
+        self._sample_rate = sample_rate
+        self._samples = dict[str, _Sample]()
+        self._dedup = dedup
+        # Entities of calls that haven't been let through by `dedup` yet.
+        self._entity_ids = dict[str, EntityId]()
+        # Calls that `dedup` suppressed.
+        self._suppressed = set[str]()
+        self._feature_refs = feature_refs
+        self._project_entities = project_entities
+        self._lazy = lazy
+        self._snapshot = snapshot
+        # Features whose definitions haven't been written yet, by fingerprint.
+        self._features = dict[str, Any]()
+        self._written_definitions = set[str]()
         self._deferred = set[str]()
+        # Deferred logs that haven't been written yet.
+        self._unwritten = set[str]()
+        # When each call's record expires, oldest first.
+        self._expires = dict[str, float]()
+        self._deferred_ttl = deferred_ttl
         self._trace = trace
         self._stopped = False
+        self._enqueued = 0
+        self._written = 0
+        self._failed = 0
+        self._dropped = 0
+        self._max_depth = 0
+        self._expired = 0
+        self._never_written = 0
         self._workers = [
             threading.Thread(
                 name=f"ObjectLogger-io-{w}", target=self._write_results, daemon=True
@@ -77,6 +382,22 @@ class ObjectLogger(DeferrableLogger):
         for w in self._workers:
             w.start()
 
+        self._summary_stop = threading.Event()
+        self._summarizer: Optional[threading.Thread] = None
+        if dedup:
+            self._summarizer = threading.Thread(
+                name="ObjectLogger-dedup", target=self._summarize, daemon=True
+            )
+            self._summarizer.start()
+
+        self._reaper_stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        if deferred_ttl is not None:
+            self._reaper = threading.Thread(
+                name="ObjectLogger-reaper", target=self._reap, daemon=True
+            )
+            self._reaper.start()
+
         # Cleanup threads and try to drain the queue if possible when exiting.
         atexit.register(self._drain)
         if install_signals:
@@ -87,27 +408,99 @@ class ObjectLogger(DeferrableLogger):
     def stop(self):
         """Shut off the logger and send any pending messages."""
         self._drain()
+        # Nothing is left to drain at exit, and the hook would keep us alive.
+        atexit.unregister(self._drain)
+
+    def stats(self) -> dict:
+        """Get a snapshot of the logger's counters.
+
+        Returns:
+            Dictionary of counters.
+        """
+        with self._cv:
+            stats: dict[str, Any] = {
+                "depth": len(self._finished),
+                "max_depth": self._max_depth,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "deferred": len(self._cache),
+                "expired": self._expired,
+                "never_written": self._never_written,
+            }
+            if self._dedup:
+                stats["dedup"] = self._dedup.stats()
+            return stats
 
     def __call__(self, event, now: NowFn = default_now):
         """Log a single event."""
         # Every event tracks an ID that is unique to the invocation.
         call_id = event.call_id
 
+        sample = None
+        entity: Any = None
+        if event == events.EnterGate:
+            sample = self._sample(event.feature, event.entity)
+            # Don't bother building a record for an entity that can't be
+            # sampled, whichever rollout it ends up in.
+            if sample and sample.hash >= sample.max_rate:
+                return
+            if self._lazy:
+                source = event.entity
+                if self._snapshot:
+                    source = self._snapshot(source)
+                entity = _Deferred(self._entity_record, event.feature, source)
+            else:
+                # Serializing the entity can be slow, so do it before taking
+                # the lock.
+                entity = self._entity_record(event.feature, event.entity)
+
+        assignment: Any = None
+        if event == events.LeaveGate and call_id in self._cache:
+            # Copying the value can be slow, so do it before taking the lock.
+            assignment = _snapshot(event.value)
+
         with self._cv:
             if event == events.EnterGate:
+                if sample:
+                    self._samples[call_id] = sample
+                if self._dedup:
+                    # Entities without an ID aren't de-duplicated.
+                    entity_id = _entity_id(event.entity)
+                    if entity_id is not None:
+                        self._entity_ids[call_id] = entity_id
                 self._cache[call_id] = {
                     "ts": now(),
                     "call_id": call_id,
-                    "entity": simple_object(event.entity, with_type=True),
-                    "feature": event.feature.to_dict(),
+                    "entity": entity,
+                    "feature": self._feature_record(event.feature),
                     "assignment": None,
                     "variant": "",
                     "trace": None if not self._trace else [],
                     "repeat": False,
                     "sticky": False,
                 }
+                if self._deferred_ttl is not None:
+                    self._expires[call_id] = time.monotonic() + self._deferred_ttl
+            elif call_id not in self._cache:
+                # Call wasn't sampled.
+                return
 
-            if self._trace:
+            sample = self._samples.get(call_id)
+            if sample and sample.rate is None:
+                # The rate is set by the first (outermost) rollout that the
+                # entity is a member of.
+                if event == events.EnterRollout:
+                    sample.rollout = event.rollout
+                elif event == events.LeaveRollout and event.member:
+                    sample.rate = sample.rollout.sample_rate
+                    if sample.rate is None:
+                        sample.rate = sample.feature_rate
+
+            if self._trace and self._lazy:
+                self._cache[call_id]["trace"].append(event)
+            elif self._trace:
                 cur = self._cache[call_id]
                 d = event.asdict(
                     exclude={
@@ -139,20 +532,47 @@ class ObjectLogger(DeferrableLogger):
                 )
 
             if event == events.LeaveGate:
-                self._cache[call_id]["assignment"] = event.value
+                if sample:
+                    del self._samples[call_id]
+                    rate = sample.feature_rate if sample.rate is None else sample.rate
+                    if sample.hash >= rate:
+                        del self._cache[call_id]
+                        self._entity_ids.pop(call_id, None)
+                        self._expires.pop(call_id, None)
+                        return
+                    self._cache[call_id]["sample_rate"] = rate
+                self._cache[call_id]["assignment"] = assignment
+                if self._trace and self._lazy:
+                    cur = self._cache[call_id]
+                    cur["trace"] = _Deferred(self._trace_records, cur["trace"], cur)
                 # Note that log is not written immediately. Call `write_log` to
                 # put it in the queue.
                 self._deferred.add(call_id)
+                self._unwritten.add(call_id)
 
     def write_log(self, call_id, extra=None):
         """Write a deferred log by its ID."""
+        dedup_key = self._dedup_key(call_id) if self._dedup else None
+        suppressed = dedup_key is not None and cast(
+            ExposureDeduper, self._dedup
+        ).is_repeat(dedup_key)
+        if extra:
+            # Copying the data can be slow, so do it before taking the lock.
+            extra = _snapshot(extra)
+
         with self._cv:
-            if call_id not in self._deferred:
+            if suppressed:
+                # Later writes of this call are suppressed too, without being
+                # counted again.
+                self._suppressed.add(call_id)
+                return
+            if call_id not in self._deferred or call_id in self._suppressed:
                 return
 
-            # Make a copy of the event data to write. This freezes the data at
-            # this moment in time.
-            data = copy.deepcopy(self._cache[call_id])
+            # The body of the record doesn't change after the gate is left, so
+            # only the header needs to be copied to freeze the data at this
+            # moment in time.
+            data = self._cache[call_id].copy()
             # If this event has been sent before, generate a new ID for it.
             if data["repeat"]:
                 data["call_id"] = seq_id(data["call_id"])
@@ -161,29 +581,270 @@ class ObjectLogger(DeferrableLogger):
             if extra:
                 data["extra"] = extra
 
-            # Add to queue to publish.
-            self._finished.append(data)
-            # Mark the cached object as a repeat if it's logged again.
-            self._cache[call_id]["repeat"] = True
-            # Wake a sender thread to broadcast the log.
-            self._cv.notify()
+            if self._feature_refs:
+                self._enqueue_definition(data["feature"]["fingerprint"])
+            if not self._enqueue(data):
+                return
+
+            # Mark the cached object as a repeat if it's logged again. (It may
+            # have been evicted while waiting for room in the queue.)
+            cur = self._cache.get(call_id)
+            if cur is not None:
+                cur["repeat"] = True
+            self._unwritten.discard(call_id)
+            # The call has been let through, so writing it again (as the
+            # exposure after the assignment, say) isn't a repeat exposure.
+            self._entity_ids.pop(call_id, None)
+
+        if dedup_key is not None:
+            # Only remember exposures that were actually queued, so that one
+            # dropped by the overflow policy doesn't suppress the next.
+            cast(ExposureDeduper, self._dedup).let_through(dedup_key)
+
+    def _enqueue(self, data: dict) -> bool:
+        """Add a record to the queue to publish (holding the lock).
+
+        Returns:
+            Whether the record was queued.
+        """
+        if not self._make_room():
+            self._dropped += 1
+            return False
+        self._finished.append(data)
+        self._enqueued += 1
+        self._max_depth = max(self._max_depth, len(self._finished))
+        # Wake a sender thread to broadcast the log.
+        self._cv.notify()
+        return True
+
+    def _entity_record(self, feature, entity) -> dict:
+        """Get the representation of an entity for a record.
+
+        This is the whole entity, unless `project_entities` is on.
+        """
+        if self._project_entities:
+            paths = getattr(feature, "entity_fields", None)
+            if paths is not None:
+                return project_object(entity, paths, with_type=True)
+        return simple_object(entity, with_type=True)
+
+    def _trace_records(self, trace: list, record: dict) -> list[dict]:
+        """Serialize the trace events of a call, for `lazy` logging."""
+        exclude = {
+            "call_id": record["call_id"],
+            "entity": record["entity"].get()["value"],
+            "feature": record["feature"],
+        }
+        return [event.asdict(exclude=exclude, compress=True) for event in trace]
+
+    def _materialize(self, batch: list[dict]):
+        """Serialize any deferred fields of logs (without holding the lock).
+
+        Logs that fail to serialize are removed from the batch and counted
+        as failed.
+        """
+        if not self._lazy:
+            return
+        ok = list[dict]()
+        for data in batch:
+            try:
+                for k, v in data.items():
+                    if isinstance(v, _Deferred):
+                        data[k] = v.get()
+            except Exception as e:
+                log.error("😓 Failed to serialize event: {}".format(e))
+                with self._cv:
+                    self._failed += 1
+            else:
+                ok.append(data)
+        batch[:] = ok
+
+    def _feature_record(self, feature) -> dict:
+        """Get the representation of a feature for a record (holding the lock).
+
+        This is the full definition, unless `feature_refs` is on.
+        """
+        if not self._feature_refs:
+            return feature.to_dict()
+        fingerprint = feature.fingerprint
+        if fingerprint not in self._written_definitions:
+            self._features[fingerprint] = feature
+        return {"name": feature.name, "fingerprint": fingerprint}
+
+    def _enqueue_definition(self, fingerprint: str):
+        """Queue a feature's definition record the first time it's needed.
+
+        The lock must be held when calling this.
+        """
+        feature = self._features.get(fingerprint)
+        if feature is None:
+            return
+        definition = {
+            "record": "definition",
+            "fingerprint": fingerprint,
+            "feature": feature.to_dict(),
+        }
+        if self._enqueue(definition):
+            del self._features[fingerprint]
+            self._written_definitions.add(fingerprint)
+
+    def _dedup_key(self, call_id: str) -> Optional[DedupKey]:
+        """Get the key to de-duplicate a call's exposure by.
+
+        This reads the (frozen) record without taking the logger's lock; the
+        de-duplicator has its own, sharded, locks.
+
+        Returns:
+            The key, or None if the call doesn't need to be checked because
+            it's already been let through or suppressed.
+        """
+        record = self._cache.get(call_id)
+        entity_id = self._entity_ids.get(call_id)
+        if record is None or entity_id is None or call_id in self._suppressed:
+            return None
+        variant = record["variant"]
+        return (
+            record["feature"]["name"],
+            entity_id,
+            variant.get("name", "") if isinstance(variant, dict) else str(variant),
+        )
+
+    def _summarize(self):
+        """[THREAD] Periodically queue a summary of suppressed exposures."""
+        dedup = cast(ExposureDeduper, self._dedup)
+        while not self._summary_stop.wait(dedup.summary_interval):
+            self._queue_summary()
+
+    def _queue_summary(self):
+        """Queue a summary of suppressed exposures, if there were any."""
+        summary = cast(ExposureDeduper, self._dedup).summary()
+        if summary:
+            with self._cv:
+                self._enqueue(summary)
 
     def drop_log(self, call_id):
         """Drop a deferred log by its ID."""
         with self._cv:
-            self._deferred.remove(call_id)
-            try:
-                del self._cache[call_id]
-            except KeyError:
-                pass
+            self._evict(call_id)
+
+    def _evict(self, call_id: str):
+        """Forget everything about a call (holding the lock)."""
+        self._deferred.discard(call_id)
+        self._cache.pop(call_id, None)
+        self._samples.pop(call_id, None)
+        self._entity_ids.pop(call_id, None)
+        self._suppressed.discard(call_id)
+        self._expires.pop(call_id, None)
+        if call_id in self._unwritten:
+            self._unwritten.remove(call_id)
+            self._never_written += 1
+
+    def _reap(self):
+        """[THREAD] Periodically drop records that have expired."""
+        ttl = cast(float, self._deferred_ttl)
+        interval = min(1.0, max(0.01, ttl / 2))
+        while not self._reaper_stop.wait(interval):
+            now = time.monotonic()
+            with self._cv:
+                # Every record has the same TTL, so they expire in order.
+                while self._expires:
+                    call_id, deadline = next(iter(self._expires.items()))
+                    if deadline > now:
+                        break
+                    self._evict(call_id)
+                    self._expired += 1
+
+    def _sample(self, feature, entity) -> Optional["_Sample"]:
+        """Get the sampling state for a call, if sampling is configured.
+
+        Args:
+            feature - Feature being evaluated
+            entity - Entity the feature is being evaluated for
+
+        Returns:
+            Sampling state, or None if every call should be logged.
+        """
+        feature_rate = feature.sample_rate
+        if feature_rate is None:
+            feature_rate = self._sample_rate
+        rollout_rates = [r.sample_rate for r in feature.rollouts]
+        if feature_rate is None and all(r is None for r in rollout_rates):
+            return None
+
+        if feature_rate is None:
+            feature_rate = 1.0
+        max_rate = max(
+            feature_rate, *(feature_rate if r is None else r for r in rollout_rates)
+        )
+        # Salted so it's independent of the rollout randomizer, which hashes
+        # `{rollout.name}:{id}` (and rollouts may share the feature's name).
+        # Entities without an ID are sampled by their representation.
+        entity_id = _entity_id(entity)
+        key = repr(entity) if entity_id is None else entity_id[1]
+        h = hash_id(f"sample:{feature.name}:{key}")
+        return _Sample(h, feature_rate, max_rate)
+
+    def _make_room(self) -> bool:
+        """Apply the overflow policy before adding a log to the queue.
+
+        The lock must be held when calling this.
+
+        Returns:
+            Whether the new log should be added to the queue.
+        """
+        depth = len(self._finished)
+        if self._overflow == OverflowPolicy.SAMPLE:
+            low = self._max_queue // 2
+            if depth >= low:
+                p_drop = min(1.0, (depth - low) / (self._max_queue - low))
+                if random_float() < p_drop:
+                    return False
+            return True
+
+        if depth < self._max_queue:
+            return True
+
+        if self._overflow == OverflowPolicy.DROP_OLDEST:
+            self._finished.popleft()
+            self._dropped += 1
+            return True
+
+        if self._overflow == OverflowPolicy.BLOCK:
+            if _on_event_loop():
+                if not self._warned_block:
+                    self._warned_block = True
+                    log.warning("🧱 Not blocking the event loop on a full log queue")
+                return False
+            return (
+                self._not_full.wait_for(
+                    lambda: self._stopped or len(self._finished) < self._max_queue,
+                    timeout=self._block_timeout,
+                )
+                and not self._stopped
+            )
+
+        return False
 
     def _drain(self, *args):
         """Stop worker threads and drain the queue."""
+        if self._reaper:
+            self._reaper_stop.set()
+            self._reaper.join()
+            self._reaper = None
+
+        if self._summarizer:
+            self._summary_stop.set()
+            self._summarizer.join()
+            self._summarizer = None
+            # Summarize anything suppressed since the last summary.
+            self._queue_summary()
+
         if not self._stopped:
             log.debug("🙉 Stopping log write workers ...")
             with self._cv:
                 self._stopped = True
                 self._cv.notify_all()
+                self._not_full.notify_all()
             [w.join() for w in self._workers]
             self._workers = []
 
@@ -193,25 +854,63 @@ class ObjectLogger(DeferrableLogger):
 
             log.debug("🪵 Draining pending logs ...")
             while len(self._finished) > 0:
-                event = self._finished.pop(0)
+                batch = self._take_batch()
+                self._materialize(batch)
+                if not batch:
+                    continue
                 try:
-                    self._write_handled(event)
+                    self._write_batch_handled(batch)
                 except SystemExit:
                     continue
 
+    def _take_batch(self) -> list[dict]:
+        """Pop up to a batch of logs off the queue (holding the lock)."""
+        n = min(self._batch_size, len(self._finished))
+        batch = [self._finished.popleft() for _ in range(n)]
+        self._not_full.notify(n)
+        return batch
+
     def _write_results(self):
         """[THREAD] Loop over queue and write events as they are found."""
         while not self._stopped:
             with self._cv:
-                if not self._finished:
+                while not self._finished and not self._stopped:
                     self._cv.wait()
 
+                # Give a partial batch some time to fill up.
+                deadline = time.monotonic() + self._batch_interval
+                while not self._stopped and len(self._finished) < self._batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cv.wait(timeout=remaining)
+
                 if self._stopped:
                     return
 
-                event = self._finished.pop(0)
-            # Release the lock to write event, so that other workers can write.
-            self._write_handled(event)
+                batch = self._take_batch()
+            # Release the lock to write events, so that other workers can write.
+            if batch:
+                self._materialize(batch)
+            if batch:
+                self._write_batch_handled(batch)
+
+    def _write_batch_handled(self, batch: list[dict]):
+        """Write a batch of events with error handling."""
+        if not self._write_batch:
+            for event in batch:
+                self._write_handled(event)
+            return
+
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            log.error("😓 Failed to write {} events: {}".format(len(batch), e))
+            with self._cv:
+                self._failed += len(batch)
+        else:
+            with self._cv:
+                self._written += len(batch)
 
     def _write_handled(self, event):
         """Write an event with error handling."""
@@ -219,6 +918,15 @@ class ObjectLogger(DeferrableLogger):
             self._write(event)
         except Exception as e:
             log.error("😓 Failed to write event: {}".format(e))
+            with self._cv:
+                self._failed += 1
+        else:
+            with self._cv:
+                self._written += 1
+
+
+class SpoolFull(Exception):
+    """Raised when a request can't be delivered or spooled."""
 
 
 class NetworkLogger(ObjectLogger):
@@ -234,6 +942,10 @@ class NetworkLogger(ObjectLogger):
         max_retries=5,
         backoff_factor=1.0,
         debug=False,
+        batch_format: str = "ndjson",
+        compress: bool = False,
+        spool: Optional[Spool] = None,
+        replay_interval: float = 5.0,
         **kwargs,
     ):
         """Create a logger that sends data to a remote endpoint.
@@ -252,12 +964,33 @@ class NetworkLogger(ObjectLogger):
             backoff_factor - Exponential backoff factor; see requests docs.
             debug - Whether to print log lines to stderr in addition to sending
             them over the network.
+            batch_format - How to send multiple logs in one request when
+            `batch_size` is greater than 1. Either `ndjson` (one log per line)
+            or `json` (a JSON array of logs). The `body` function is applied
+            to each log in the batch.
+            compress - Whether to gzip request bodies.
+            spool - Optional on-disk spool for requests that can't be delivered.
+            While the spool has a backlog, new requests are spooled directly
+            (without trying the endpoint) and a background thread replays the
+            spool every `replay_interval` seconds until the endpoint recovers.
+            replay_interval - Seconds between attempts to replay the spool.
             **kwargs - See ObjectLogger.__init__
         """
+        if batch_format not in ("ndjson", "json"):
+            raise ValueError(f"Unknown batch format {batch_format!r}")
+
         self._url = url
         self._debug = debug
         self._body = body
         self._timeout = timeout
+        self._batch_format = batch_format
+        self._compress = compress
+        self._auth = auth
+        self._max_retries = max_retries
+        self._backoff_factor = backoff_factor
+        self._spool = spool
+        self._replay_interval = replay_interval
+        self._replay_stop = threading.Event()
 
         # Configure http adapter
         http = requests.Session()
@@ -280,18 +1013,123 @@ class NetworkLogger(ObjectLogger):
         http.mount("http://", adapter)
         http.mount("https://", adapter)
         http.auth = auth
-        http.headers.update(
-            {
-                "Content-Type": "application/json; charset=utf-8",
-            }
-        )
+        self._headers = {
+            "Content-Type": "application/json; charset=utf-8",
+        }
+        if compress:
+            self._headers["Content-Encoding"] = "gzip"
+        self._custom_type = any(k.lower() == "content-type" for k in headers or {})
         if headers:
-            http.headers.update(headers)
+            self._headers.update(headers)
+        http.headers.update(self._headers)
         self._http = http
 
         # Configure the base ObjectLogger.
+        if kwargs.get("batch_size", 1) > 1:
+            kwargs["write_batch"] = self._post_batch
         super().__init__(self._post, **kwargs)
 
+        self._replayer: Optional[threading.Thread] = None
+        if spool:
+            self._replayer = threading.Thread(
+                name="NetworkLogger-replay", target=self._replay, daemon=True
+            )
+            self._replayer.start()
+
+    def stats(self) -> dict:
+        """Get a snapshot of the logger's counters.
+
+        Returns:
+            Dictionary of counters, including the spool's counters (if there
+            is a spool) under `spool`.
+        """
+        stats = super().stats()
+        if self._spool:
+            stats["spool"] = self._spool.stats()
+        return stats
+
+    def _drain(self, *args):
+        """Drain the queue, then stop replaying and close the spool."""
+        super()._drain(*args)
+        self._finish_requests()
+        if self._replayer:
+            self._replay_stop.set()
+            self._replayer.join()
+            self._replayer = None
+        if self._spool:
+            self._spool.close()
+
+    def _finish_requests(self):
+        """Wait for requests that were sent in the background."""
+        pass
+
+    def _replay(self):
+        """[THREAD] Periodically try to deliver spooled requests."""
+        while not self._replay_stop.wait(self._replay_interval):
+            spool = cast(Spool, self._spool)
+            spool.sync()
+            if spool.depth:
+                n = spool.replay(self._replay_one)
+                self._debugw("Replayed {} spooled requests", n)
+
+    def _replay_one(self, record: bytes) -> bool:
+        """Try to deliver a spooled request.
+
+        Args:
+            record - Spooled request
+
+        Returns:
+            Whether the request was delivered.
+        """
+        req = json.loads(record)
+        try:
+            r = self._send(req["body"], headers=req["headers"])
+            r.raise_for_status()
+        except Exception as e:
+            self._debugw("Failed to replay spooled request: {}", e)
+            return False
+        return True
+
+    def _spool_request(self, s: str, headers: Optional[dict] = None) -> bool:
+        """Save a request to the spool to be replayed later.
+
+        Args:
+            s - Serialized request body
+            headers - Extra headers for the request
+
+        Returns:
+            Whether the request was spooled.
+        """
+        record = encode_json({"body": s, "headers": headers}).encode("utf-8")
+        if cast(Spool, self._spool).append(record):
+            return True
+        log.error("💾 Spool is full; dropping request")
+        return False
+
+    def _send_or_spool(self, s: str, headers: Optional[dict] = None):
+        """Send a request, spooling it if it can't be delivered.
+
+        Args:
+            s - Serialized request body
+            headers - Extra headers for the request
+        """
+        if self._spool and self._spool.depth:
+            # The endpoint was down recently. Keep requests in order and don't
+            # wait on retries; the replayer will find out when it's back.
+            if not self._spool_request(s, headers):
+                raise SpoolFull()
+            return
+
+        try:
+            r = self._send(s, headers=headers)
+            r.raise_for_status()
+        except Exception as e:
+            if not self._spool:
+                raise
+            self._debugw("Spooling request after failure: {}", e)
+            if not self._spool_request(s, headers):
+                raise SpoolFull() from e
+
     def _serialize(self, data):
         """Convert data to string.
 
@@ -323,9 +1161,7 @@ class NetworkLogger(ObjectLogger):
 
         try:
             s = self._serialize(data)
-            r = self._http.post(self._url, timeout=self._timeout, data=s)
-
-            r.raise_for_status()
+            self._send_or_spool(s)
             self._debugw("Log written")
         except HTTPError as e:
             self._debugw("Failed to write log: {}", e)
@@ -334,6 +1170,75 @@ class NetworkLogger(ObjectLogger):
         except Exception as e:
             self._debugw("Something unexpected happened: {}", e)
 
+    def _post_batch(self, batch: list[dict]):
+        """Write a batch of logs over the network in one request.
+
+        Logs that raise `SkipLog` while serializing are left out of the batch.
+        Errors are raised so the batch is counted as failed.
+
+        Args:
+            batch - Logs to write
+        """
+        self._debugw("Writing {} logs", len(batch))
+
+        encoded = self._encode_batch(batch)
+        if not encoded:
+            return
+
+        s, headers = encoded
+        self._send_or_spool(s, headers)
+        self._debugw("{} logs written", len(batch))
+
+    def _encode_batch(self, batch: list[dict]) -> Optional[tuple[str, Optional[dict]]]:
+        """Serialize a batch of logs as one request body.
+
+        Logs that raise `SkipLog` while serializing are left out of the batch.
+
+        Args:
+            batch - Logs to serialize
+
+        Returns:
+            The body and any headers that it needs, or None if every log in
+            the batch was skipped.
+        """
+        lines = list[str]()
+        for data in batch:
+            try:
+                lines.append(self._serialize(data))
+            except SkipLog:
+                self._debugw("Skipping writing log (intentionally)")
+
+        if not lines:
+            return None
+
+        if self._batch_format == "ndjson":
+            s = "\n".join(lines) + "\n"
+            content_type = "application/x-ndjson; charset=utf-8"
+        else:
+            s = "[" + ",".join(lines) + "]"
+            content_type = "application/json; charset=utf-8"
+
+        if self._custom_type:
+            return s, None
+        return s, {"Content-Type": content_type}
+
+    def _send(self, s: str, headers: Optional[dict] = None) -> requests.Response:
+        """POST a serialized body, compressing it if configured.
+
+        Args:
+            s - Request body
+            headers - Extra headers for this request
+
+        Returns:
+            The response.
+        """
+        data: str | bytes = s
+        if self._compress:
+            data = gzip.compress(s.encode("utf-8"))
+        return self._http.post(
+            self._url, timeout=self._timeout, data=data, headers=headers
+        )
+
     def _debugw(self, *args):
         """Write a debug line.
 
@@ -348,6 +1253,740 @@ class NetworkLogger(ObjectLogger):
         log.debug("🪵  " + args[0].format(*args[1:]))
 
 
+class AsyncNetworkLogger(NetworkLogger):
+    """Logger that writes results over the network from an event loop.
+
+    The `NetworkLogger` blocks a worker thread for every request, including
+    the time spent backing off between retries, so a handful of failing
+    requests can stall every worker. This logger instead runs requests on a
+    dedicated event loop thread, where any number of them (up to
+    `max_in_flight`) can be waiting on the network or backing off at once.
+    The worker threads only hand logs off to the loop, and block when the cap
+    is reached so that the queue's overflow policy applies.
+
+    Each attempt is sent with `requests` (so proxies, auth, and TLS settings
+    work as in `NetworkLogger`) on a pool of `max_in_flight` threads; waiting
+    to retry doesn't hold a thread.
+
+    Failed requests are retried on 413, 429, and 5xx statuses and on
+    connection errors, with "full jitter" exponential backoff.
+    """
+
+    RETRY_STATUSES = frozenset([413, 429, 500, 502, 503, 504])
+    """Statuses that are worth retrying."""
+
+    BACKOFF_MAX = 120.0
+    """Maximum number of seconds to wait between retries."""
+
+    def __init__(self, url, max_in_flight: int = 100, **kwargs):
+        """Create a logger that sends data to a remote endpoint.
+
+        Args:
+            url - Endpoint to log to
+            max_in_flight - Maximum number of concurrent requests (including
+            requests waiting to retry).
+            **kwargs - See NetworkLogger.__init__
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self._max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._flight_cv = threading.Condition()
+        self._in_flight = 0
+        self._delivered = 0
+        self._undelivered = 0
+        self._retries = 0
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(
+            ThreadPoolExecutor(
+                max_workers=max_in_flight, thread_name_prefix="AsyncNetworkLogger-io"
+            )
+        )
+        self._loop_thread = threading.Thread(
+            name="AsyncNetworkLogger-loop", target=self._run_loop, daemon=True
+        )
+        self._loop_thread.start()
+
+        # Retries are scheduled on the loop, so each request is one attempt.
+        http = requests.Session()
+        adapter = HTTPAdapter(max_retries=0, pool_maxsize=max_in_flight)
+        http.mount("http://", adapter)
+        http.mount("https://", adapter)
+        http.auth = kwargs.get("auth")
+        self._attempt_http = http
+
+        super().__init__(url, **kwargs)
+
+    def stats(self) -> dict:
+        """Get a snapshot of the logger's counters.
+
+        Logs are counted as `written` once the collector acknowledges them,
+        and as `failed` once they've run out of retries (and couldn't be
+        spooled).
+
+        Returns:
+            Dictionary of counters.
+        """
+        stats = super().stats()
+        with self._flight_cv:
+            stats.update(
+                {
+                    "written": self._delivered,
+                    "failed": self._undelivered,
+                    "in_flight": self._in_flight,
+                    "retries": self._retries,
+                }
+            )
+        return stats
+
+    def _finish_requests(self):
+        """Wait for requests in flight to finish, then stop the loop."""
+        with self._flight_cv:
+            self._flight_cv.wait_for(lambda: self._in_flight == 0)
+
+        if self._loop_thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+
+    def _run_loop(self):
+        """[THREAD] Run the event loop until the logger is drained."""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+            self._attempt_http.close()
+
+    def _write_batch_handled(self, batch: list[dict]):
+        """Hand a batch of logs off to the event loop.
+
+        This blocks while `max_in_flight` requests are already running.
+        Logs that can't be serialized are counted as failed.
+        """
+        if self._batch_size > 1:
+            try:
+                encoded = self._encode_batch(batch)
+            except Exception as e:
+                self._fail(len(batch), e)
+                return
+            if not encoded:
+                return
+            s, headers = encoded
+            reqs = [(s, headers, len(batch))]
+        else:
+            reqs = []
+            for data in batch:
+                try:
+                    reqs.append((self._serialize(data), None, 1))
+                except SkipLog:
+                    self._debugw("Skipping writing log (intentionally)")
+                except Exception as e:
+                    self._fail(1, e)
+
+        for s, headers, n in reqs:
+            if self._spool and self._spool.depth:
+                # See NetworkLogger._send_or_spool.
+                try:
+                    spooled = self._spool_request(s, headers)
+                except Exception as e:
+                    self._fail(n, e)
+                    continue
+                if not spooled:
+                    with self._flight_cv:
+                        self._undelivered += n
+                continue
+            self._slots.acquire()
+            with self._flight_cv:
+                self._in_flight += 1
+            asyncio.run_coroutine_threadsafe(self._deliver(s, headers, n), self._loop)
+
+    def _fail(self, n: int, e: Exception):
+        """Count logs that couldn't be handed off to the loop as failed.
+
+        Args:
+            n - Number of logs
+            e - Error that stopped them
+        """
+        log.error("😓 Failed to write {} events: {}".format(n, e))
+        with self._flight_cv:
+            self._undelivered += n
+
+    async def _deliver(self, s: str, headers: Optional[dict], n: int):
+        """[LOOP] Send a request, retrying with backoff if it fails.
+
+        Args:
+            s - Serialized request body
+            headers - Extra headers for this request
+            n - Number of logs in the request
+        """
+        data = s.encode("utf-8")
+        if self._compress:
+            data = gzip.compress(data)
+        all_headers = {**self._headers, **(headers or {})}
+
+        ok = False
+        try:
+            for attempt in range(self._max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(self._backoff(attempt))
+                    with self._flight_cv:
+                        self._retries += 1
+                try:
+                    status = await asyncio.to_thread(self._attempt, data, all_headers)
+                except requests.RequestException as e:
+                    self._debugw("Failed to write log: {}", e)
+                    continue
+
+                if status < 400:
+                    ok = True
+                    self._debugw("{} logs written", n)
+                    break
+                self._debugw("Failed to write log: HTTP {}", status)
+                if status not in self.RETRY_STATUSES:
+                    break
+        except Exception as e:
+            self._debugw("Something unexpected happened: {}", e)
+        finally:
+            spooled = not ok and self._spool and self._spool_request(s, headers)
+            if not ok and not spooled:
+                log.error("😓 Failed to write {} events".format(n))
+            with self._flight_cv:
+                if ok:
+                    self._delivered += n
+                elif not spooled:
+                    self._undelivered += n
+                self._in_flight -= 1
+                self._flight_cv.notify_all()
+            self._slots.release()
+
+    def _attempt(self, data: bytes, headers: dict) -> int:
+        """Send one request, without retrying.
+
+        Args:
+            data - Request body
+            headers - Request headers
+
+        Returns:
+            The HTTP status code of the response.
+        """
+        r = self._attempt_http.post(
+            self._url, data=data, headers=headers, timeout=self._timeout
+        )
+        r.close()
+        return r.status_code
+
+    def _backoff(self, attempt: int) -> float:
+        """Get a jittered delay before the given retry attempt.
+
+        Args:
+            attempt - Retry number (starting at 1)
+
+        Returns:
+            Seconds to wait.
+        """
+        cap = min(self.BACKOFF_MAX, self._backoff_factor * (2 ** (attempt - 1)))
+        return cap * random_float()
+
+
+class FileLogger(ObjectLogger):
+    """Logger that appends results to a newline-delimited JSON file.
+
+    This is meant for on-host collection, where a sidecar tails the file.
+    Records are serialized once and written in batches by a single writer
+    thread, so each batch costs one buffered write instead of one syscall per
+    log.
+
+    The file is rotated when it reaches `max_bytes` or is older than
+    `max_age` seconds. Rotated files are renamed to
+    `<path>.<YYYYmmddTHHMMSS>.<n>` (and gzipped if `compress` is set).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = 100 * 1024 * 1024,
+        max_age: Optional[float] = None,
+        compress: bool = False,
+        body=None,
+        batch_size: int = 1000,
+        batch_interval: float = 0.1,
+        **kwargs,
+    ):
+        """Create a logger that writes to a file.
+
+        Args:
+            path - File to append logs to
+            max_bytes - Size at which the file is rotated. None to disable.
+            max_age - Seconds after which the file is rotated. None to disable.
+            compress - Whether to gzip rotated files.
+            body - Function to transform each log before it's serialized. It
+            may raise `SkipLog` to leave the log out.
+            batch_size - Maximum number of logs to write at once.
+            batch_interval - Maximum number of seconds to wait for a batch to
+            fill up.
+            **kwargs - See ObjectLogger.__init__. There is always exactly one
+            writer thread.
+        """
+        self._path = path
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._compress = compress
+        self._body = body
+        self._file_lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._size = 0
+        self._opened = 0.0
+        self._rotations = 0
+
+        kwargs["workers"] = 1
+        super().__init__(
+            self._write_one,
+            batch_size=batch_size,
+            batch_interval=batch_interval,
+            write_batch=self._write_lines,
+            **kwargs,
+        )
+
+    def stats(self) -> dict:
+        """Get a snapshot of the logger's counters.
+
+        Returns:
+            Dictionary of counters.
+        """
+        stats = super().stats()
+        with self._file_lock:
+            stats["bytes"] = self._size
+            stats["rotations"] = self._rotations
+        return stats
+
+    def _drain(self, *args):
+        """Drain the queue, then close the file."""
+        super()._drain(*args)
+        with self._file_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _write_one(self, data: dict):
+        """Write a single log."""
+        self._write_lines([data])
+
+    def _write_lines(self, batch: list[dict]):
+        """Serialize a batch of logs and append them to the file.
+
+        Args:
+            batch - Logs to write
+        """
+        lines = list[str]()
+        for data in batch:
+            if self._body:
+                try:
+                    data = self._body(data)
+                except SkipLog:
+                    continue
+            lines.append(data if isinstance(data, str) else encode_json(data))
+        if not lines:
+            return
+
+        chunk = ("\n".join(lines) + "\n").encode("utf-8")
+        with self._file_lock:
+            if self._file and self._should_rotate():
+                self._rotate()
+            f = self._file or self._open()
+            f.write(chunk)
+            f.flush()
+            self._size += len(chunk)
+
+    def _should_rotate(self) -> bool:
+        """Check whether the current file is due to be rotated."""
+        if self._max_bytes is not None and self._size >= self._max_bytes:
+            return True
+        if self._max_age is not None and time.time() - self._opened >= self._max_age:
+            return True
+        return False
+
+    def _open(self) -> BinaryIO:
+        """Open the log file for appending (holding the file lock)."""
+        f = open(self._path, "ab", buffering=1024 * 1024)
+        self._file = f
+        self._size = f.tell()
+        self._opened = time.time()
+        return f
+
+    def _rotate(self):
+        """Close and rename the current file (holding the file lock)."""
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._rotations += 1
+
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        n = 0
+        while True:
+            n += 1
+            dest = f"{self._path}.{stamp}.{n}"
+            if not os.path.exists(dest) and not os.path.exists(dest + ".gz"):
+                break
+        os.rename(self._path, dest)
+
+        if self._compress:
+            with open(dest, "rb") as src, gzip.open(dest + ".gz", "wb") as gz:
+                shutil.copyfileobj(src, gz)
+            os.remove(dest)
+
+
+RollupKey = tuple[datetime, str, Optional[str], Optional[str]]
+"""Minute, feature, rollout, and variant of an exposure count."""
+
+
+class _RollupBuffer:
+    """Exposure counts and in-progress calls for one thread."""
+
+    __slots__ = ("lock", "thread", "counts", "calls")
+
+    def __init__(self):
+        # Only contended when the buffer is being flushed.
+        self.lock = threading.Lock()
+        self.thread = threading.current_thread()
+        self.counts = collections.Counter[RollupKey]()
+        # Call ID -> [feature, rollout, variant, rollout being evaluated]
+        self.calls = dict[str, list]()
+
+
+class RollupLogger(events.EventLogger):
+    """Logger that counts exposures instead of recording them.
+
+    Exposures are counted per minute by (feature, rollout, variant), which is
+    enough for monitoring dashboards without the cost of building a record
+    for every call. Each thread counts into its own buffer, so evaluation
+    doesn't contend on a shared lock. Every `interval` seconds (and on
+    `stop`) the buffers are merged and the counts are passed to `write` as a
+    list of rollup rows:
+
+    ```
+    {
+        "record": "exposure_rollup",
+        "minute": datetime,
+        "feature": str,
+        "rollout": Optional[str],  # None for sticky assignments
+        "variant": Optional[str],
+        "count": int,
+    }
+    ```
+
+    Counts for a minute may be spread across multiple flushes; sum by key.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[dict]], None],
+        interval: float = 60.0,
+        max_pending: int = 10_000,
+    ):
+        """Create a new rollup logger.
+
+        Args:
+            write - Callback for each flush of rollup rows.
+            interval - Seconds between flushes.
+            max_pending - Maximum number of calls in progress to track per
+            thread. Calls that never finish (because they raised) are
+            forgotten, oldest first, beyond this.
+        """
+        self._write = write
+        self._interval = interval
+        self._max_pending = max_pending
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffers = list[_RollupBuffer]()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = threading.Thread(
+            name="RollupLogger-flush", target=self._run, daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.stop)
+
+    def __call__(self, event, now: NowFn = default_now):
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            buf = self._local.buffer = _RollupBuffer()
+            with self._lock:
+                self._buffers.append(buf)
+
+        call_id = event.call_id
+        if event == events.EnterGate:
+            buf.calls[call_id] = [event.feature.name, None, None, None]
+            while len(buf.calls) > self._max_pending:
+                del buf.calls[next(iter(buf.calls))]
+            return
+
+        call = buf.calls.get(call_id)
+        if call is None:
+            return
+
+        # The first (outermost) rollout the entity is a member of counts.
+        if event == events.EnterRollout:
+            call[3] = event.rollout.name
+        elif event == events.LeaveRollout and event.member and call[1] is None:
+            call[1] = call[3]
+        elif event == events.ChoseVariant:
+            call[2] = event.variant.name
+        elif event == events.StickyAssignment and event.assigned:
+            call[2] = event.variant
+        elif event == events.LeaveGate:
+            del buf.calls[call_id]
+            minute = now().replace(second=0, microsecond=0)
+            with buf.lock:
+                buf.counts[minute, call[0], call[1], call[2]] += 1
+
+    def flush(self):
+        """Write out the counts collected so far."""
+        counts = collections.Counter[RollupKey]()
+        with self._lock:
+            buffers = list(self._buffers)
+        for buf in buffers:
+            with buf.lock:
+                counts.update(buf.counts)
+                buf.counts.clear()
+            # Calls left in the buffer of a dead thread will never finish.
+            if not buf.thread.is_alive():
+                with self._lock:
+                    self._buffers.remove(buf)
+
+        if not counts:
+            return
+
+        rows = [
+            {
+                "record": "exposure_rollup",
+                "minute": minute,
+                "feature": feature,
+                "rollout": rollout,
+                "variant": variant,
+                "count": n,
+            }
+            for (minute, feature, rollout, variant), n in counts.items()
+        ]
+        try:
+            self._write(rows)
+        except Exception as e:
+            log.error("😓 Failed to write exposure rollup: {}".format(e))
+
+    def stop(self):
+        """Stop the flush thread and write any remaining counts."""
+        if self._flusher:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+            self.flush()
+            # The exit hook would keep a stopped logger alive.
+            atexit.unregister(self.stop)
+
+    def _run(self):
+        """[THREAD] Flush counts periodically."""
+        while not self._stop.wait(self._interval):
+            self.flush()
+
+
+class SlowCallLogger(DeferrableLogger):
+    """Logger that captures the trace of slow evaluations.
+
+    Every event is passed through to the wrapped `logger` (if any). Alongside,
+    this keeps a reference to each event of a call in progress and times the
+    call from `EnterGate` to `LeaveGate`; nothing is serialized unless the
+    call turns out to be slow, so this is cheap enough to leave on.
+
+    When a call takes at least `threshold` seconds, its trace is serialized
+    into a record and kept in a ring buffer of the most recent `capacity`
+    slow calls (see `recent`). If a `write` function is given, the record is
+    also passed to it from a background thread:
+
+    ```
+    {
+        "record": "slow_call",
+        "ts": datetime,
+        "call_id": str,
+        "feature": str,
+        "entity": dict,
+        "assignment": Any,
+        "elapsed": float,  # seconds
+        "threshold": float,
+        "trace": list[dict],  # as in ObjectLogger with `trace=True`
+    }
+    ```
+
+    Events refer to live objects, so the trace reflects the entity and
+    values as they are when the call finishes.
+    """
+
+    def __init__(
+        self,
+        logger: Optional[events.EventLogger] = None,
+        threshold: float = 0.1,
+        write: Optional[Callable[[dict], None]] = None,
+        capacity: int = 100,
+        max_pending: int = 10_000,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """Create a new slow call logger.
+
+        Args:
+            logger - Logger to pass all events on to.
+            threshold - Seconds an evaluation can take before it's captured.
+            write - Optional callback for each slow call record.
+            capacity - Number of recent slow calls to keep for inspection.
+            max_pending - Maximum number of calls in progress to track. Calls
+            that never finish (because they raised) are forgotten, oldest
+            first, beyond this.
+            clock - Monotonic clock, in seconds.
+        """
+        self._logger = logger
+        self._logger_now = bool(logger) and events._accepts_now(logger)
+        self._threshold = threshold
+        self._write = write
+        self._max_pending = max_pending
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Call ID -> [start time, now function, events so far]
+        self._calls = dict[str, list]()
+        self._recent = collections.deque[dict](maxlen=capacity)
+        self._calls_timed = 0
+        self._slow = 0
+        self._abandoned = 0
+        # Slow call records waiting to be written.
+        self._cv = threading.Condition(self._lock)
+        self._unwritten = collections.deque[dict]()
+        self._stopped = False
+        self._writer: Optional[threading.Thread] = None
+        if write:
+            self._writer = threading.Thread(
+                name="SlowCallLogger-io", target=self._run, daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.stop)
+
+    def __call__(self, event, now: NowFn = default_now):
+        if self._logger:
+            if self._logger_now:
+                self._logger(event, now=now)
+            else:
+                # Plain functions like `print` get the time as a prefix.
+                cast(Callable, self._logger)(f"[{now()}]", event)
+
+        call_id = event.call_id
+        if event == events.EnterGate:
+            with self._lock:
+                self._calls[call_id] = [self._clock(), now, [event]]
+                while len(self._calls) > self._max_pending:
+                    del self._calls[next(iter(self._calls))]
+                    self._abandoned += 1
+            return
+
+        call = self._calls.get(call_id)
+        if call is None:
+            return
+        call[2].append(event)
+
+        if event == events.LeaveGate:
+            elapsed = self._clock() - call[0]
+            with self._lock:
+                self._calls.pop(call_id, None)
+                self._calls_timed += 1
+            if elapsed >= self._threshold:
+                self._capture(call_id, elapsed, call[1], call[2])
+
+    def write_log(self, call_id: str, extra: Optional[dict] = None):
+        """Write a deferred log with the wrapped logger, if it defers logs."""
+        if isinstance(self._logger, DeferrableLogger):
+            self._logger.write_log(call_id, extra=extra)
+
+    def drop_log(self, call_id: str):
+        """Drop a deferred log from the wrapped logger, if it defers logs."""
+        if isinstance(self._logger, DeferrableLogger):
+            self._logger.drop_log(call_id)
+
+    def recent(self) -> list[dict]:
+        """Get the most recent slow calls.
+
+        Returns:
+            Slow call records, oldest first.
+        """
+        with self._lock:
+            return list(self._recent)
+
+    def stats(self) -> dict:
+        """Get a snapshot of the logger's counters.
+
+        Returns:
+            Dictionary of counters, including the wrapped logger's counters
+            (if it has any) under `logger`.
+        """
+        with self._lock:
+            stats: dict[str, Any] = {
+                "calls": self._calls_timed,
+                "slow": self._slow,
+                "pending": len(self._calls),
+                "abandoned": self._abandoned,
+            }
+        if self._logger and hasattr(self._logger, "stats"):
+            stats["logger"] = self._logger.stats()
+        return stats
+
+    def stop(self):
+        """Write any remaining slow calls and stop the wrapped logger."""
+        if self._writer:
+            with self._cv:
+                self._stopped = True
+                self._cv.notify_all()
+            self._writer.join()
+            self._writer = None
+            # The exit hook would keep a stopped logger alive.
+            atexit.unregister(self.stop)
+        if self._logger and hasattr(self._logger, "stop"):
+            self._logger.stop()
+
+    def _capture(self, call_id: str, elapsed: float, now: NowFn, trace: list):
+        """Build the record of a slow call and queue it."""
+        enter = trace[0]
+        entity = simple_object(enter.entity, with_type=True)
+        exclude = {"call_id": call_id, "entity": entity["value"]}
+        record = {
+            "record": "slow_call",
+            "ts": now(),
+            "call_id": call_id,
+            "feature": enter.feature.name,
+            "entity": entity,
+            "assignment": trace[-1].value,
+            "elapsed": elapsed,
+            "threshold": self._threshold,
+            "trace": [e.asdict(exclude=exclude, compress=True) for e in trace],
+        }
+        log.debug(
+            "🐢 Slow evaluation of {} took {:.3f}s".format(record["feature"], elapsed)
+        )
+        with self._cv:
+            self._slow += 1
+            self._recent.append(record)
+            if self._write:
+                self._unwritten.append(record)
+                self._cv.notify()
+
+    def _run(self):
+        """[THREAD] Write slow call records as they're captured."""
+        write = cast(Callable[[dict], None], self._write)
+        while True:
+            with self._cv:
+                self._cv.wait_for(lambda: self._unwritten or self._stopped)
+                if not self._unwritten:
+                    return
+                record = self._unwritten.popleft()
+            try:
+                write(record)
+            except Exception as e:
+                log.error("😓 Failed to write slow call: {}".format(e))
+
+
 class PrintLogger(events.EventLogger):
     """Logger that dumps events and features from feature evaluation."""
 
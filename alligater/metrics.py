@@ -0,0 +1,253 @@
+import atexit
+import collections
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional, cast
+
+from .log import log
+
+MetricsWriter = Callable[[dict], None]
+"""Function to export a snapshot of metrics (see `Metrics.snapshot`)."""
+
+_BUCKETS_PER_DOUBLING = 4
+
+_BOUNDS = tuple(
+    1e-6 * 2 ** (i / _BUCKETS_PER_DOUBLING) for i in range(27 * _BUCKETS_PER_DOUBLING)
+)
+"""Upper bounds of histogram buckets, in seconds.
+
+Buckets are spaced logarithmically from 1µs to about two minutes, so every
+bucket is about 19% wider than the last. Anything larger goes in an overflow
+bucket.
+"""
+
+
+class Phase:
+    """Phases of a feature evaluation that are timed."""
+
+    TOTAL = "total"
+    """The whole evaluation, including logging."""
+
+    STICKY = "sticky"
+    """Looking up an existing assignment (in the local cache or remotely)."""
+
+    POPULATION = "population"
+    """Testing rollout populations and choosing an arm."""
+
+    VARIANT = "variant"
+    """Resolving the chosen variant's value, including nested features."""
+
+    LOG = "log"
+    """Writing the exposure log."""
+
+
+class Histogram:
+    """Latency histogram with fixed, logarithmically spaced buckets.
+
+    Recording a value is a binary search over the bucket bounds and a couple
+    of additions; no values are stored. Percentiles are estimated as the
+    upper bound of the bucket they fall in, so they're accurate to within a
+    bucket's width.
+
+    Histograms aren't thread-safe on their own; `FeatureMetrics` guards them.
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """Add a measurement.
+
+        Args:
+            seconds - Measured duration
+        """
+        self.counts[bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Estimate a percentile.
+
+        Args:
+            p - Percentile, in [0, 100]
+
+        Returns:
+            Estimated value, in seconds, or 0.0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * p / 100.0))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                # The overflow bucket (and the top of any bucket) is capped by
+                # the largest value actually seen.
+                return min(_BOUNDS[i], self.max) if i < len(_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        """Summarize the histogram.
+
+        Returns:
+            Dictionary with the count, sum, mean, max, and some percentiles.
+            Times are in seconds.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class FeatureMetrics:
+    """Counters and latency histograms for one feature."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = collections.Counter[str]()
+        self._histograms = dict[str, Histogram]()
+
+    def observe(self, outcome: str, timings: dict[str, float]):
+        """Record one evaluation.
+
+        Everything is recorded under one lock acquisition, so this is cheaper
+        than counting and timing each phase separately.
+
+        Args:
+            outcome - Counter to increment for the evaluation
+            timings - Duration of each phase of the evaluation (see `Phase`)
+        """
+        with self._lock:
+            self._counters[outcome] += 1
+            histograms = self._histograms
+            for phase, seconds in timings.items():
+                h = histograms.get(phase)
+                if h is None:
+                    h = histograms[phase] = Histogram()
+                # Same as `h.record`, without the cost of a call per phase.
+                h.counts[bisect_left(_BOUNDS, seconds)] += 1
+                h.count += 1
+                h.sum += seconds
+                if seconds > h.max:
+                    h.max = seconds
+
+    def count(self, name: str, n: int = 1):
+        """Increment a counter.
+
+        Args:
+            name - Counter to increment
+            n - Amount to increment by
+        """
+        with self._lock:
+            self._counters[name] += n
+
+    def snapshot(self) -> dict:
+        """Get a snapshot of the counters and histograms.
+
+        Returns:
+            Dictionary with `counters` and `latency` (by phase).
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "latency": {k: h.snapshot() for k, h in self._histograms.items()},
+            }
+
+
+class Metrics:
+    """Instrumentation for feature evaluations.
+
+    Metrics are kept per feature: counters of evaluations by outcome
+    (`assignment`, `exposure`, or `errors`), and histograms of how
+    long each `Phase` of the evaluation took. They're cumulative over the
+    life of the process.
+
+    Read them with `Alligater.stats`, or pass a `write` function to export a
+    snapshot every `interval` seconds (and once more on `stop`) to any
+    metrics system.
+
+    Metrics aren't free: every evaluation reads the clock twice per phase and
+    updates a histogram per phase under a lock. That's a few microseconds,
+    which is significant next to a small feature (`python -m bench.metrics`
+    measures it).
+    """
+
+    def __init__(self, write: Optional[MetricsWriter] = None, interval: float = 60.0):
+        """Create a metrics registry.
+
+        Args:
+            write - Optional function to export snapshots to.
+            interval - Seconds between exports.
+        """
+        self._write = write
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._features = dict[str, FeatureMetrics]()
+        self._stop = threading.Event()
+        self._exporter: Optional[threading.Thread] = None
+        if write:
+            self._exporter = threading.Thread(
+                name="Metrics-io", target=self._run, daemon=True
+            )
+            self._exporter.start()
+            atexit.register(self.stop)
+
+    def feature(self, name: str) -> FeatureMetrics:
+        """Get the metrics for a feature.
+
+        Args:
+            name - Name of the feature
+
+        Returns:
+            Metrics for the feature, created if necessary.
+        """
+        fm = self._features.get(name)
+        if fm is None:
+            with self._lock:
+                fm = self._features.setdefault(name, FeatureMetrics())
+        return fm
+
+    def snapshot(self) -> dict:
+        """Get a snapshot of the metrics of every feature.
+
+        Returns:
+            Dictionary of feature metrics by feature name.
+        """
+        with self._lock:
+            features = list(self._features.items())
+        return {name: fm.snapshot() for name, fm in features}
+
+    def stop(self):
+        """Stop exporting, after exporting one last snapshot."""
+        if not self._exporter:
+            return
+        self._stop.set()
+        self._exporter.join()
+        self._exporter = None
+        self._export()
+        # The exit hook would keep stopped metrics alive.
+        atexit.unregister(self.stop)
+
+    def _run(self):
+        """[THREAD] Export snapshots periodically."""
+        while not self._stop.wait(self._interval):
+            self._export()
+
+    def _export(self):
+        """Write a snapshot with the `write` function."""
+        try:
+            cast(MetricsWriter, self._write)(self.snapshot())
+        except Exception as e:
+            log.error("📉 Failed to export metrics: {}".format(e))
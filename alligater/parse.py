@@ -225,6 +225,15 @@ def _expand_feature(feature, default_feature=None):
     if "rollouts" in feature:
         result["rollouts"] = _expand_rollouts(feature["rollouts"])
 
+    if "sticky_timeout" in feature:
+        result["sticky_timeout"] = feature["sticky_timeout"]
+
+    if "sticky_timeout_policy" in feature:
+        result["sticky_timeout_policy"] = feature["sticky_timeout_policy"]
+
+    if "sample_rate" in feature:
+        result["sample_rate"] = feature["sample_rate"]
+
     # `type` is extraneous, remove it
     if "type" in result:
         del result["type"]
@@ -28,6 +28,14 @@ class PopulationSelector(abc.ABC):
     @abc.abstractmethod
     def to_dict(self) -> dict: ...
 
+    def entity_fields(self) -> Optional[func.FieldPaths]:
+        """Get the entity fields read to test membership.
+
+        Returns:
+            Set of field paths, or None if any part of the entity might be read.
+        """
+        return None
+
 
 class DefaultSelector(PopulationSelector):
     """Selector for 100% of the population."""
@@ -56,6 +64,9 @@ class DefaultSelector(PopulationSelector):
         )
         return True
 
+    def entity_fields(self):
+        return frozenset()
+
     def __eq__(self, other):
         if not isinstance(other, DefaultSelector):
             return False
@@ -91,6 +102,9 @@ class ExpressionSelector(PopulationSelector):
         """
         self.expression.validate()
 
+    def entity_fields(self):
+        return self.expression.entity_fields()
+
     async def __call__(self, call_id, entity, log=None, gater=None, now=default_now):
         """Check whether entity belongs to a this population.
 
@@ -144,6 +158,11 @@ class FeatureSelector(ExpressionSelector):
         self.feature = feature
         super().__init__(expr)
 
+    def entity_fields(self):
+        # The expression reads the other feature's result, and the other
+        # feature is only known by name.
+        return None
+
     async def __call__(self, call_id, entity, log=None, gater=None, now=default_now):
         """Check whether entity belongs to a this population.
 
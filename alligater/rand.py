@@ -1,8 +1,19 @@
+import itertools
+import os
 import random
+import threading
 from typing import Optional, Union
 
 _rand: Union[random.Random, random.SystemRandom] = random.SystemRandom()
 
+_MASK_128 = (1 << 128) - 1
+
+# Unique integers are a random base plus a counter. The base is drawn lazily
+# so that it comes from the RNG as it is after seeding.
+_unique_lock = threading.Lock()
+_unique_base: Optional[int] = None
+_unique_counter = itertools.count()
+
 
 def seed(num: Optional[int] = None):
     """Seed the random number generator.
@@ -14,7 +25,9 @@ def seed(num: Optional[int] = None):
     global _rand
     if num is None:
         _rand = random.SystemRandom()
-    _rand = random.Random(num)
+    else:
+        _rand = random.Random(num)
+    _reset_unique()
 
 
 def getrandbits(n: int) -> int:
@@ -28,3 +41,54 @@ def getrandbits(n: int) -> int:
     """
     global _rand
     return _rand.getrandbits(n)
+
+
+def random_float() -> float:
+    """Proxy to random.random using our RNG.
+
+    Returns:
+        Random float in [0.0, 1.0).
+    """
+    global _rand
+    return _rand.random()
+
+
+def unique_int() -> int:
+    """Get a 128-bit integer that won't repeat.
+
+    The integers are a random 128-bit base, drawn once per process, plus a
+    counter, so this doesn't need any randomness after the first call. The
+    base is redrawn in a forked child (from the system RNG, so that children
+    of the same parent don't collide) and when the RNG is seeded.
+
+    Returns:
+        Unique 128-bit integer.
+    """
+    global _unique_base
+    base = _unique_base
+    if base is None:
+        with _unique_lock:
+            if _unique_base is None:
+                _unique_base = getrandbits(128)
+            base = _unique_base
+    return (base + next(_unique_counter)) & _MASK_128
+
+
+def _reset_unique(base: Optional[int] = None):
+    """Start a new sequence of unique integers."""
+    global _unique_base, _unique_counter
+    with _unique_lock:
+        _unique_base = base
+        _unique_counter = itertools.count()
+
+
+def _reset_unique_after_fork():
+    """Draw a new base for unique integers in a forked child."""
+    global _unique_lock
+    # The parent's lock might have been held at the time of the fork.
+    _unique_lock = threading.Lock()
+    _reset_unique(random.SystemRandom().getrandbits(128))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_unique_after_fork)
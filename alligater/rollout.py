@@ -34,6 +34,7 @@ class Rollout:
         arms: Optional[Sequence[Union[str, Arm]]] = None,
         randomizer: Union[str, func._Expression] = DEFAULT_RANDOMIZER,
         sticky: Optional[bool] = None,
+        sample_rate: Optional[float] = None,
     ):
         """Construct a new Rollout.
 
@@ -48,12 +49,15 @@ class Rollout:
             all unspecified arms.
             randomizer - Expression to use to randomize treatment assignment.
             By default this randomizes using the `id` attribute of the input.
+            sample_rate - Optional fraction of exposures to log for entities
+            assigned by this rollout. Overrides the feature's rate.
         """
         self.name = name
         self.population = self._get_population(population)
         self.arms = self._get_arms(arms)
         self.randomize = self._get_randomizer(randomizer)
         self.sticky = sticky
+        self.sample_rate = sample_rate
 
     def _get_population(
         self, population: Union[PopulationSelector, str]
@@ -201,6 +205,9 @@ class Rollout:
         if not callable(self.randomize):
             raise ValidationError("Expected randomization function to be callable")
 
+        if self.sample_rate is not None and not 0.0 <= self.sample_rate <= 1.0:
+            raise ValidationError("Sample rate must be between 0 and 1")
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Rollout):
             return False
@@ -212,12 +219,27 @@ class Rollout:
                 self.arms == other.arms,
                 self.randomize == other.randomize,
                 self.sticky == other.sticky,
+                self.sample_rate == other.sample_rate,
             ]
         )
 
     def __repr__(self) -> str:
         return "<Rollout name={}>".format(self.name)
 
+    def entity_fields(self) -> Optional[func.FieldPaths]:
+        """Get the entity fields read by the population and randomizer.
+
+        Returns:
+            Set of field paths, or None if any part of the entity might be read.
+        """
+        population = self.population.entity_fields()
+        if population is None or not isinstance(self.randomize, func._Expression):
+            return None
+        randomize = self.randomize.entity_fields()
+        if randomize is None:
+            return None
+        return population | randomize
+
     def to_dict(self) -> dict:
         return {
             "type": "Rollout",
@@ -0,0 +1,269 @@
+import atexit
+import collections
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
+
+from .log import log
+
+if TYPE_CHECKING:
+    from .cache import AssignmentCache
+    from .feature import Feature
+
+
+class PendingAssignment(NamedTuple):
+    """A new sticky assignment waiting to be persisted."""
+
+    feature: "Feature"
+    entity: Any
+    variant: str
+    value: Any
+    ts: datetime
+
+
+BulkWriter = Callable[[list[PendingAssignment]], None]
+"""Function to persist a batch of assignments.
+
+The batch is acknowledged when the function returns. Raise to signal that the
+batch should be retried.
+"""
+
+
+class AssignmentSink:
+    """Persist new sticky assignments in the background.
+
+    Assignments are queued from the request path and flushed in batches to a
+    user-supplied bulk writer from a worker thread. Until a batch has been
+    written, its assignments are pinned in the gater's `AssignmentCache` so
+    that the local copy is treated as authoritative.
+
+    If the writer raises, the batch is retried (after `retry_interval`) up to
+    `max_retries` times before it's dropped. Dropped assignments stay pinned,
+    since the cache is then the only copy. The queue is bounded by
+    `max_pending`; assignments that don't fit are rejected (and logged) rather
+    than blocking the request path.
+    """
+
+    def __init__(
+        self,
+        write: BulkWriter,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 100_000,
+        max_retries: int = 5,
+        retry_interval: float = 1.0,
+    ):
+        """Create a new assignment sink.
+
+        Args:
+            write - Function to persist a batch of assignments.
+            batch_size - Maximum number of assignments to write at once.
+            flush_interval - Maximum number of seconds an assignment waits in
+            the queue before a partial batch is flushed.
+            max_pending - Maximum number of queued assignments.
+            max_retries - Number of times to retry a failed batch.
+            retry_interval - Seconds to wait before retrying a failed batch.
+        """
+        self._write = write
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._max_retries = max_retries
+        self._retry_interval = retry_interval
+        self._cache: Optional["AssignmentCache"] = None
+        self._cv = threading.Condition()
+        # Queue entries are (time enqueued, number of attempts, assignment).
+        self._queue = collections.deque[tuple[float, int, PendingAssignment]]()
+        self._stopped = False
+        self._enqueued = 0
+        self._written = 0
+        self._batches = 0
+        self._failed_batches = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._last_flush_latency = 0.0
+        self._worker = threading.Thread(
+            name="AssignmentSink-io", target=self._run, daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.stop)
+
+    def bind(self, cache: "AssignmentCache"):
+        """Attach the cache whose entries should be pinned until written.
+
+        Args:
+            cache - Assignment cache
+        """
+        self._cache = cache
+
+    def put(self, assignment: PendingAssignment) -> bool:
+        """Queue an assignment to be written.
+
+        Args:
+            assignment - New assignment
+
+        Returns:
+            True if the assignment was queued; False if it was rejected
+            because the queue is full or the sink is stopped.
+        """
+        with self._cv:
+            if self._stopped or len(self._queue) >= self._max_pending:
+                self._rejected += 1
+                log.error(
+                    "🚰 Assignment sink rejected {} assignment for {}".format(
+                        assignment.feature.name, assignment.entity
+                    )
+                )
+                return False
+
+            # Pin the assignment before it's visible to the worker, so it can't
+            # be unpinned before it's pinned.
+            if self._cache:
+                self._cache.set(
+                    assignment.feature,
+                    assignment.entity,
+                    assignment.variant,
+                    assignment.value,
+                    assignment.ts,
+                    pinned=True,
+                )
+            self._queue.append((time.monotonic(), 0, assignment))
+            self._enqueued += 1
+            self._max_depth = max(self._max_depth, len(self._queue))
+            if len(self._queue) >= self._batch_size:
+                self._cv.notify()
+            return True
+
+    def flush(self):
+        """Synchronously write everything in the queue."""
+        while True:
+            with self._cv:
+                batch = self._take_batch()
+            if not batch:
+                return
+
+            pending: Optional[list] = batch
+            while pending and not self._write_batch(pending):
+                pending = self._next_attempt(pending)
+                if pending:
+                    time.sleep(self._retry_interval)
+
+    def stop(self):
+        """Stop the worker and flush pending assignments."""
+        with self._cv:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cv.notify_all()
+        self._worker.join()
+        self.flush()
+        # The exit hook would keep a stopped sink alive.
+        atexit.unregister(self.stop)
+
+    def stats(self) -> dict:
+        """Get a snapshot of the sink's counters.
+
+        Returns:
+            Dictionary of counters. `oldest_pending_age` is in seconds.
+        """
+        with self._cv:
+            oldest = self._queue[0][0] if self._queue else None
+            return {
+                "pending": len(self._queue),
+                "max_depth": self._max_depth,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "batches": self._batches,
+                "failed_batches": self._failed_batches,
+                "dropped": self._dropped,
+                "rejected": self._rejected,
+                "oldest_pending_age": time.monotonic() - oldest if oldest else 0.0,
+                "last_flush_latency": self._last_flush_latency,
+            }
+
+    def _take_batch(self) -> list[tuple[float, int, PendingAssignment]]:
+        """Pop up to a batch of assignments off the queue (holding the lock)."""
+        n = min(self._batch_size, len(self._queue))
+        return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        """[THREAD] Flush batches when they're full or old enough."""
+        while True:
+            with self._cv:
+                while not self._stopped:
+                    if len(self._queue) >= self._batch_size:
+                        break
+                    if self._queue:
+                        age = time.monotonic() - self._queue[0][0]
+                        if age >= self._flush_interval:
+                            break
+                        self._cv.wait(timeout=self._flush_interval - age)
+                    else:
+                        self._cv.wait()
+                if self._stopped:
+                    return
+                batch = self._take_batch()
+
+            if self._write_batch(batch):
+                continue
+            retry = self._next_attempt(batch)
+            if retry:
+                # Back off before putting the batch back at the front of the
+                # queue. The worker is the only consumer, so this also backs
+                # off the rest of the queue.
+                with self._cv:
+                    self._cv.wait(timeout=self._retry_interval)
+                    self._queue.extendleft(reversed(retry))
+
+    def _write_batch(self, batch: list[tuple[float, int, PendingAssignment]]) -> bool:
+        """Write a batch and unpin its assignments.
+
+        Args:
+            batch - Queue entries to write
+
+        Returns:
+            Whether the batch was written.
+        """
+        assignments = [a for _, _, a in batch]
+        start = time.monotonic()
+        try:
+            self._write(assignments)
+        except Exception as e:
+            log.error(
+                "😓 Failed to write {} assignments (attempt {}): {}".format(
+                    len(batch), batch[0][1] + 1, e
+                )
+            )
+            with self._cv:
+                self._failed_batches += 1
+            return False
+
+        with self._cv:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_flush_latency = time.monotonic() - start
+
+        if self._cache:
+            for a in assignments:
+                self._cache.unpin(a.feature, a.entity, a.ts)
+        return True
+
+    def _next_attempt(
+        self, batch: list[tuple[float, int, PendingAssignment]]
+    ) -> Optional[list[tuple[float, int, PendingAssignment]]]:
+        """Get the batch to retry after a failure, or None to give up on it.
+
+        Args:
+            batch - Queue entries that failed to write
+
+        Returns:
+            Entries with their attempt counts bumped, if they should be retried.
+        """
+        attempts = batch[0][1] + 1
+        if attempts > self._max_retries:
+            with self._cv:
+                self._dropped += len(batch)
+            return None
+        return [(queued, attempts, a) for queued, _, a in batch]
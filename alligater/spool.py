@@ -0,0 +1,268 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import BinaryIO, Callable, Iterator, Optional
+
+log = logging.getLogger("alligater")
+
+_HEADER = struct.Struct(">II")
+"""Record header: payload length and CRC32 of the payload."""
+
+_SUFFIX = ".seg"
+
+
+class Spool:
+    """Durable write-ahead spool of opaque records.
+
+    Records are appended to segment files in a directory. Each record is
+    length-prefixed and checksummed, so a record that was torn by a crash is
+    detected (and discarded, along with the rest of its segment) on replay.
+    Writes are buffered and fsync'd at most once every `fsync_interval`
+    seconds, as well as when a segment is closed.
+
+    Records are replayed oldest-first and a segment file is deleted once all
+    of its records are delivered. Delivery is at-least-once: if the process
+    restarts part way through a segment, the whole segment is replayed again.
+
+    Disk usage is bounded by `max_bytes`; records that don't fit are rejected.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_bytes: int = 1024 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+    ):
+        """Open (or create) a spool in the given directory.
+
+        Segments left over from a previous process are picked up for replay.
+
+        Args:
+            path - Directory to keep segment files in
+            segment_bytes - Size at which a segment is closed and a new one
+            started.
+            max_bytes - Maximum total size of all segments.
+            fsync_interval - Maximum number of seconds between fsyncs.
+        """
+        self._path = path
+        self._segment_bytes = segment_bytes
+        self._max_bytes = max_bytes
+        self._fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        # Serializes replays, so a segment is only read by one thread.
+        self._replay_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        # Closed segments waiting to be replayed, oldest first, with the
+        # number of records in each.
+        self._closed = list[tuple[int, int]]()
+        self._bytes = 0
+        self._records = 0
+        for seq in sorted(self._segments()):
+            n, size = self._scan(seq)
+            if n:
+                self._closed.append((seq, n))
+                self._records += n
+                self._bytes += size
+            else:
+                os.remove(self._segment_path(seq))
+
+        self._seq = self._closed[-1][0] + 1 if self._closed else 0
+        self._active: Optional[BinaryIO] = None
+        self._active_records = 0
+        self._active_bytes = 0
+        # Index of the next record to replay in the oldest segment.
+        self._cursor = (-1, 0)
+        self._last_sync = time.monotonic()
+        self._dirty = False
+        self._appended = 0
+        self._rejected = 0
+        self._replayed = 0
+        self._corrupt = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of records waiting to be replayed."""
+        with self._lock:
+            return self._records
+
+    def append(self, record: bytes) -> bool:
+        """Add a record to the spool.
+
+        Args:
+            record - Data to spool
+
+        Returns:
+            True if the record was spooled, False if the spool is full.
+        """
+        size = _HEADER.size + len(record)
+        with self._lock:
+            if self._bytes + size > self._max_bytes:
+                self._rejected += 1
+                return False
+
+            if self._active and self._active_bytes + size > self._segment_bytes:
+                self._seal()
+            if not self._active:
+                self._active = open(self._segment_path(self._seq), "ab")
+
+            self._active.write(_HEADER.pack(len(record), zlib.crc32(record)))
+            self._active.write(record)
+            self._active_records += 1
+            self._active_bytes += size
+            self._records += 1
+            self._bytes += size
+            self._appended += 1
+            self._dirty = True
+
+            if time.monotonic() - self._last_sync >= self._fsync_interval:
+                self._sync()
+            return True
+
+    def sync(self):
+        """Flush and fsync the active segment."""
+        with self._lock:
+            self._sync()
+
+    def replay(self, deliver: Callable[[bytes], bool]) -> int:
+        """Deliver spooled records, oldest first.
+
+        Replay stops at the first record that isn't delivered; that record is
+        tried first on the next replay.
+
+        Args:
+            deliver - Function to deliver a record. Returns whether the record
+            was delivered.
+
+        Returns:
+            Number of records delivered.
+        """
+        delivered = 0
+        with self._replay_lock:
+            while True:
+                with self._lock:
+                    # Close the active segment if it's all that's left, so its
+                    # records can be replayed.
+                    if not self._closed and self._active_records:
+                        self._seal()
+                    if not self._closed:
+                        return delivered
+                    seq, _ = self._closed[0]
+
+                for offset, record in self._read(seq):
+                    if offset < self._replay_offset(seq):
+                        continue
+                    if not deliver(record):
+                        return delivered
+                    delivered += 1
+                    with self._lock:
+                        self._cursor = (seq, offset + 1)
+                        self._records -= 1
+                        self._replayed += 1
+
+                self._finish(seq)
+
+    def close(self):
+        """Close the active segment, syncing it to disk."""
+        with self._lock:
+            self._seal()
+
+    def stats(self) -> dict:
+        """Get a snapshot of the spool's counters.
+
+        Returns:
+            Dictionary of counters.
+        """
+        with self._lock:
+            return {
+                "depth": self._records,
+                "bytes": self._bytes,
+                "segments": len(self._closed) + (1 if self._active else 0),
+                "appended": self._appended,
+                "rejected": self._rejected,
+                "replayed": self._replayed,
+                "corrupt": self._corrupt,
+            }
+
+    def _replay_offset(self, seq: int) -> int:
+        """Get the index of the first record in a segment not yet replayed."""
+        cseq, offset = self._cursor
+        return offset if cseq == seq else 0
+
+    def _finish(self, seq: int):
+        """Remove a fully replayed segment."""
+        path = self._segment_path(seq)
+        with self._lock:
+            _, n = self._closed.pop(0)
+            # Records that couldn't be read (torn or corrupt) are gone too.
+            missing = n - self._replay_offset(seq)
+            if missing:
+                self._corrupt += missing
+                self._records -= missing
+            self._bytes -= os.path.getsize(path)
+            self._cursor = (-1, 0)
+        os.remove(path)
+
+    def _seal(self):
+        """Close the active segment so it can be replayed (holding the lock)."""
+        if not self._active:
+            return
+        self._sync()
+        self._active.close()
+        self._active = None
+        self._closed.append((self._seq, self._active_records))
+        self._seq += 1
+        self._active_records = 0
+        self._active_bytes = 0
+
+    def _sync(self):
+        """Flush and fsync the active segment (holding the lock)."""
+        if self._active and self._dirty:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def _segments(self) -> Iterator[int]:
+        """List sequence numbers of segments on disk."""
+        for name in os.listdir(self._path):
+            if name.endswith(_SUFFIX):
+                try:
+                    yield int(name[: -len(_SUFFIX)])
+                except ValueError:
+                    continue
+
+    def _segment_path(self, seq: int) -> str:
+        """Get the path of a segment file."""
+        return os.path.join(self._path, f"{seq:012d}{_SUFFIX}")
+
+    def _scan(self, seq: int) -> tuple[int, int]:
+        """Count the readable records in a segment and get its size."""
+        n = sum(1 for _ in self._read(seq))
+        return n, os.path.getsize(self._segment_path(seq))
+
+    def _read(self, seq: int) -> Iterator[tuple[int, bytes]]:
+        """Read records from a segment until the end or a bad record.
+
+        Yields:
+            Index of the record in the segment and its data.
+        """
+        with open(self._segment_path(seq), "rb") as f:
+            i = 0
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                length, crc = _HEADER.unpack(header)
+                record = f.read(length)
+                if len(record) < length or zlib.crc32(record) != crc:
+                    log.warning(
+                        "💾 Discarding corrupt tail of spool segment {}".format(seq)
+                    )
+                    return
+                yield i, record
+                i += 1
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import UTC, datetime
+
+from .cache import AssignmentCache
+from .feature import Feature
+from .variant import Variant
+
+
+class User:
+    def __init__(self, id):
+        self.id = id
+
+
+class TestAssignmentCache(unittest.TestCase):
+    def setUp(self):
+        self.foo = Feature(
+            "foo",
+            variants=[Variant("foo", "Foo"), Variant("bar", {"x": [1, 2]})],
+            default_arm="foo",
+        )
+        self.ts = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+
+    def test_snapshot_roundtrip(self):
+        cache = AssignmentCache()
+        cache.set(self.foo, {"id": "a"}, "foo", "Foo", self.ts)
+        cache.set(self.foo, {"id": 2}, "bar", {"x": [1, 2]}, self.ts, pinned=True)
+        cache.set(self.foo, User("a"), "bar", {"x": [1, 2]}, self.ts)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "assignments.db")
+            assert cache.dump(path) == 3
+            assert not os.path.exists(f"{path}.tmp")
+
+            restored = AssignmentCache()
+            # Newer entries are not overwritten by the snapshot.
+            restored.set(self.foo, {"id": "a"}, "bar", "Newer", self.ts)
+            assert restored.load(path, chunk_size=1) == 2
+
+            assert restored.get(self.foo, {"id": "a"}) == ("bar", "Newer", self.ts)
+            assert restored.get(self.foo, {"id": 2}) == ("bar", {"x": [1, 2]}, self.ts)
+            assert restored.get(self.foo, User("a")) == ("bar", {"x": [1, 2]}, self.ts)
+            # Restored entries aren't pinned.
+            restored.clear()
+            assert restored.get(self.foo, {"id": 2}) is None
+
+            with sqlite3.connect(path) as conn:
+                (n,) = conn.execute("SELECT COUNT(*) FROM assignments").fetchone()
+            assert n == 3
+
+    def test_snapshot_skips_unpicklable(self):
+        cache = AssignmentCache()
+        cache.set(self.foo, {"id": "a"}, "foo", "Foo", self.ts)
+        cache.set(self.foo, {"id": "b"}, "foo", lambda: "Foo", self.ts)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "assignments.db")
+            assert cache.dump(path) == 1
+            restored = AssignmentCache()
+            assert restored.load(path) == 1
+
+    def test_reload_invalidation(self):
+        cache = AssignmentCache()
+        cache.set(self.foo, {"id": "a"}, "foo", "Foo", self.ts)
+        cache.set(self.foo, {"id": "b"}, "bar", {"x": [1, 2]}, self.ts)
+        cache.set(self.foo, {"id": "c"}, "bar", {"x": [1, 2]}, self.ts, pinned=True)
+        cache.set(self.foo, {"id": "d"}, "baz", "Baz", self.ts)
+
+        reloaded = Feature(
+            "foo",
+            variants=[
+                Variant("foo", "Foo"),
+                Variant("bar", {"x": [3]}),
+                Variant("baz", lambda: "Baz", functor=True),
+            ],
+            default_arm="foo",
+        )
+
+        # Unchanged variant is kept as-is.
+        assert cache.get(reloaded, {"id": "a"}) == ("foo", "Foo", self.ts)
+        # Changed literal value is upgraded in place.
+        assert cache.get(reloaded, {"id": "b"}) == ("bar", {"x": [3]}, self.ts)
+        assert cache.get(reloaded, {"id": "b"}) == ("bar", {"x": [3]}, self.ts)
+        # Pinned entries are authoritative.
+        assert cache.get(reloaded, {"id": "c"}) == ("bar", {"x": [1, 2]}, self.ts)
+        # Changed nested variant is dropped.
+        assert cache.get(reloaded, {"id": "d"}) is None
+
+        # Removed variant is dropped.
+        removed = Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo")
+        assert cache.get(removed, {"id": "b"}) is None
+
+        stats = cache.stats()
+        assert stats["upgraded"] == 1
+        assert stats["invalidated"] == 2
+        assert stats["entries"] == 2
+        assert stats["pinned"] == 1
+
+    def test_snapshot_keeps_fingerprint(self):
+        cache = AssignmentCache()
+        cache.set(self.foo, {"id": "a"}, "bar", {"x": [1, 2]}, self.ts)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "assignments.db")
+            cache.dump(path)
+            restored = AssignmentCache()
+            restored.load(path)
+
+        reloaded = Feature(
+            "foo",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+        )
+        assert restored.get(reloaded, {"id": "a"}) == ("bar", "Bar", self.ts)
+
+    def test_snapshot_old_version(self):
+        """Snapshots from an older schema are discarded with a warning."""
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "assignments.db")
+            with sqlite3.connect(path) as conn:
+                conn.execute(
+                    "CREATE TABLE assignments (feature TEXT, entity_type TEXT, "
+                    "entity_id BLOB, variant TEXT, value BLOB, ts BLOB)"
+                )
+            restored = AssignmentCache()
+            with self.assertLogs("alligater", level="WARNING") as logs:
+                assert restored.load(path) == 0
+            assert "schema version 1" in logs.output[0]
+            assert restored.get(self.foo, {"id": "a"}) is None
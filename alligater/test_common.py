@@ -1,10 +1,50 @@
+import enum
+import os
+import time
 import unittest
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import date, datetime
 
-from .common import simple_object
+from .common import (
+    CoarseClock,
+    encode_json,
+    get_uuid,
+    project_object,
+    seq_id,
+    simple_object,
+)
+from .rand import seed
 
 
 class TestCommon(unittest.TestCase):
+    def test_get_uuid(self):
+        seed(0)
+        ids = [get_uuid() for _ in range(1000)]
+        assert ids[0] == "e3e70682-c209-4cac-629f-6fbed82c07cd"
+        assert ids[1] == "e3e70682-c209-4cac-629f-6fbed82c07ce"
+        assert len(set(ids)) == len(ids)
+        assert seq_id(ids[0]) == "e3e70682-c209-4cac-629f-6fbed82c07cd:1"
+
+        # Seeding starts the sequence over.
+        seed(0)
+        assert get_uuid() == ids[0]
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+    def test_get_uuid_fork(self):
+        seed(0)
+        get_uuid()
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(w, get_uuid().encode("ascii"))
+            os._exit(0)
+        os.close(w)
+        child = os.read(r, 64).decode("ascii")
+        os.close(r)
+        os.waitpid(pid, 0)
+        assert len(child) == 36
+        assert child != get_uuid()
+
     def test_simple_object(self):
         @dataclass
         class Foo:
@@ -45,3 +85,116 @@ class TestCommon(unittest.TestCase):
                 "id": "a-1",
             },
         }
+
+    def test_coarse_clock(self):
+        readings = []
+
+        def now():
+            readings.append(datetime(2024, 1, 1, 0, 0, len(readings)))
+            return readings[-1]
+
+        clock = CoarseClock(0.05, now=now)
+        first = clock()
+        assert clock() == first
+        assert len(readings) == 1
+        time.sleep(0.06)
+        assert clock() > first
+        assert len(readings) == 2
+
+    def test_simple_object_types(self):
+        class Color(enum.Enum):
+            RED = 1
+
+        class Size(str, enum.Enum):
+            BIG = "big"
+
+        class Level(enum.IntEnum):
+            HIGH = 3
+
+        @dataclass
+        class Inner:
+            ts: datetime
+            color: Color
+
+        @dataclass
+        class Outer:
+            inner: Inner
+            tags: list = field(default_factory=list)
+
+        ts = datetime(2022, 1, 2, 3, 4, 5)
+        assert simple_object(Color.RED) == "Color.RED"
+        assert simple_object(Size.BIG) == "big"
+        assert type(simple_object(Size.BIG)) is str
+        assert simple_object(Level.HIGH) == 3
+        assert type(simple_object(Level.HIGH)) is int
+        assert simple_object(ts) == "2022-01-02T03:04:05"
+        assert simple_object(date(2022, 1, 2)) == "2022-01-02"
+        assert simple_object([1, (Level.HIGH, ts)]) == [1, [3, "2022-01-02T03:04:05"]]
+        assert simple_object(Outer(Inner(ts, Color.RED), [Inner(ts, Color.RED)])) == {
+            "inner": {"ts": ts, "color": Color.RED},
+            "tags": [{"ts": ts, "color": Color.RED}],
+        }
+
+        # Conversion methods can be set on instances too.
+        class Plain:
+            pass
+
+        with_method = Plain()
+        setattr(with_method, "to_dict", lambda: {"k": 1})
+        assert simple_object(with_method) == {"k": 1}
+        assert simple_object(Plain()).startswith("<")
+
+        assert encode_json({"ts": ts, "c": Color.RED, "s": Size.BIG}) == (
+            '{"c": "Color.RED", "s": "big", "ts": "2022-01-02T03:04:05"}'
+        )
+
+    def test_project_object(self):
+        @dataclass
+        class Org:
+            id: str
+            name: str
+
+        @dataclass
+        class User:
+            id: str
+            email: str
+            org: Org
+
+            def greet(self):
+                return "hi"
+
+        u = User(id="a", email="a@b.c", org=Org(id="o", name="Org"))
+        paths = frozenset({("id",), ("org", "id"), ("greet",)})
+        assert project_object(u, paths) == {"id": "a", "org": {"id": "o"}}
+        assert project_object(u, paths | {("org",)}, with_type=True) == {
+            "type": "User",
+            "value": {"id": "a", "org": {"id": "o", "name": "Org"}},
+        }
+
+        d = {"id": "b", "age": 3, "tags": {"x": 1}}
+        paths = frozenset({("id",), ("tags",), ("missing",)})
+        assert project_object(d, paths) == {
+            "id": "b",
+            "tags": {"x": 1},
+            "missing": None,
+        }
+
+        # Fields that fail to be read are missing.
+        class Broken:
+            id = "d"
+
+            @property
+            def email(self):
+                raise ValueError("boom")
+
+        paths = frozenset({("id",), ("email",)})
+        assert project_object(Broken(), paths) == {"id": "d", "email": None}
+
+        # Mapping fields are simplified as if encoded to JSON.
+        d = {"id": "c", "prefs": {"tags": [{"x": 1}]}, "flags": {True: 1}}
+        paths = frozenset({("id",), ("prefs",), ("flags",)})
+        assert project_object(d, paths) == {
+            "id": "c",
+            "prefs": {"tags": [{"x": 1}]},
+            "flags": {"true": 1},
+        }
@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime, timezone
+
+from .dedup import ExposureDeduper
+
+fake_now = datetime(2022, 1, 29, 12, 11, 10, 0, tzinfo=timezone.utc)
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class TestExposureDeduper(unittest.TestCase):
+    def test_window(self):
+        clock = FakeClock()
+        dedup = ExposureDeduper(window=10.0, clock=clock)
+
+        assert not dedup.seen(("f", "a", "on"))
+        assert dedup.seen(("f", "a", "on"))
+        # Different entity or variant isn't a repeat.
+        assert not dedup.seen(("f", "b", "on"))
+        assert not dedup.seen(("f", "a", "off"))
+
+        clock.t = 5.0
+        assert dedup.seen(("f", "a", "on"))
+        # The window is measured from the exposure that was let through.
+        clock.t = 10.0
+        assert not dedup.seen(("f", "a", "on"))
+
+        assert dedup.summary(now=lambda: fake_now) == {
+            "record": "dedup_summary",
+            "ts": fake_now,
+            "window": 10.0,
+            "suppressed": [{"feature": "f", "variant": "on", "count": 2}],
+            "total": 2,
+        }
+        # Counts are reset after a summary.
+        assert dedup.summary() is None
+
+    def test_let_through(self):
+        dedup = ExposureDeduper(window=10.0, clock=FakeClock())
+        # Checking doesn't remember the exposure.
+        assert not dedup.is_repeat(("f", "a", "on"))
+        assert not dedup.is_repeat(("f", "a", "on"))
+        dedup.let_through(("f", "a", "on"))
+        assert dedup.is_repeat(("f", "a", "on"))
+        assert dedup.stats()["pending"] == 1
+
+    def test_bounded(self):
+        dedup = ExposureDeduper(max_entries=4, shards=2)
+        for i in range(100):
+            dedup.seen(("f", i, "on"))
+        stats = dedup.stats()
+        assert stats["entries"] <= 4
+        assert stats["evicted"] == 100 - stats["entries"]
@@ -1,13 +1,19 @@
+import asyncio
+import gc
+import time
+import tracemalloc
 import unittest
 from dataclasses import dataclass
 from datetime import datetime
 
 from crocodsl.field import _Field
-from crocodsl.func import Hash
+from crocodsl.func import Hash, TimeSince
+from crocodsl.profiler import Profiler
 
+from . import events
 from .arm import Arm
-from .common import NoAssignment
-from .feature import Feature
+from .common import NoAssignment, StickyTimeoutError
+from .feature import Feature, StickyTimeoutPolicy
 from .population import Population
 from .rollout import Rollout
 from .value import CallType
@@ -34,6 +40,181 @@ class TestFeature(unittest.IsolatedAsyncioTestCase):
         assert await f(User("three")) == "Foo"
         assert await f(User("four")) == "Foo"
 
+    async def test_fingerprint(self):
+        def make(value):
+            return Feature(
+                "fingerprinted",
+                variants=[Variant("foo", value)],
+                default_arm="foo",
+            )
+
+        f = make("Foo")
+        assert f.to_dict() is f.to_dict()
+        assert f.fingerprint == make("Foo").fingerprint
+        assert f.fingerprint != make("Bar").fingerprint
+
+    async def test_now_once(self):
+        """The time is read once per evaluation and used throughout."""
+        readings = []
+
+        def now():
+            readings.append(datetime(2024, 1, 1, 0, 0, len(readings)))
+            return readings[-1]
+
+        @dataclass
+        class Member:
+            id: str
+            joined: datetime
+
+        f = Feature(
+            "loyalty",
+            variants=[Variant("old", "Old"), Variant("new", "New")],
+            rollouts=[
+                Rollout(
+                    "old",
+                    population=Population.Expression(
+                        TimeSince(_Field("joined"), "days") > 30
+                    ),
+                    arms=["old"],
+                ),
+            ],
+            default_arm="new",
+        )
+        printed = []
+        v = await f(
+            Member("a", datetime(2023, 1, 1)),
+            log=lambda *args: printed.append(args[0]),
+            now=now,
+        )
+        assert v == "Old"
+        assert len(readings) == 1
+        assert v.ts == readings[0]
+        assert set(printed) == {f"[{readings[0]}]"}
+
+    async def test_allocations(self):
+        """Guard against regressions in the memory used by each evaluation."""
+        f = Feature(
+            "alloc",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            rollouts=[
+                Rollout(
+                    "half",
+                    population=Population.Percent(0.5, "alloc"),
+                    arms=[Arm("a", 0.5), Arm("b", 0.5)],
+                ),
+            ],
+            default_arm="b",
+        )
+
+        class KeepEvents(events.EventLogger):
+            def __init__(self):
+                self.events = []
+
+            def __call__(self, event, now=None):
+                self.events.append(event)
+
+        async def allocated_per_call(log, n=500):
+            users = [User(str(i)) for i in range(n)]
+            # Warm up any caches first.
+            for u in users[:10]:
+                await f(u, log=log)
+            # Keep every result alive, and don't let the collector free
+            # anything mid-run, so the diff counts everything allocated.
+            gc.collect()
+            gc.disable()
+            tracemalloc.start()
+            try:
+                before = tracemalloc.take_snapshot()
+                values = [await f(u, log=log) for u in users]
+                after = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+                gc.enable()
+            assert len(values) == n
+            # Only count allocations made by the library.
+            filters = [
+                tracemalloc.Filter(True, "*/alligater/*"),
+                tracemalloc.Filter(True, "*/crocodsl/*"),
+            ]
+            diff = after.filter_traces(filters).compare_to(
+                before.filter_traces(filters), "lineno"
+            )
+            blocks = sum(stat.count_diff for stat in diff) / n
+            size = sum(stat.size_diff for stat in diff) / n
+            return blocks, size
+
+        # The value itself, its timestamp, and its call ID. Without slots the
+        # value also allocates a dict.
+        blocks, size = await allocated_per_call(None)
+        assert blocks < 3.5
+        assert size < 265
+        # Events and their args. Without slots each event instance also
+        # allocates a dict.
+        blocks, size = await allocated_per_call(KeepEvents())
+        assert blocks < 100
+        assert size < 6600
+
+    async def test_entity_fields(self):
+        nested = Feature(
+            "nested",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            rollouts=[
+                Rollout(
+                    "adults",
+                    population=Population.Expression(_Field("age") >= 18),
+                    arms=["a"],
+                ),
+            ],
+            default_arm="b",
+        )
+        f = Feature(
+            "outer",
+            variants=[Variant("n", nested), Variant("c", "C")],
+            rollouts=[
+                Rollout(
+                    "members",
+                    population=Population.Explicit(["x"], _Field("org", "id")),
+                    arms=["n", "c"],
+                    randomizer=Hash(_Field("email")),
+                ),
+            ],
+            default_arm="c",
+        )
+        assert f.entity_fields == {("id",), ("age",), ("org", "id"), ("email",)}
+
+        functor = Feature(
+            "functor",
+            variants=[Variant("f", lambda entity, **kwargs: entity.id, functor=True)],
+            default_arm="f",
+        )
+        assert functor.entity_fields is None
+
+    async def test_profile(self):
+        """Profiled expressions are attributed to their feature and rollout."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            rollouts=[
+                Rollout(
+                    "beta",
+                    population=Population.Expression(_Field("id") == "x"),
+                    arms=["a"],
+                ),
+            ],
+            default_arm="b",
+        )
+        with Profiler() as profiler:
+            assert await f(User("x")) == "A"
+            assert await f(User("y")) == "B"
+
+        calls = {(r["label"], r["node"]): r["calls"] for r in profiler.report()}
+        assert calls["test_feature/beta", "$id Eq 'x'"] == 2
+        assert calls["test_feature/beta", "$id"] >= 2
+        assert {label for label, _ in calls} == {
+            "test_feature/beta",
+            "test_feature/default",
+        }
+
     async def test_ab(self):
         """Simple A/B gate"""
         f = Feature(
@@ -222,3 +403,93 @@ class TestFeature(unittest.IsolatedAsyncioTestCase):
 
         with self.assertRaises(ValueError):
             await f(User("one"), log=print, sticky=_sticky_error)
+
+    async def test_sticky_timeout(self):
+        """Slow sticky lookups fall back according to the timeout policy."""
+        mock_sticky_now = datetime(2024, 1, 2, 3, 4, 5)
+        f = Feature(
+            name="slow_sticky",
+            variants=[
+                Variant("a", "A"),
+                Variant("b", "B"),
+                Variant("off", None),
+            ],
+            default_arm=Arm("off"),
+            rollouts=[
+                Rollout(name="test_segment_1", arms=["a"]),
+            ],
+        )
+
+        async def _slow_sticky(feature, entity):
+            await asyncio.sleep(1.0)
+            return "b", "B", mock_sticky_now
+
+        def _slow_sync_sticky(feature, entity):
+            time.sleep(0.2)
+            return "b", "B", mock_sticky_now
+
+        seen = []
+
+        def collect(event, now=None):
+            seen.append(event)
+
+        # No budget: wait as long as it takes.
+        v = await f(User("one"), sticky=_slow_sync_sticky)
+        assert v == "B"
+
+        with self.assertRaises(StickyTimeoutError):
+            await f(User("one"), log=collect, sticky=_slow_sticky, sticky_timeout=0.01)
+        assert [e.name for e in seen][-2:] == ["StickyTimeout", "StickyAssignment"]
+        assert seen[-2].timeout == 0.01
+        assert seen[-2].policy == "raise"
+
+        # Sync fetchers can be timed out too.
+        with self.assertRaises(StickyTimeoutError):
+            await f(User("one"), sticky=_slow_sync_sticky, sticky_timeout=0.01)
+
+        seen.clear()
+        v = await f(
+            User("one"),
+            log=collect,
+            sticky=_slow_sticky,
+            sticky_timeout=0.01,
+            sticky_timeout_policy="default",
+        )
+        assert v == None  # noqa: E711
+        assert v.call_type == CallType.EXPOSURE
+        chose = [e for e in seen if e.name == "ChoseVariant"]
+        assert len(chose) == 1
+        assert chose[0].sticky is False
+        assert "StickyTimeout" in [e.name for e in seen]
+
+        v = await f(
+            User("one"),
+            sticky=_slow_sticky,
+            sticky_timeout=0.01,
+            sticky_timeout_policy=StickyTimeoutPolicy.EXPOSURE,
+        )
+        assert v == "A"
+        assert v.call_type == CallType.EXPOSURE
+
+    async def test_sticky_timeout_feature_override(self):
+        """Feature-level budget and policy override the caller's."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+            sticky_timeout=0.01,
+            sticky_timeout_policy="default",
+        )
+
+        async def _slow_sticky(feature, entity):
+            await asyncio.sleep(1.0)
+            return "bar", "Bar", datetime(2024, 1, 2, 3, 4, 5)
+
+        v = await f(
+            User("one"),
+            sticky=_slow_sticky,
+            sticky_timeout=10.0,
+            sticky_timeout_policy="raise",
+        )
+        assert v == "Foo"
+        assert v.call_type == CallType.EXPOSURE
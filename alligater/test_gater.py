@@ -1,13 +1,26 @@
 import asyncio
+import gc
 import tempfile
+import threading
 import time
 import unittest
+import weakref
 from unittest.mock import Mock, call
 from datetime import datetime, UTC
 
 import responses
 
-from . import Alligater, DeferrableLogger, Feature, NoAssignment, Variant
+from . import (
+    Alligater,
+    AssignmentSink,
+    DeferrableLogger,
+    Feature,
+    Metrics,
+    NoAssignment,
+    ObjectLogger,
+    Variant,
+    deferral_scope,
+)
 
 
 class MockDeferredLogger(DeferrableLogger):
@@ -66,6 +79,257 @@ class TestGater(unittest.IsolatedAsyncioTestCase):
         gater._local_assignments.clear()
         assert await gater.foo({"id": "a"}) == "Foo"
 
+    async def test_assignment_snapshot(self):
+        """Cached assignments are saved on stop and restored on startup."""
+
+        def _sticky(feature, entity):
+            raise NoAssignment
+
+        foo = Feature(
+            "foo",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+        )
+        with tempfile.TemporaryDirectory() as d:
+            path = f"{d}/assignments.db"
+            gater = Alligater(
+                features=[foo], sticky=_sticky, logger=None, assignment_snapshot=path
+            )
+            gater._local_assignments.set(
+                foo, {"id": "a"}, "bar", "Bar", datetime(2024, 1, 2, tzinfo=UTC)
+            )
+            gater.stop()
+
+            gater2 = Alligater(
+                features=[foo], sticky=_sticky, logger=None, assignment_snapshot=path
+            )
+            assert await gater2.foo({"id": "a"}) == "Bar"
+            assert await gater2.foo({"id": "b"}) == "Foo"
+
+    async def test_assignment_sink(self):
+        """New sticky assignments are written in batches in the background."""
+        batches = []
+        written = threading.Event()
+        release = threading.Event()
+
+        def _write(batch):
+            release.wait(timeout=1.0)
+            batches.append([(a.feature.name, a.entity["id"], a.variant) for a in batch])
+            written.set()
+
+        def _sticky(feature, entity):
+            raise NoAssignment
+
+        foo = Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo")
+        sink = AssignmentSink(_write, batch_size=2, flush_interval=10.0)
+        gater = Alligater(
+            features=[foo], sticky=_sticky, logger=None, assignment_sink=sink
+        )
+        for i in range(3):
+            assert await gater.foo({"id": i}) == "Foo"
+
+        # Assignments are pinned until they're written, so they survive a clear.
+        gater._local_assignments.clear()
+        assert gater._local_assignments.get(foo, {"id": 2})[0] == "foo"
+
+        release.set()
+        assert written.wait(timeout=1.0)
+        gater.stop()
+        assert batches == [
+            [("foo", 0, "foo"), ("foo", 1, "foo")],
+            [("foo", 2, "foo")],
+        ]
+
+        stats = sink.stats()
+        assert stats["written"] == 3
+        assert stats["batches"] == 2
+        assert stats["pending"] == 0
+        assert stats["max_depth"] >= 1
+
+        # Written assignments are no longer pinned.
+        gater._local_assignments.clear()
+        assert gater._local_assignments.get(foo, {"id": 2}) is None
+
+    async def test_assignment_sink_retry(self):
+        """Failed batches are retried and stay pinned until written."""
+        attempts = []
+
+        def _write(batch):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise RuntimeError("store is down")
+
+        foo = Feature(
+            "foo",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+        )
+
+        def _sticky(feature, entity):
+            raise NoAssignment
+
+        sink = AssignmentSink(
+            _write, batch_size=1, flush_interval=0.01, retry_interval=0.01
+        )
+        gater = Alligater(
+            features=[foo],
+            sticky=_sticky,
+            logger=None,
+            assignment_sink=sink,
+        )
+        assert await gater.foo({"id": "a"}) == "Foo"
+        gater.stop()
+        assert attempts == [1, 1]
+        stats = sink.stats()
+        assert stats["failed_batches"] == 1
+        assert stats["written"] == 1
+        assert stats["dropped"] == 0
+
+    def test_assignment_sink_not_kept_alive(self):
+        """Stopped sinks can be garbage collected."""
+        sink = AssignmentSink(lambda batch: None)
+        sink.stop()
+        ref = weakref.ref(sink)
+        del sink
+        gc.collect()
+        assert ref() is None
+
+    async def test_sync_sticky_executor(self):
+        """Synchronous sticky fetchers run in the executor, not the loop."""
+        lock = threading.Lock()
+        threads = set()
+        running = 0
+        max_running = 0
+
+        def _sticky(feature, entity):
+            nonlocal running, max_running
+            with lock:
+                threads.add(threading.current_thread().name)
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            raise NoAssignment
+
+        gater = Alligater(
+            features=[
+                Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo"),
+            ],
+            sticky=_sticky,
+            logger=None,
+            sync_concurrency=2,
+        )
+        results = await asyncio.gather(*[gater.foo({"id": i}) for i in range(6)])
+        assert results == ["Foo"] * 6
+        assert threading.current_thread().name not in threads
+        assert max_running == 2
+
+        stats = gater.sync_runner.stats()
+        assert stats["submitted"] == 6
+        assert stats["completed"] == 6
+        assert stats["raised"] == 6
+        assert stats["in_flight"] == 0
+        # Four of the calls had to wait for a free worker.
+        assert stats["queue_wait_max"] >= 0.05
+        gater.stop()
+
+    async def test_sync_functor_executor(self):
+        """Synchronous functor variants run in the executor."""
+        threads = []
+
+        def _functor(entity, **kwargs):
+            threads.append(threading.current_thread().name)
+            return f"Hello {entity['id']}"
+
+        gater = Alligater(
+            features=[
+                Feature(
+                    "foo",
+                    variants=[Variant("foo", _functor, functor=True)],
+                    default_arm="foo",
+                ),
+            ],
+            logger=None,
+            sync_concurrency=1,
+        )
+        assert await gater.foo({"id": "a"}) == "Hello a"
+        assert threads and threads[0].startswith("Alligater-sync")
+        gater.stop()
+
+    async def test_nested_feature(self):
+        """Features nested in variants are evaluated recursively."""
+        inner = Feature("inner", variants=[Variant("a", "A")], default_arm="a")
+        gater = Alligater(
+            features=[
+                Feature("outer", variants=[Variant("in", inner)], default_arm="in"),
+            ],
+            logger=None,
+            sync_concurrency=1,
+        )
+        assert await gater.outer({"id": "a"}) == "A"
+        assert gater.sync_runner.stats()["submitted"] == 0
+        gater.stop()
+
+    async def test_stats(self):
+        """Per-feature metrics are recorded and readable with `stats`."""
+        inner = Feature("inner", variants=[Variant("a", "A")], default_arm="a")
+        gater = Alligater(
+            features=[
+                Feature("outer", variants=[Variant("in", inner)], default_arm="in"),
+            ],
+            logger=None,
+            metrics=Metrics(),
+        )
+        assert await gater.outer({"id": "a"}) == "A"
+        assert await gater.outer({"id": "b"}) == "A"
+
+        stats = gater.stats()
+        assert stats["cache"] == gater._local_assignments.stats()
+        outer = stats["features"]["outer"]
+        assert outer["counters"] == {"assignment": 2}
+        assert set(outer["latency"]) == {"total", "population", "variant", "log"}
+        for phase in outer["latency"].values():
+            assert phase["count"] == 2
+            assert phase["max"] <= outer["latency"]["total"]["max"]
+        # Nested features are part of the outer feature's evaluation.
+        assert "inner" not in stats["features"]
+        gater.stop()
+
+    async def test_stats_error(self):
+        """Evaluations that raise are counted as errors."""
+
+        def _fail(entity, **kwargs):
+            raise ValueError("nope")
+
+        gater = Alligater(
+            features=[
+                Feature(
+                    "foo",
+                    variants=[Variant("a", _fail, functor=True)],
+                    default_arm="a",
+                ),
+            ],
+            logger=None,
+            metrics=Metrics(),
+        )
+        with self.assertRaises(ValueError):
+            await gater.foo({"id": "a"})
+        foo = gater.stats()["features"]["foo"]
+        assert foo["counters"] == {"errors": 1}
+        assert foo["latency"]["total"]["count"] == 1
+        gater.stop()
+
+    async def test_stats_disabled(self):
+        """Without metrics, `stats` only has the other counters."""
+        gater = Alligater(
+            features=[Feature("foo", variants=[Variant("a", "A")], default_arm="a")],
+            logger=None,
+        )
+        assert await gater.foo({"id": "a"}) == "A"
+        assert set(gater.stats()) == {"cache"}
+        gater.stop()
+
     async def test_deferred_exposure_logging(self):
         def _sticky(feature, entity):
             if entity["id"] == 2:
@@ -103,6 +367,27 @@ class TestGater(unittest.IsolatedAsyncioTestCase):
         logger.mock.write_log.assert_called_with(call_id, extra=None)
         logger.mock.drop_log.assert_not_called()
 
+    async def test_exposure_frees_record(self):
+        """Records of exposures that aren't deferred are freed once written."""
+        written = []
+        logger = ObjectLogger(written.append, install_signals=False)
+        gater = Alligater(
+            logger=logger,
+            features=[
+                Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo"),
+            ],
+        )
+        for i in range(50):
+            assert await gater.foo({"id": i}) == "Foo"
+        v = await gater.foo({"id": 50}, deferred=True)
+        v.log()
+        logger.stop()
+        # Only the deferred call is still held, since it might be logged again.
+        assert logger.stats()["deferred"] == 1
+        assert logger.stats()["never_written"] == 0
+        # Assignment and exposure of every call.
+        assert len(written) == 102
+
     async def test_drop_deferred_logging(self):
         logger = MockDeferredLogger()
         gater = Alligater(
@@ -116,12 +401,15 @@ class TestGater(unittest.IsolatedAsyncioTestCase):
                 Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo"),
             ],
         )
-        v = await gater.foo({}, deferred=True)
-        assert v == "Foo"
-        call_id = v._call_id
-        logger.mock.write_log.assert_not_called()
-        logger.mock.drop_log.assert_not_called()
-        del v
+        with deferral_scope():
+            v = await gater.foo({}, deferred=True)
+            assert v == "Foo"
+            call_id = v._call_id
+            logger.mock.write_log.assert_not_called()
+            logger.mock.drop_log.assert_not_called()
+            # Values no longer drop their logs when they're collected.
+            del v
+            logger.mock.drop_log.assert_not_called()
         logger.mock.write_log.assert_not_called()
         logger.mock.drop_log.assert_called_with(call_id)
 
@@ -1,19 +1,42 @@
 import asyncio
 import copy
+import gc
+import gzip
 import json
+import os
+import tempfile
 import threading
+import time
 import unittest
+import weakref
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import responses
 
+from crocodsl.field import _Field
+
+from . import events
 from .arm import Arm
 from .common import NoAssignment, SkipLog
+from .dedup import ExposureDeduper
 from .feature import Feature
-from .log import NetworkLogger, ObjectLogger
+from .log import (
+    _Deferred,
+    _snapshot,
+    AsyncNetworkLogger,
+    deferral_scope,
+    FileLogger,
+    NetworkLogger,
+    ObjectLogger,
+    OverflowPolicy,
+    RollupLogger,
+    SlowCallLogger,
+)
 from .population import Population
 from .rollout import Rollout
+from .spool import Spool
 from .variant import Variant
 
 fake_now = datetime(2022, 1, 29, 12, 11, 10, 0, tzinfo=timezone.utc)
@@ -73,6 +96,60 @@ class MockWriter:
             assert not self.results
 
 
+class LocalCollector:
+    """Stand-in HTTP log collector that records every request it gets.
+
+    Responses use the given `statuses` in order (then 200), after an optional
+    `delay` in seconds.
+    """
+
+    def __init__(self, statuses=(), delay=0.0, port=0):
+        self.requests = list[tuple[dict, bytes]]()
+        self.statuses = list(statuses)
+        self.concurrent = 0
+        self.max_concurrent = 0
+        lock = threading.Lock()
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with lock:
+                    collector.concurrent += 1
+                    collector.max_concurrent = max(
+                        collector.max_concurrent, collector.concurrent
+                    )
+                    status = collector.statuses.pop(0) if collector.statuses else 200
+                time.sleep(delay)
+                with lock:
+                    collector.concurrent -= 1
+                    if status == 200:
+                        collector.requests.append((dict(self.headers), body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.port = self.server.server_port
+        self.url = f"http://127.0.0.1:{self.server.server_port}/log"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
 class TestObjectLogger(unittest.IsolatedAsyncioTestCase):
     async def test_log_simple(self):
         f = Feature(
@@ -153,6 +230,8 @@ class TestObjectLogger(unittest.IsolatedAsyncioTestCase):
         )
 
         write.assertWritten([log1, log2])
+        # Only the header is copied between writes; the body is shared.
+        assert write.results[0]["feature"] is write.results[1]["feature"]
 
     async def test_log_simple_trace(self):
         f = Feature(
@@ -804,6 +883,639 @@ class TestObjectLogger(unittest.IsolatedAsyncioTestCase):
             ]
         )
 
+    async def _fill_queue(self, overflow, n, max_queue=2, **kwargs):
+        """Log `n` calls to a logger whose writer is stuck on the first log."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        release = threading.Event()
+        written = []
+
+        def write(data):
+            release.wait()
+            written.append(data["entity"]["value"]["id"])
+
+        logger = ObjectLogger(
+            write,
+            max_queue=max_queue,
+            overflow=overflow,
+            install_signals=False,
+            **kwargs,
+        )
+        values = [await f(User(str(i)), log=logger, now=mock_now) for i in range(n)]
+        values[0].log()
+        # Wait for the worker to pick up the first log and get stuck.
+        with logger._not_full:
+            logger._not_full.wait_for(lambda: not logger._finished, timeout=1.0)
+        # Log from another thread, since BLOCK doesn't block an event loop.
+        await asyncio.to_thread(lambda: [v.log() for v in values[1:]])
+        stats = logger.stats()
+        release.set()
+        logger.stop()
+        return written, stats
+
+    async def test_overflow_drop_newest(self):
+        written, stats = await self._fill_queue(OverflowPolicy.DROP_NEWEST, 5)
+        assert written == ["0", "1", "2"]
+        assert stats["depth"] == 2
+        assert stats["enqueued"] == 3
+        assert stats["dropped"] == 2
+
+    async def test_overflow_drop_oldest(self):
+        written, stats = await self._fill_queue(OverflowPolicy.DROP_OLDEST, 5)
+        assert written == ["0", "3", "4"]
+        assert stats["enqueued"] == 5
+        assert stats["dropped"] == 2
+        assert stats["max_depth"] == 2
+
+    async def test_overflow_block(self):
+        written, stats = await self._fill_queue(
+            OverflowPolicy.BLOCK, 4, block_timeout=0.01
+        )
+        assert written == ["0", "1", "2"]
+        assert stats["dropped"] == 1
+
+    async def test_overflow_block_event_loop(self):
+        """BLOCK drops logs immediately rather than stall the event loop."""
+        f = Feature("test_feature", variants=[Variant("foo", "Foo")], default_arm="foo")
+        release = threading.Event()
+        written = []
+
+        def write(data):
+            release.wait()
+            written.append(data)
+
+        logger = ObjectLogger(
+            write,
+            max_queue=1,
+            overflow=OverflowPolicy.BLOCK,
+            block_timeout=10.0,
+            install_signals=False,
+        )
+        values = [await f(User(str(i)), log=logger, now=mock_now) for i in range(3)]
+        values[0].log()
+        with logger._not_full:
+            logger._not_full.wait_for(lambda: not logger._finished, timeout=1.0)
+        start = time.monotonic()
+        with self.assertLogs("alligater", level="WARNING"):
+            values[1].log()
+            values[2].log()
+        assert time.monotonic() - start < 1.0
+        assert logger.stats()["dropped"] == 1
+
+        # A dropped log isn't a repeat when it's logged again.
+        release.set()
+        with logger._not_full:
+            logger._not_full.wait_for(lambda: not logger._finished, timeout=1.0)
+        values[2].log()
+        logger.stop()
+        assert [r["call_id"] for r in written] == [v._call_id for v in values]
+
+    async def test_overflow_sample(self):
+        written, stats = await self._fill_queue(OverflowPolicy.SAMPLE, 5)
+        # Queue is half full after one log, after which logs are sampled
+        # until the queue is full.
+        assert written[:2] == ["0", "1"]
+        assert stats["depth"] <= 2
+        assert stats["enqueued"] + stats["dropped"] == 5
+
+    async def test_overflow_sample_small(self):
+        """Small queues still fill up before every log is dropped."""
+        for max_queue in (1, 4):
+            written, stats = await self._fill_queue(
+                OverflowPolicy.SAMPLE, 50, max_queue=max_queue
+            )
+            assert stats["depth"] == max_queue
+            # The log the writer is stuck on, plus a full queue.
+            assert stats["enqueued"] == max_queue + 1
+            assert len(written) == max_queue + 1
+
+    async def test_sample_rate(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+            rollouts=[
+                Rollout(
+                    "never_logged",
+                    population=Population.Explicit(["a", "b"]),
+                    arms=["bar"],
+                    sample_rate=0.0,
+                ),
+            ],
+            sample_rate=0.5,
+        )
+
+        async def logged(ids):
+            write = MockWriter()
+            logger = ObjectLogger(write, install_signals=False)
+            values = [await f(User(i), log=logger, now=mock_now) for i in ids]
+            # Records aren't even built for unsampled calls.
+            assert len(logger._cache) == len(logger._deferred)
+            for v in values:
+                v.log()
+            logger.stop()
+            assert all(r["sample_rate"] == 0.5 for r in write.results)
+            return [r["entity"]["value"]["id"] for r in write.results]
+
+        ids = [str(i) for i in range(200)]
+        sampled = await logged(ids)
+        assert 60 < len(sampled) < 140
+        # Sampling is deterministic by entity.
+        assert await logged(ids) == sampled
+        assert await logged(["a", "b"]) == []
+
+    async def test_sample_rate_no_id(self):
+        """Entities without an ID are sampled, not rejected."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(
+            write,
+            sample_rate=0.5,
+            dedup=ExposureDeduper(window=60.0),
+            install_signals=False,
+        )
+        for i in range(200):
+            v = await f(i, log=logger, now=mock_now)
+            assert v == "Foo"
+            v.log()
+        (await f({}, log=logger, now=mock_now)).log()
+        logger.stop()
+        assert 60 < len(write.results) < 140
+
+    async def test_sample_rate_arms(self):
+        """Sampled records have the same mix of arms as assignments."""
+        f = Feature(
+            "checkout",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            default_arm="a",
+            rollouts=[
+                Rollout(
+                    "checkout",
+                    population=Population.DEFAULT,
+                    arms=[Arm("a", 0.5), Arm("b", 0.5)],
+                ),
+            ],
+            sample_rate=0.2,
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, install_signals=False)
+        for i in range(2000):
+            (await f(User(str(i)), log=logger, now=mock_now)).log()
+        logger.stop()
+
+        variants = [r["variant"]["name"] for r in write.results]
+        assert 300 < len(variants) < 500
+        assert 0.4 < variants.count("a") / len(variants) < 0.6
+
+    async def test_sample_rate_default(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, sample_rate=0.0, install_signals=False)
+        v = await f(User("one"), log=logger, now=mock_now)
+        v.log()
+        logger.stop()
+        assert write.results == []
+
+    async def test_dedup(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(
+            write, dedup=ExposureDeduper(window=60.0), install_signals=False
+        )
+        for uid in ["one", "two", "one", "one"]:
+            v = await f(User(uid), log=logger, now=mock_now)
+            v.log()
+        logger.stop()
+
+        assert [r["entity"]["value"]["id"] for r in write.results[:2]] == [
+            "one",
+            "two",
+        ]
+        summary = write.results[2]
+        assert summary["record"] == "dedup_summary"
+        assert summary["suppressed"] == [
+            {"feature": "test_feature", "variant": "foo", "count": 2}
+        ]
+        assert len(write.results) == 3
+
+    async def test_dedup_gater(self):
+        """The assignment and exposure of one call aren't repeats."""
+        from . import Alligater
+
+        write = MockWriter()
+        logger = ObjectLogger(
+            write, dedup=ExposureDeduper(window=60.0), install_signals=False
+        )
+        gater = Alligater(
+            logger=logger,
+            features=[
+                Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo")
+            ],
+        )
+        assert await gater.foo({"id": "u1"}) == "Foo"
+        assert await gater.foo({"id": "u1"}) == "Foo"
+        logger.stop()
+
+        assignment, exposure = write.results[:2]
+        assert not assignment["repeat"]
+        assert exposure["repeat"]
+        assert exposure["call_id"].startswith(assignment["call_id"])
+        # The second call is suppressed, and counted once.
+        summary = write.results[2]
+        assert summary["record"] == "dedup_summary"
+        assert summary["total"] == 1
+        assert len(write.results) == 3
+
+    async def test_dedup_overflow(self):
+        """An exposure dropped by the overflow policy doesn't suppress the next."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        release = threading.Event()
+        written = []
+
+        def write(data):
+            release.wait()
+            written.append(data["entity"]["value"]["id"])
+
+        logger = ObjectLogger(
+            write,
+            dedup=ExposureDeduper(window=60.0),
+            max_queue=1,
+            install_signals=False,
+        )
+
+        async def wait_empty():
+            for _ in range(100):
+                if not logger.stats()["depth"]:
+                    return
+                await asyncio.sleep(0.01)
+
+        # The worker is stuck writing the first log, and the second fills the
+        # queue, so the third is dropped.
+        (await f(User("a"), log=logger, now=mock_now)).log()
+        await wait_empty()
+        (await f(User("b"), log=logger, now=mock_now)).log()
+        (await f(User("c"), log=logger, now=mock_now)).log()
+        assert logger.stats()["dropped"] == 1
+
+        release.set()
+        await wait_empty()
+        (await f(User("c"), log=logger, now=mock_now)).log()
+        logger.stop()
+        assert written == ["a", "b", "c"]
+
+    async def test_feature_refs(self):
+        f1 = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        f2 = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo 2")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, feature_refs=True, install_signals=False)
+        for f in [f1, f1, f2]:
+            v = await f(User("one"), log=logger, now=mock_now)
+            v.log()
+        logger.stop()
+
+        assert f1.fingerprint != f2.fingerprint
+        assert [r.get("record") for r in write.results] == [
+            "definition",
+            None,
+            None,
+            "definition",
+            None,
+        ]
+        assert write.results[0] == {
+            "record": "definition",
+            "fingerprint": f1.fingerprint,
+            "feature": f1.to_dict(),
+        }
+        assert write.results[1]["feature"] == {
+            "name": "test_feature",
+            "fingerprint": f1.fingerprint,
+        }
+        assert write.results[3]["fingerprint"] == f2.fingerprint
+        assert write.results[4]["feature"]["fingerprint"] == f2.fingerprint
+
+    async def test_deferred_ttl(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, deferred_ttl=0.05, install_signals=False)
+        v1 = await f(User("one"), log=logger, now=mock_now)
+        v2 = await f(User("two"), log=logger, now=mock_now)
+        v1.log()
+        time.sleep(0.2)
+        # Both records have expired, even though the values are still alive.
+        v2.log()
+        v1.log()
+        logger.stop()
+
+        assert [r["entity"]["value"]["id"] for r in write.results] == ["one"]
+        stats = logger.stats()
+        assert stats["deferred"] == 0
+        assert stats["expired"] == 2
+        assert stats["never_written"] == 1
+
+    async def test_deferral_scope(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, deferred_ttl=None, install_signals=False)
+        with deferral_scope():
+            v1 = await f(User("one"), log=logger, now=mock_now)
+            v2 = await f(User("two"), log=logger, now=mock_now)
+            v1.log()
+            assert logger.stats()["deferred"] == 2
+        v2.log()
+        logger.stop()
+
+        assert [r["entity"]["value"]["id"] for r in write.results] == ["one"]
+        stats = logger.stats()
+        assert stats["deferred"] == 0
+        assert stats["expired"] == 0
+        assert stats["never_written"] == 1
+
+    async def test_lazy(self):
+        threads = []
+
+        class Account:
+            def __init__(self, id, plan):
+                self.id = id
+                self.plan = plan
+
+            def to_dict(self):
+                threads.append(threading.current_thread().name)
+                return {"id": self.id, "plan": self.plan}
+
+        f = Feature(
+            "test_feature",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            rollouts=[
+                Rollout(
+                    "pro",
+                    population=Population.Expression(_Field("plan") == "pro"),
+                    arms=["a"],
+                ),
+            ],
+            default_arm="b",
+        )
+
+        eager = MockWriter()
+        logger = ObjectLogger(eager, trace=True, install_signals=False)
+        (await f(Account("one", "pro"), log=logger, now=mock_now)).log()
+        logger.stop()
+
+        threads.clear()
+        lazy = MockWriter()
+        logger = ObjectLogger(lazy, trace=True, lazy=True, install_signals=False)
+        (await f(Account("one", "pro"), log=logger, now=mock_now)).log()
+        with lazy.cv:
+            lazy.cv.wait_for(lambda: lazy.results, timeout=1.0)
+        logger.stop()
+
+        # Only the call IDs should differ.
+        for r in eager.results + lazy.results:
+            del r["call_id"]
+        assert lazy.results == eager.results
+        assert threads and all(t.startswith("ObjectLogger-io") for t in threads)
+
+    async def test_lazy_error(self):
+        """An entity that fails to serialize doesn't stop later writes."""
+
+        class Bad:
+            id = "bad"
+
+            def to_dict(self):
+                raise ValueError("boom")
+
+        f = Feature("test_feature", variants=[Variant("foo", "Foo")], default_arm="foo")
+        write = MockWriter()
+        logger = ObjectLogger(write, lazy=True, install_signals=False)
+        with self.assertLogs("alligater", level="ERROR") as logs:
+            (await f(Bad(), log=logger, now=mock_now)).log()
+            (await f(User("good"), log=logger, now=mock_now)).log()
+            with write.cv:
+                write.cv.wait_for(lambda: write.results, timeout=1.0)
+            logger.stop()
+
+        assert "boom" in logs.output[0]
+        assert [r["entity"]["value"] for r in write.results] == [{"id": "good"}]
+        stats = logger.stats()
+        assert stats["failed"] == 1
+        assert stats["written"] == 1
+
+    def test_deferred_race(self):
+        """Workers can share a deferred field while it's being serialized."""
+        entered = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        class Source:
+            pass
+
+        def serialize(source):
+            calls.append(source)
+            if len(calls) == 1:
+                entered.set()
+                release.wait(timeout=1.0)
+            return {"ok": True}
+
+        source = Source()
+        ref = weakref.ref(source)
+        d = _Deferred(serialize, source)
+        del source
+        results = []
+        first = threading.Thread(target=lambda: results.append(d.get()))
+        first.start()
+        entered.wait(timeout=1.0)
+        # The second worker gets here while the first is still serializing.
+        results.append(d.get())
+        release.set()
+        first.join()
+        assert results == [{"ok": True}, {"ok": True}]
+        assert d.get() == {"ok": True}
+        assert len(calls) == 2
+        calls.clear()
+        assert ref() is None
+
+    async def test_lazy_workers(self):
+        """The records of a call can be serialized by several workers at once."""
+        from . import Alligater
+
+        write = MockWriter()
+        logger = ObjectLogger(write, lazy=True, workers=4, install_signals=False)
+        gater = Alligater(
+            logger=logger,
+            features=[
+                Feature("foo", variants=[Variant("foo", "Foo")], default_arm="foo")
+            ],
+        )
+        for i in range(200):
+            assert await gater.foo({"id": i}) == "Foo"
+        logger.stop()
+        stats = logger.stats()
+        assert stats["failed"] == 0
+        assert stats["written"] == 400
+
+    async def test_mutate_after_log(self):
+        """Mutating the value or extra data after logging doesn't change the log."""
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", {"limits": [1, 2]})],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, install_signals=False)
+        v = await f(User("one"), log=logger, now=mock_now)
+        extra = {"page": "home"}
+        v.log(extra=extra)
+        v.value["limits"].append(3)
+        extra["page"] = "away"
+        logger.stop()
+
+        assert write.results[0]["assignment"] == {"limits": [1, 2]}
+        assert write.results[0]["extra"] == {"page": "home"}
+
+    def test_snapshot(self):
+        """Plain data is copied, and immutable values are shared."""
+        t = (1, "a", (2.0, None))
+        assert _snapshot(t) is t
+        value = {"a": [1, {"b": 2}], "t": t, "u": User("one")}
+        copied = _snapshot(value)
+        assert copied == value
+        assert copied["a"] is not value["a"]
+        assert copied["a"][1] is not value["a"][1]
+        assert copied["t"] is t
+        assert copied["u"] is not value["u"]
+        # Cycles fall back to a deep copy.
+        cycle: list = [1]
+        cycle.append(cycle)
+        copied = _snapshot(cycle)
+        assert copied is not cycle
+        assert copied[1] is copied
+        # Values that can't be copied are kept as they are.
+        lock = threading.Lock()
+        assert _snapshot({"lock": lock}) == {"lock": lock}
+
+    async def test_not_kept_alive(self):
+        """Stopped loggers can be garbage collected."""
+        f = Feature("test_feature", variants=[Variant("foo", "Foo")], default_arm="foo")
+        logger = ObjectLogger(MockWriter(), install_signals=False)
+        (await f(User("one"), log=logger, now=mock_now)).log()
+        logger.stop()
+        ref = weakref.ref(logger)
+        del logger
+        gc.collect()
+        assert ref() is None
+
+    async def test_lazy_snapshot(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(
+            write, lazy=True, snapshot=copy.copy, install_signals=False
+        )
+        u = User("one")
+        v = await f(u, log=logger, now=mock_now)
+        u.id = "two"
+        v.log()
+        logger.stop()
+
+        assert write.results[0]["entity"] == {"type": "User", "value": {"id": "one"}}
+
+    async def test_project_entities(self):
+        @dataclass
+        class BigUser:
+            id: str
+            country: str
+            bio: str
+
+        f = Feature(
+            "test_feature",
+            variants=[Variant("a", "A"), Variant("b", "B")],
+            rollouts=[
+                Rollout(
+                    "us",
+                    population=Population.Expression(_Field("country") == "US"),
+                    arms=["a"],
+                ),
+            ],
+            default_arm="b",
+        )
+        functor = Feature(
+            "functor_feature",
+            variants=[Variant("f", lambda entity, **kwargs: entity.bio, functor=True)],
+            default_arm="f",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, project_entities=True, install_signals=False)
+        u = BigUser("one", "US", "A very long bio")
+        (await f(u, log=logger, now=mock_now)).log()
+        (await functor(u, log=logger, now=mock_now)).log()
+        logger.stop()
+
+        assert write.results[0]["entity"] == {
+            "type": "BigUser",
+            "value": {"id": "one", "country": "US"},
+        }
+        assert write.results[1]["entity"]["value"] == {
+            "id": "one",
+            "country": "US",
+            "bio": "A very long bio",
+        }
+
+    async def test_stats_written(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        write = MockWriter()
+        logger = ObjectLogger(write, install_signals=False)
+        v = await f(User("one"), log=logger, now=mock_now)
+        v.log()
+        v.log()
+        logger.stop()
+
+        stats = logger.stats()
+        assert stats["enqueued"] == 2
+        assert stats["written"] == 2
+        assert stats["depth"] == 0
+        assert stats["dropped"] == 0
+
 
 class TestNetworkLogger(unittest.IsolatedAsyncioTestCase):
     @responses.activate
@@ -957,3 +1669,464 @@ class TestNetworkLogger(unittest.IsolatedAsyncioTestCase):
         wait_for_responses(logger, expected_count=0)
 
         assert len(responses.calls) == 0
+
+
+class TestNetworkLoggerBatching(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+
+    async def test_batch_ndjson(self):
+        with LocalCollector() as collector:
+            logger = NetworkLogger(
+                collector.url,
+                batch_size=3,
+                batch_interval=10.0,
+                install_signals=False,
+            )
+            for i in range(7):
+                v = await self.f(User(str(i)), log=logger, now=mock_now)
+                v.log()
+            # The last partial batch is flushed when the logger stops.
+            logger.stop()
+
+        assert len(collector.requests) == 3
+        batches = []
+        for headers, body in collector.requests:
+            assert headers["Content-Type"] == "application/x-ndjson; charset=utf-8"
+            lines = body.decode("utf-8").splitlines()
+            batches.append(
+                [json.loads(line)["entity"]["value"]["id"] for line in lines]
+            )
+        assert batches == [["0", "1", "2"], ["3", "4", "5"], ["6"]]
+        assert logger.stats()["written"] == 7
+
+    async def test_batch_json_gzip(self):
+        def body(data):
+            uid = data["entity"]["value"]["id"]
+            if uid == "1":
+                raise SkipLog
+            return {"user": uid}
+
+        with LocalCollector() as collector:
+            logger = NetworkLogger(
+                collector.url,
+                body=body,
+                batch_size=2,
+                batch_interval=10.0,
+                batch_format="json",
+                compress=True,
+                install_signals=False,
+            )
+            for i in range(4):
+                v = await self.f(User(str(i)), log=logger, now=mock_now)
+                v.log()
+            logger.stop()
+
+        assert len(collector.requests) == 2
+        headers, _ = collector.requests[0]
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Content-Type"] == "application/json; charset=utf-8"
+        assert [json.loads(gzip.decompress(b)) for _, b in collector.requests] == [
+            [{"user": "0"}],
+            [{"user": "2"}, {"user": "3"}],
+        ]
+
+    async def test_batch_interval(self):
+        with LocalCollector() as collector:
+            logger = NetworkLogger(
+                collector.url,
+                batch_size=100,
+                batch_interval=0.01,
+                install_signals=False,
+            )
+            v = await self.f(User("one"), log=logger, now=mock_now)
+            v.log()
+            # A partial batch is sent once the interval passes.
+            for _ in range(100):
+                if collector.requests:
+                    break
+                await asyncio.sleep(0.01)
+            assert len(collector.requests) == 1
+            logger.stop()
+
+
+class TestAsyncNetworkLogger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+
+    async def test_log_concurrent(self):
+        with LocalCollector(delay=0.05) as collector:
+            logger = AsyncNetworkLogger(
+                collector.url,
+                auth=("glen", "secret"),
+                max_in_flight=3,
+                install_signals=False,
+            )
+            for i in range(9):
+                v = await self.f(User(str(i)), log=logger, now=mock_now)
+                v.log()
+            logger.stop()
+
+        assert len(collector.requests) == 9
+        assert 1 < collector.max_concurrent <= 3
+        headers, body = collector.requests[0]
+        assert headers["Authorization"] == "Basic Z2xlbjpzZWNyZXQ="
+        assert json.loads(body)["feature"]["name"] == "test_feature"
+        ids = sorted(
+            json.loads(b)["entity"]["value"]["id"] for _, b in collector.requests
+        )
+        assert ids == [str(i) for i in range(9)]
+
+        stats = logger.stats()
+        assert stats["written"] == 9
+        assert stats["in_flight"] == 0
+
+    async def test_log_custom_auth(self):
+        """Any `requests` auth works, not just basic auth tuples."""
+
+        def _auth(r):
+            r.headers["X-Token"] = "secret"
+            return r
+
+        with LocalCollector() as collector:
+            logger = AsyncNetworkLogger(
+                collector.url, auth=_auth, install_signals=False
+            )
+            v = await self.f(User("a"), log=logger, now=mock_now)
+            v.log()
+            logger.stop()
+
+        headers, _ = collector.requests[0]
+        assert headers["X-Token"] == "secret"
+        assert logger.stats()["written"] == 1
+
+    async def test_log_body_error(self):
+        """Logs that fail to serialize are counted, and the worker carries on."""
+
+        def body(data):
+            if data["entity"]["value"]["id"] == "1":
+                raise ValueError("bad")
+            return data
+
+        for batch_size in (1, 2):
+            with LocalCollector() as collector:
+                logger = AsyncNetworkLogger(
+                    collector.url,
+                    body=body,
+                    batch_size=batch_size,
+                    batch_interval=10.0,
+                    install_signals=False,
+                )
+                for i in range(4):
+                    v = await self.f(User(str(i)), log=logger, now=mock_now)
+                    v.log()
+                for _ in range(100):
+                    stats = logger.stats()
+                    if stats["written"] + stats["failed"] == 4:
+                        break
+                    await asyncio.sleep(0.01)
+                assert all(w.is_alive() for w in logger._workers)
+                logger.stop()
+
+            stats = logger.stats()
+            if batch_size == 1:
+                assert len(collector.requests) == 3
+                assert (stats["written"], stats["failed"]) == (3, 1)
+            else:
+                # The batch with the bad log fails as a whole.
+                assert len(collector.requests) == 1
+                assert (stats["written"], stats["failed"]) == (2, 2)
+
+    async def test_log_retry(self):
+        with LocalCollector(statuses=[503, 502, 400]) as collector:
+            logger = AsyncNetworkLogger(
+                collector.url,
+                backoff_factor=0.01,
+                batch_size=2,
+                batch_interval=10.0,
+                install_signals=False,
+            )
+            for i in range(4):
+                v = await self.f(User(str(i)), log=logger, now=mock_now)
+                v.log()
+            logger.stop()
+
+        # The first batch is retried twice; the second isn't retried after a
+        # client error.
+        assert len(collector.requests) == 1
+        stats = logger.stats()
+        assert stats["written"] == 2
+        assert stats["failed"] == 2
+        assert stats["retries"] == 2
+
+
+class TestNetworkLoggerSpool(unittest.IsolatedAsyncioTestCase):
+    async def test_spool_outage(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        # Reserve a port, but don't serve on it yet: the collector is down.
+        down = LocalCollector()
+        down.server.server_close()
+        url = f"http://127.0.0.1:{down.port}/log"
+
+        with tempfile.TemporaryDirectory() as d:
+            logger = NetworkLogger(
+                url,
+                spool=Spool(d),
+                max_retries=0,
+                replay_interval=0.05,
+                install_signals=False,
+            )
+            for i in range(3):
+                v = await f(User(str(i)), log=logger, now=mock_now)
+                v.log()
+            logger.stop()
+            assert logger.stats()["spool"]["depth"] == 3
+
+            # Spooled logs survive a restart and are replayed once the
+            # collector comes back.
+            with LocalCollector(port=down.port) as collector:
+                logger = NetworkLogger(
+                    url,
+                    spool=Spool(d),
+                    replay_interval=0.05,
+                    install_signals=False,
+                )
+                for _ in range(100):
+                    if len(collector.requests) == 3:
+                        break
+                    await asyncio.sleep(0.02)
+                logger.stop()
+
+            ids = [
+                json.loads(b)["entity"]["value"]["id"] for _, b in collector.requests
+            ]
+            assert ids == ["0", "1", "2"]
+            stats = logger.stats()["spool"]
+            assert stats["depth"] == 0
+            assert stats["replayed"] == 3
+
+
+class TestFileLogger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm="foo",
+        )
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._dir.name, "exposures.ndjson")
+
+    async def asyncTearDown(self):
+        self._dir.cleanup()
+
+    async def test_log_ndjson(self):
+        def body(data):
+            if data["repeat"]:
+                raise SkipLog
+            return {"user": data["entity"]["value"]["id"]}
+
+        logger = FileLogger(self.path, body=body, install_signals=False)
+        for i in range(3):
+            v = await self.f(User(str(i)), log=logger, now=mock_now)
+            v.log()
+            v.log()
+        logger.stop()
+
+        with open(self.path) as fh:
+            lines = [json.loads(line) for line in fh]
+        assert lines == [{"user": "0"}, {"user": "1"}, {"user": "2"}]
+
+    async def test_log_rotate(self):
+        logger = FileLogger(
+            self.path,
+            max_bytes=1,
+            compress=True,
+            batch_size=2,
+            batch_interval=10.0,
+            install_signals=False,
+        )
+        for i in range(6):
+            v = await self.f(User(str(i)), log=logger, now=mock_now)
+            v.log()
+        logger.stop()
+
+        rotated = sorted(n for n in os.listdir(self._dir.name) if n.endswith(".gz"))
+        assert len(rotated) == 2
+        assert logger.stats()["rotations"] == 2
+
+        ids = []
+        for name in rotated:
+            with gzip.open(os.path.join(self._dir.name, name), "rt") as fh:
+                ids += [json.loads(line)["entity"]["value"]["id"] for line in fh]
+        with open(self.path) as fh:
+            ids += [json.loads(line)["entity"]["value"]["id"] for line in fh]
+        assert ids == [str(i) for i in range(6)]
+
+
+class TestRollupLogger(unittest.IsolatedAsyncioTestCase):
+    async def test_rollup(self):
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", "Foo"), Variant("bar", "Bar")],
+            default_arm="foo",
+            rollouts=[
+                Rollout(
+                    "beta",
+                    population=Population.Explicit(["a", "b"]),
+                    arms=["bar"],
+                ),
+            ],
+        )
+        rows = []
+        logger = RollupLogger(rows.extend, interval=60.0)
+        for uid in ["a", "b", "c"]:
+            await f(User(uid), log=logger, now=mock_now)
+        # Evaluate from another thread too.
+        await asyncio.to_thread(
+            lambda: asyncio.run(f(User("d"), log=logger, now=mock_now))
+        )
+        await f(
+            User("e"),
+            sticky=lambda f, e: ("bar", "Bar", fake_now),
+            log=logger,
+            now=mock_now,
+        )
+        logger.stop()
+
+        minute = fake_now.replace(second=0)
+        counts = {}
+        for row in rows:
+            assert row["record"] == "exposure_rollup"
+            assert row["minute"] == minute
+            key = (row["feature"], row["rollout"], row["variant"])
+            counts[key] = counts.get(key, 0) + row["count"]
+        assert counts == {
+            ("test_feature", "beta", "bar"): 2,
+            ("test_feature", "default", "foo"): 2,
+            ("test_feature", None, "bar"): 1,
+        }
+
+    async def test_rollup_abandoned(self):
+        """Calls that never leave the gate aren't kept forever."""
+        f = Feature("test_feature", variants=[Variant("foo", "Foo")], default_arm="foo")
+        rows = []
+        logger = RollupLogger(rows.extend, interval=60.0, max_pending=2)
+        for call_id in ["x", "y", "z"]:
+            events.EnterGate(logger, feature=f, entity=User(call_id), call_id=call_id)
+        assert list(logger._local.buffer.calls) == ["y", "z"]
+
+        # The buffer of a thread that's gone is dropped, even mid-call.
+        def _abandon():
+            events.EnterGate(logger, feature=f, entity=User("t"), call_id="t")
+
+        thread = threading.Thread(target=_abandon)
+        thread.start()
+        thread.join()
+        assert len(logger._buffers) == 2
+        logger.flush()
+        assert len(logger._buffers) == 1
+        logger.stop()
+        assert rows == []
+
+    def test_not_kept_alive(self):
+        """Stopped loggers can be garbage collected."""
+        logger = RollupLogger(list().extend, interval=60.0)
+        logger.stop()
+        ref = weakref.ref(logger)
+        del logger
+        gc.collect()
+        assert ref() is None
+
+
+class TestSlowCallLogger(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_call(self):
+        clock = [0.0]
+
+        def _value(entity, **kwargs):
+            # Make evaluation for "slow" take a second.
+            if entity.id == "slow":
+                clock[0] += 1.0
+            return "Foo"
+
+        f = Feature(
+            "test_feature",
+            variants=[Variant("foo", _value, functor=True)],
+            default_arm="foo",
+        )
+        logs = []
+        slow = []
+        logger = SlowCallLogger(
+            ObjectLogger(logs.append, trace=True, install_signals=False),
+            threshold=0.5,
+            write=slow.append,
+            clock=lambda: clock[0],
+        )
+        for uid in ["fast", "slow"]:
+            v = await f(User(uid), log=logger, now=mock_now)
+            v.log()
+        stats = logger.stats()
+        logger.stop()
+
+        # Everything is passed through to the wrapped logger.
+        assert [r["entity"]["value"]["id"] for r in logs] == ["fast", "slow"]
+
+        assert slow == logger.recent()
+        assert len(slow) == 1
+        record = slow[0]
+        assert record["record"] == "slow_call"
+        assert record["ts"] == fake_now
+        assert record["call_id"] == logs[1]["call_id"]
+        assert record["feature"] == "test_feature"
+        assert record["entity"] == logs[1]["entity"]
+        assert record["assignment"] == "Foo"
+        assert record["elapsed"] == 1.0
+        assert record["threshold"] == 0.5
+        # The trace has the same shape as the ObjectLogger's.
+        assert record["trace"] == logs[1]["trace"]
+
+        assert stats["calls"] == 2
+        assert stats["slow"] == 1
+        assert stats["pending"] == 0
+        assert stats["logger"]["enqueued"] == 2
+
+    async def test_capacity(self):
+        f = Feature("test_feature", variants=[Variant("foo", "Foo")], default_arm="foo")
+        logger = SlowCallLogger(threshold=0.0, capacity=2, max_pending=1)
+        for uid in ["a", "b", "c"]:
+            await f(User(uid), log=logger, now=mock_now)
+
+        recent = logger.recent()
+        assert [r["entity"]["value"]["id"] for r in recent] == ["b", "c"]
+        assert recent[0]["trace"][0]["type"] == "EnterGate"
+        assert recent[0]["trace"][-1]["type"] == "LeaveGate"
+
+        # Calls that never finish are forgotten beyond `max_pending`.
+        for call_id in ["x", "y"]:
+            events.EnterGate(logger, feature=f, entity=User(call_id), call_id=call_id)
+        assert logger.stats() == {
+            "calls": 3,
+            "slow": 3,
+            "pending": 1,
+            "abandoned": 1,
+        }
+
+    def test_not_kept_alive(self):
+        """Stopped loggers can be garbage collected."""
+        logger = SlowCallLogger(write=list().append)
+        logger.stop()
+        ref = weakref.ref(logger)
+        del logger
+        gc.collect()
+        assert ref() is None
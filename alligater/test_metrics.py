@@ -0,0 +1,100 @@
+import gc
+import threading
+import unittest
+import weakref
+
+from .metrics import FeatureMetrics, Histogram, Metrics, Phase
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        h = Histogram()
+        assert h.percentile(50) == 0.0
+        assert h.snapshot() == {
+            "count": 0,
+            "sum": 0.0,
+            "mean": 0.0,
+            "max": 0.0,
+            "p50": 0.0,
+            "p90": 0.0,
+            "p99": 0.0,
+        }
+
+    def test_percentiles(self):
+        h = Histogram()
+        for i in range(1, 101):
+            h.record(i * 1e-5)
+
+        snap = h.snapshot()
+        assert snap["count"] == 100
+        assert snap["max"] == 1e-3
+        self.assertAlmostEqual(snap["mean"], 5.05e-4)
+        # Estimates are within a bucket (~19%) of the true value.
+        for p in (50, 90, 99):
+            true = p * 1e-5
+            assert true <= snap[f"p{p}"] <= true * 1.2, (p, snap[f"p{p}"])
+
+    def test_overflow(self):
+        h = Histogram()
+        h.record(1e-9)
+        h.record(1000.0)
+        # Values under the smallest bucket are reported as its bound.
+        assert h.percentile(0) == 1e-6
+        assert h.percentile(100) == 1000.0
+
+
+class TestMetrics(unittest.TestCase):
+    def test_feature_metrics(self):
+        fm = FeatureMetrics()
+        fm.observe("assignment", {Phase.TOTAL: 0.002, Phase.VARIANT: 0.001})
+        fm.observe("errors", {Phase.TOTAL: 0.001})
+        fm.count("errors", 2)
+
+        snap = fm.snapshot()
+        assert snap["counters"] == {"assignment": 1, "errors": 3}
+        assert snap["latency"][Phase.TOTAL]["count"] == 2
+        assert snap["latency"][Phase.VARIANT]["count"] == 1
+
+    def test_registry(self):
+        m = Metrics()
+        assert m.feature("a") is m.feature("a")
+        m.feature("b").count("errors")
+        assert m.snapshot() == {
+            "a": {"counters": {}, "latency": {}},
+            "b": {"counters": {"errors": 1}, "latency": {}},
+        }
+        # Nothing to stop without a writer.
+        m.stop()
+
+    def test_not_kept_alive(self):
+        """Stopped metrics can be garbage collected."""
+        m = Metrics(write=list().append, interval=60.0)
+        m.stop()
+        ref = weakref.ref(m)
+        del m
+        gc.collect()
+        assert ref() is None
+
+    def test_write(self):
+        written = list[dict]()
+        exported = threading.Event()
+
+        def _write(snapshot):
+            written.append(snapshot)
+            exported.set()
+
+        m = Metrics(write=_write, interval=0.01)
+        m.feature("a").count("exposure")
+        assert exported.wait(5)
+        m.stop()
+
+        assert written[-1] == {"a": {"counters": {"exposure": 1}, "latency": {}}}
+
+    def test_write_error(self):
+        def _write(snapshot):
+            raise ValueError("nope")
+
+        m = Metrics(write=_write, interval=60)
+        with self.assertLogs("alligater", level="ERROR") as logs:
+            m.stop()
+        assert "nope" in logs.output[0]
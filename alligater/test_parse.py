@@ -376,6 +376,60 @@ FIXTURES = {
                   weight: 1.0
         """,
     },
+    # Gate with a latency budget for sticky assignment lookups
+    "sticky_timeout": {
+        "feature": Feature(
+            "sticky_timeout_feature",
+            variants=[Variant("foo", "Foo")],
+            default_arm=Arm("foo"),
+            sticky_timeout=0.25,
+            sticky_timeout_policy="default",
+        ),
+        "yaml": """
+        feature:
+          name: sticky_timeout_feature
+          variants:
+            foo: Foo
+          default_arm: foo
+          sticky_timeout: 0.25
+          sticky_timeout_policy: default
+        """,
+    },
+    # Gate with exposure sampling on the feature and on a rollout
+    "sample_rate": {
+        "feature": Feature(
+            "sampled_feature",
+            variants=[Variant("on", True), Variant("off", False)],
+            default_arm="off",
+            rollouts=[
+                Rollout(
+                    name="test_segment",
+                    population=Population.Percent(0.2, "some_seed"),
+                    arms=["on"],
+                    sample_rate=0.5,
+                ),
+            ],
+            sample_rate=0.01,
+        ),
+        "yaml": """
+        feature:
+          name: sampled_feature
+          variants:
+            "on": true
+            "off": false
+          default_arm: "off"
+          sample_rate: 0.01
+          rollouts:
+            - name: test_segment
+              population:
+                type: percent
+                value: 0.2
+                seed: some_seed
+              arms:
+                - "on"
+              sample_rate: 0.5
+        """,
+    },
 }
 
 
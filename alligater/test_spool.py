@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from .spool import Spool
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_replay(self):
+        spool = Spool(self.path, segment_bytes=64)
+        for i in range(10):
+            assert spool.append(f"record-{i}".encode())
+        assert spool.depth == 10
+        assert spool.stats()["segments"] > 1
+
+        got = []
+        fail_at = [3]
+
+        def deliver(record):
+            # Fail on the 4th record once; it's retried on the next replay.
+            if len(got) in fail_at:
+                fail_at.clear()
+                return False
+            got.append(record)
+            return True
+
+        assert spool.replay(deliver) == 3
+        assert spool.depth == 7
+        assert spool.replay(deliver) == 7
+        assert got == [f"record-{i}".encode() for i in range(10)]
+        assert spool.depth == 0
+        assert spool.stats()["bytes"] == 0
+        assert not os.listdir(self.path)
+
+    def test_restart(self):
+        spool = Spool(self.path)
+        spool.append(b"one")
+        spool.append(b"two")
+        spool.close()
+
+        restored = Spool(self.path)
+        assert restored.depth == 2
+        restored.append(b"three")
+        got = []
+        restored.replay(lambda r: got.append(r) or True)
+        assert got == [b"one", b"two", b"three"]
+
+    def test_max_bytes(self):
+        spool = Spool(self.path, max_bytes=30)
+        assert spool.append(b"x" * 10)
+        assert not spool.append(b"x" * 20)
+        stats = spool.stats()
+        assert stats["depth"] == 1
+        assert stats["rejected"] == 1
+
+    def test_torn_record(self):
+        spool = Spool(self.path)
+        spool.append(b"one")
+        spool.append(b"two")
+        spool.close()
+
+        # Simulate a crash in the middle of writing the last record.
+        (name,) = os.listdir(self.path)
+        seg = os.path.join(self.path, name)
+        with open(seg, "r+b") as f:
+            f.truncate(os.path.getsize(seg) - 1)
+
+        restored = Spool(self.path)
+        assert restored.depth == 1
+        got = []
+        restored.replay(lambda r: got.append(r) or True)
+        assert got == [b"one"]
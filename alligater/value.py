@@ -4,7 +4,7 @@ from typing import Generic, Optional, TypeVar
 from datetime import datetime
 
 from .events import EventLogger
-from .log import DeferrableLogger
+from .log import DeferrableLogger, track_deferred
 from .common import NowFn, default_now
 
 
@@ -27,9 +27,21 @@ class Value(Generic[T]):
     gate, you can call `.log()` on the wrapper to send the log to the server.
     Logs are always idempotent; it's impossible to write logs multiple times.
 
-    If a log is deferred and never sent, it will be garbage collected.
+    If a log is deferred and never sent, it's dropped when the enclosing
+    `deferral_scope` exits, or else when the logger expires it.
     """
 
+    # One of these is created for every evaluation, so keep it compact.
+    __slots__ = (
+        "_value",
+        "_variant",
+        "_ts",
+        "_call_id",
+        "_call_type",
+        "_log",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         value: T,
@@ -45,11 +57,8 @@ class Value(Generic[T]):
         self._call_id = call_id
         self._call_type = call_type
         self._log = log
-
-    def __del__(self):
-        """Clean up unsent logs when garbage collecting."""
-        if isinstance(self._log, DeferrableLogger):
-            self._log.drop_log(self._call_id)
+        if isinstance(log, DeferrableLogger) and call_id:
+            track_deferred(log, call_id)
 
     @property
     def value(self) -> T:
@@ -88,6 +97,14 @@ class Value(Generic[T]):
             # If the call type wasn't already an exposure, it should be now!
             self._call_type = CallType.EXPOSURE
 
+    def drop_log(self):
+        """Free the logger's record of this call.
+
+        The log can't be written (again) after this.
+        """
+        if isinstance(self._log, DeferrableLogger) and self._call_id:
+            self._log.drop_log(self._call_id)
+
     # == PROXY ALL THE DUNDER METHODS TO THE INTERNAL VALUE ==
 
     def __eq__(self, other):
@@ -1,9 +1,11 @@
-import asyncio
+import hashlib
+from functools import cached_property
 from typing import TYPE_CHECKING, Optional
 
 import alligater.events as events
 
-from .common import ValidationError, NowFn, default_now
+from .common import ValidationError, NowFn, default_now, encode_json
+from .dispatch import call_maybe_async
 from .feature import Feature
 from .value import Value
 
@@ -78,6 +80,20 @@ class Variant:
     def __repr__(self):
         return "<Variant name={}>".format(self.name)
 
+    @property
+    def value(self):
+        """The (raw) value of the variant."""
+        return self._value
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Content hash of the variant's definition.
+
+        Two variants with the same name, value, and nesting have the same
+        fingerprint, so this identifies a variant across config reloads.
+        """
+        return hashlib.sha256(encode_json(self.to_dict()).encode("utf-8")).hexdigest()
+
     def to_dict(self):
         v = self._value
         return {
@@ -113,13 +129,22 @@ class Variant:
             events.VariantRecurse(log, inner=self._value, call_id=call_id, now=now)
 
             result = None
-            if asyncio.iscoroutinefunction(self._value):
+            if isinstance(self._value, Feature):
+                # Features are coroutines (even though `iscoroutinefunction`
+                # can't tell for callable instances), so never dispatch them
+                # to the executor.
                 result = await self._value(
                     entity, log=log, call_id=call_id, gater=gater, now=now
                 )
             else:
-                result = self._value(
-                    entity, log=log, call_id=call_id, gater=gater, now=now
+                result = await call_maybe_async(
+                    self._value,
+                    entity,
+                    log=log,
+                    call_id=call_id,
+                    gater=gater,
+                    now=now,
+                    runner=gater.sync_runner if gater else None,
                 )
 
             # Unwrap wrapped Values. This happens when features are nested in
@@ -0,0 +1,22 @@
+"""Shared fixtures for benchmarks."""
+
+from alligater import Arm, Feature, Population, Rollout, Variant
+
+
+class User:
+    def __init__(self, id):
+        self.id = id
+
+
+FEATURE = Feature(
+    "bench",
+    variants=[Variant("on", {"enabled": True}), Variant("off", {"enabled": False})],
+    rollouts=[
+        Rollout(
+            "half",
+            population=Population.Percent(0.9, "bench"),
+            arms=[Arm("on", 0.5), Arm("off", 0.5)],
+        ),
+    ],
+    default_arm="off",
+)
@@ -0,0 +1,86 @@
+"""Benchmark FileLogger throughput against simpler ways of logging to a file.
+
+Each logger is fed the same evaluated features, and the benchmark measures
+the time to log every exposure and stop the logger (so everything is flushed).
+
+  - `FileLogger` - batched, single writer thread.
+  - `ObjectLogger` with a naive callback that writes each record to a file.
+  - `PrintLogger` with stdout redirected to a file. It logs while the feature
+    is evaluated, so its time includes the evaluation.
+
+Usage:
+    python -m bench.file_log [-n CALLS]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+
+from alligater import FileLogger, ObjectLogger, PrintLogger, encode_json
+
+from .common import FEATURE, User
+
+
+async def run_deferred(make_logger, calls: int) -> float:
+    """Evaluate, log and stop a deferrable logger, returning logs/s."""
+    logger = make_logger()
+    values = [await FEATURE(User(str(i)), log=logger) for i in range(calls)]
+
+    start = time.perf_counter()
+    for v in values:
+        v.log()
+    logger.stop()
+    return calls / (time.perf_counter() - start)
+
+
+async def run_print(path: str, calls: int) -> float:
+    """Evaluate with a PrintLogger writing to a file, returning logs/s."""
+    logger = PrintLogger()
+    with open(path, "w") as fh, contextlib.redirect_stdout(fh):
+        start = time.perf_counter()
+        for i in range(calls):
+            await FEATURE(User(str(i)), log=logger)
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        naive_path = os.path.join(d, "naive.ndjson")
+
+        def naive(record):
+            with open(naive_path, "a") as fh:
+                fh.write(encode_json(record) + "\n")
+
+        results = {
+            "FileLogger": asyncio.run(
+                run_deferred(
+                    lambda: FileLogger(
+                        os.path.join(d, "file.ndjson"), install_signals=False
+                    ),
+                    args.calls,
+                )
+            ),
+            "ObjectLogger (naive)": asyncio.run(
+                run_deferred(
+                    lambda: ObjectLogger(naive, install_signals=False), args.calls
+                )
+            ),
+            "PrintLogger": asyncio.run(
+                run_print(os.path.join(d, "print.txt"), args.calls)
+            ),
+        }
+
+    for name, rate in results.items():
+        print(f"{name:<22} {rate:>12,.0f} logs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark ObjectLogger write throughput with and without tracing.
+
+Evaluates a small feature many times and then writes every log (plus a repeat
+exposure for each), measuring how long `write_log` holds up the caller.
+
+Usage:
+    python -m bench.log_write [-n CALLS] [-r REPEATS]
+"""
+
+import argparse
+import asyncio
+import time
+
+from alligater import ObjectLogger
+
+from .common import FEATURE, User
+
+
+def _noop(record):
+    pass
+
+
+async def run(trace: bool, calls: int, repeats: int) -> float:
+    """Evaluate and write logs, returning write throughput (records/s)."""
+    logger = ObjectLogger(_noop, trace=trace, install_signals=False)
+    values = [await FEATURE(User(str(i)), log=logger) for i in range(calls)]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for v in values:
+            v.log()
+    elapsed = time.perf_counter() - start
+
+    logger.stop()
+    return calls * repeats / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--calls", type=int, default=10_000)
+    parser.add_argument("-r", "--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    for trace in (False, True):
+        rate = asyncio.run(run(trace, args.calls, args.repeats))
+        print(f"trace={trace!s:<5}  {rate:>12,.0f} writes/s")
+
+
+if __name__ == "__main__":
+    main()
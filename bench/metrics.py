@@ -0,0 +1,61 @@
+"""Benchmark the overhead of per-feature metrics on evaluation.
+
+Evaluates a small feature through an `Alligater` with and without `Metrics`
+enabled, and prints the throughput of each along with the latency percentiles
+that were recorded.
+
+Usage:
+    python -m bench.metrics [-n CALLS] [-r REPEATS]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from alligater import Alligater, Metrics
+
+from .common import FEATURE, User
+
+
+async def run(metrics: Metrics | None, calls: int) -> float:
+    """Evaluate the feature, returning throughput (evaluations/s)."""
+    gater = Alligater(features=[FEATURE], logger=None, metrics=metrics)
+    users = [User(str(i)) for i in range(calls)]
+
+    start = time.perf_counter()
+    for u in users:
+        await gater(FEATURE, u)
+    elapsed = time.perf_counter() - start
+
+    gater.stop()
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--calls", type=int, default=50_000)
+    parser.add_argument("-r", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("alligater").setLevel(logging.ERROR)
+    metrics = Metrics()
+    # Interleave the runs so that noise affects both configurations alike.
+    rates = {False: 0.0, True: 0.0}
+    for _ in range(args.repeats):
+        for enabled in rates:
+            rate = asyncio.run(run(metrics if enabled else None, args.calls))
+            rates[enabled] = max(rates[enabled], rate)
+
+    for enabled, rate in rates.items():
+        print(f"metrics={enabled!s:<5}  {rate:>12,.0f} evaluations/s")
+    print(f"overhead       {1 - rates[True] / rates[False]:>12.1%}")
+
+    for phase, h in metrics.snapshot()[FEATURE.name]["latency"].items():
+        print(
+            f"  {phase:<10}  p50={h['p50'] * 1e6:>8.1f}µs  p99={h['p99'] * 1e6:>8.1f}µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
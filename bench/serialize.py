@@ -0,0 +1,130 @@
+"""Benchmark serializing entities and trace events for logs.
+
+Compares `simple_object` against a reference implementation of the original
+serializer, which probed each value with `hasattr` and round-tripped scalars
+through a JSON string.
+
+Usage:
+    python -m bench.serialize [-n ITERATIONS]
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import enum
+import json
+import time
+from datetime import datetime
+
+import alligater.events as events
+from alligater import encode_json, simple_object
+from alligater.common import default_now, is_non_string_iterable
+
+from .common import FEATURE
+
+
+class Plan(enum.Enum):
+    FREE = "free"
+    PRO = "pro"
+
+
+@dataclasses.dataclass
+class Address:
+    city: str
+    country: str
+
+
+@dataclasses.dataclass
+class Account:
+    id: str
+    email: str
+    plan: Plan
+    created: datetime
+    address: Address
+    roles: list[str]
+
+
+class Session:
+    def __init__(self, id):
+        self.id = id
+        self.started = datetime(2024, 5, 6, 7, 8, 9)
+
+    def to_dict(self):
+        return {"id": self.id, "started": self.started}
+
+
+ACCOUNT = Account(
+    id="abc",
+    email="abc@example.com",
+    plan=Plan.PRO,
+    created=datetime(2020, 1, 2, 3, 4, 5),
+    address=Address("Palo Alto", "US"),
+    roles=["admin", "editor"],
+)
+
+SAMPLES = {
+    "dataclass": ACCOUNT,
+    "to_dict": Session("xyz"),
+    "scalars": [1, "two", 3.0, Plan.FREE, datetime(2024, 1, 1), None],
+}
+
+
+def reference(value, with_type=False):
+    """The original `simple_object`, for comparison."""
+    if is_non_string_iterable(value):
+        return [reference(v) for v in value]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        d = dataclasses.asdict(value)
+        if hasattr(value, "id"):
+            d["id"] = value.id
+    elif hasattr(value, "asdict"):
+        d = value.asdict()
+    elif hasattr(value, "to_dict"):
+        d = value.to_dict()
+    elif hasattr(value, "to_json"):
+        d = value.to_json()
+    else:
+        d = json.loads(encode_json(value))
+    if not with_type:
+        return d
+    return {"type": type(value).__name__, "value": d}
+
+
+def trace_events() -> list:
+    """Capture the trace events of a feature evaluation."""
+    captured = []
+
+    class Capture(events.EventLogger):
+        def __call__(self, event, now=default_now):
+            captured.append(event)
+
+    asyncio.run(FEATURE(ACCOUNT, log=Capture()))
+    return captured
+
+
+def rate(fn, iterations: int) -> float:
+    """Run a function repeatedly, returning calls per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+
+    for name, value in SAMPLES.items():
+        for label, fn in (("reference", reference), ("simple_object", simple_object)):
+            r = rate(lambda: fn(value, with_type=True), args.iterations)
+            print(f"{name:<10} {label:<14} {r:>12,.0f} /s")
+
+    trace = trace_events()
+    n = max(1, args.iterations // len(trace))
+    r = rate(lambda: [e.asdict(compress=True) for e in trace], n)
+    print(f"{'trace':<10} {'asdict':<14} {r * len(trace):>12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
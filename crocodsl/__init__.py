@@ -1,5 +1,6 @@
 import crocodsl.field as field
 import crocodsl.func as func
+import crocodsl.profiler as profiler
 
 from .expr import parse
 
@@ -7,4 +8,5 @@ __all__ = [
     "parse",
     "func",
     "field",
+    "profiler",
 ]
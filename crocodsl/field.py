@@ -19,6 +19,9 @@ class _Field(_Expression):
 
         return result
 
+    def entity_fields(self):
+        return frozenset({self.names})
+
     def __repr__(self):
         return ".".join([f"${name}" for name in self.names])
 
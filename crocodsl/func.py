@@ -1,8 +1,12 @@
 import re
 from collections.abc import Iterable, Sequence
+from typing import Optional
 
 from .common import hash_id, utcnow
 
+FieldPaths = frozenset[tuple[str, ...]]
+"""Set of entity field paths, as tuples of names."""
+
 
 class _MetaExpression(type):
     """Metaclass for all expressions."""
@@ -92,6 +96,17 @@ class _Expression(metaclass=_MetaExpression):
 
         return str(self) == str(other)
 
+    def entity_fields(self) -> Optional[FieldPaths]:
+        """Get the entity fields this expression reads.
+
+        Subclasses with operands override this. An expression that doesn't
+        describe its operands is assumed to read the whole entity.
+
+        Returns:
+            Set of field paths, or None if any part of the entity might be read.
+        """
+        return None
+
     def _trace(self, log, args, result):
         """Emit a EvalFunc trace event. If there is no logger passed, this is
         a no-op.
@@ -127,6 +142,10 @@ class _ComposedExpression(_Expression):
         inner_args = [f(*args, **kwargs) for f in self.inners]
         return self.outer(*inner_args, **kwargs)
 
+    def entity_fields(self):
+        # The outer function only sees the results of the inner ones.
+        return _operand_fields(*self.inners)
+
     def __repr__(self):
         all_reps = [repr(inner) for inner in self.inners]
         if len(self.inners) == 1:
@@ -145,6 +164,13 @@ class _NullaryExpression(_Expression):
     def evaluate(self, *args, log=None, context=None):
         pass
 
+    def entity_fields(self):
+        return frozenset()
+
+    def __repr__(self):
+        op = repr(self.__class__)
+        return f"{op}()"
+
 
 class _UnaryExpression(_Expression):
     """Expression of the form `operator(a)`."""
@@ -160,6 +186,9 @@ class _UnaryExpression(_Expression):
 
         return arg
 
+    def entity_fields(self):
+        return _operand_fields(self.arg)
+
     def __repr__(self):
         op = repr(self.__class__)
         return f"{op}({repr(self.arg)})"
@@ -184,6 +213,9 @@ class _BinaryExpression(_Expression):
 
         return left, right
 
+    def entity_fields(self):
+        return _operand_fields(self.left, self.right)
+
     def __repr__(self):
         op = repr(self.__class__)
         return f"{op}({repr(self.left)}, {repr(self.right)})"
@@ -219,12 +251,41 @@ class _NAryExpression(_Expression):
             a(*fargs, log=log, context=context) if callable(a) else a for a in self.args
         ]
 
+    def entity_fields(self):
+        return _operand_fields(*self.args)
+
     def __repr__(self):
         op = repr(self.__class__)
         args = [repr(a) for a in self.args]
         return f"{op}({', '.join(args)})"
 
 
+def _operand_fields(*operands) -> Optional[FieldPaths]:
+    """Combine the entity fields read by an expression's operands.
+
+    Plain values don't read the entity. Callables other than expressions are
+    called with the entity, so they might read any of it.
+
+    Args:
+        operands - Operands of an expression
+
+    Returns:
+        Set of field paths, or None if any part of the entity might be read.
+    """
+    paths = set[tuple[str, ...]]()
+    for operand in operands:
+        if isinstance(operand, _Expression):
+            fields = operand.entity_fields()
+        elif callable(operand):
+            fields = None
+        else:
+            continue
+        if fields is None:
+            return None
+        paths |= fields
+    return frozenset(paths)
+
+
 # Operator definitions
 #
 # These are all the operators available to expressions.
@@ -0,0 +1,240 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from .func import _ComposedExpression, _Expression
+
+_label = contextvars.ContextVar[Optional[str]]("crocodsl_profile_label", default=None)
+"""Label that evaluations are attributed to, such as a feature and rollout."""
+
+_active: Optional["Profiler"] = None
+"""Profiler that's currently running, if any."""
+
+_patched = dict[type, Callable]()
+"""Original `__call__` of each expression type that's instrumented."""
+
+_patch_lock = threading.Lock()
+
+
+class _NodeStats:
+    """Accumulated timings of one node."""
+
+    __slots__ = ("calls", "total", "max")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Profiler:
+    """Record how long each node of an expression takes to evaluate.
+
+    While a profiler is running, every call of every expression node is
+    counted and timed. Times are cumulative: a node's time includes the time
+    of the nodes below it. Nodes are identified by their representation, so
+    identical sub-expressions under the same label are counted together.
+
+    Evaluations are attributed to the current `label` (Alligater labels them
+    with the feature and rollout being evaluated).
+
+    Profiling is opt-in. Expression types are only instrumented while a
+    profiler is running, so there's no overhead otherwise:
+
+    ```
+    with Profiler() as profiler:
+        ...
+    print(profiler.format())
+    ```
+
+    Evaluators that don't call expression nodes directly (a compiled
+    evaluator, say) can report their own timings with `record`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """Create a new profiler.
+
+        Args:
+            clock - Monotonic clock, in seconds.
+        """
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stats = dict[tuple[Optional[str], str], _NodeStats]()
+        # The representation of a node is built from the representations of
+        # all the nodes below it, so it's cached for the run. Nodes are kept
+        # alive alongside their key so that ids aren't reused.
+        self._keys = dict[int, tuple[object, str]]()
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start profiling all expression evaluation.
+
+        Raises:
+            RuntimeError if another profiler is running.
+        """
+        global _active
+        with _patch_lock:
+            if _active is not None and _active is not self:
+                raise RuntimeError("Another profiler is already running")
+            _instrument()
+            _active = self
+
+    def stop(self):
+        """Stop profiling. The results so far are kept."""
+        global _active
+        with _patch_lock:
+            if _active is self:
+                _active = None
+                _restore()
+        with self._lock:
+            self._keys.clear()
+
+    def record(self, node: object, elapsed: float, label: Optional[str] = None):
+        """Record one evaluation of a node.
+
+        Args:
+            node - Node that was evaluated
+            elapsed - Seconds the evaluation took
+            label - What to attribute the evaluation to. Defaults to the
+            current `label`.
+        """
+        with self._lock:
+            cached = self._keys.get(id(node))
+        if cached is None:
+            cached = (node, repr(node))
+            with self._lock:
+                self._keys[id(node)] = cached
+        key = (_label.get() if label is None else label, cached[1])
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _NodeStats()
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+
+    def report(self, limit: Optional[int] = None) -> list[dict]:
+        """Get the recorded timings, slowest first.
+
+        Args:
+            limit - Maximum number of nodes to report.
+
+        Returns:
+            List of the `label`, `node`, number of `calls`, and `total`,
+            `mean`, and `max` time (in seconds) of each node.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "label": label,
+                    "node": node,
+                    "calls": stats.calls,
+                    "total": stats.total,
+                    "mean": stats.total / stats.calls,
+                    "max": stats.max,
+                }
+                for (label, node), stats in self._stats.items()
+            ]
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows[:limit]
+
+    def format(self, limit: Optional[int] = 20) -> str:
+        """Format the recorded timings as a table, slowest first.
+
+        Args:
+            limit - Maximum number of nodes to include.
+
+        Returns:
+            Human-readable report.
+        """
+        lines = [f"{'total ms':>10} {'calls':>8} {'mean µs':>10}  label / node"]
+        for row in self.report(limit):
+            lines.append(
+                f"{row['total'] * 1e3:>10.3f} {row['calls']:>8} "
+                f"{row['mean'] * 1e6:>10.2f}  {row['label']} / {row['node']}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        """Discard the recorded timings."""
+        with self._lock:
+            self._stats.clear()
+
+
+def active() -> Optional[Profiler]:
+    """Get the profiler that's running, if any."""
+    return _active
+
+
+@contextlib.contextmanager
+def label(name: Optional[str]) -> Iterator[None]:
+    """Attribute expressions evaluated in this context to the given label.
+
+    Args:
+        name - Label, such as the feature and rollout being evaluated
+    """
+    token = _label.set(name)
+    try:
+        yield
+    finally:
+        _label.reset(token)
+
+
+def _expression_types() -> Iterator[type]:
+    """List every expression type that implements its own `__call__`."""
+    seen = set[type]()
+    pending: list[type] = [_Expression]
+    sub: type
+    while pending:
+        cls = pending.pop()
+        for sub in cls.__subclasses__():
+            if sub not in seen:
+                seen.add(sub)
+                pending.append(sub)
+    for cls in seen:
+        # Calling a composed expression constructs a new one.
+        if "__call__" in cls.__dict__ and not issubclass(cls, _ComposedExpression):
+            yield cls
+
+
+def _instrument():
+    """Wrap the `__call__` of every expression type to time it."""
+    for cls in _expression_types():
+        if cls not in _patched:
+            call = cls.__dict__["__call__"]
+            _patched[cls] = call
+            setattr(cls, "__call__", _timed(call))
+
+
+def _restore():
+    """Put back the original `__call__` of every expression type."""
+    for cls, call in _patched.items():
+        setattr(cls, "__call__", call)
+    _patched.clear()
+
+
+def _timed(call: Callable) -> Callable:
+    """Wrap an expression's `__call__` to record its time."""
+
+    @functools.wraps(call)
+    def timed(self, *args, **kwargs):
+        profiler = _active
+        if profiler is None:
+            return call(self, *args, **kwargs)
+        start = profiler.clock()
+        try:
+            return call(self, *args, **kwargs)
+        finally:
+            profiler.record(self, profiler.clock() - start)
+
+    return timed
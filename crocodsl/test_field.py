@@ -43,3 +43,20 @@ class TestField(unittest.TestCase):
         assert expr5(User("b")) is True
         assert expr5(User("c")) is True
         assert expr5(User("d")) is False
+
+    def test_entity_fields(self):
+        """Test finding the fields an expression reads."""
+        expr = func.Hash(func.Concat("a", field.ID)) < 0.75
+        assert expr.entity_fields() == {("id",)}
+
+        expr2 = (field._Field("profile", "age") > 18).and_(
+            func.TimeSince(field._Field("created"), "days") < func.Len(field.ID)
+        )
+        assert expr2.entity_fields() == {("profile", "age"), ("created",), ("id",)}
+
+        assert func.Now().entity_fields() == frozenset()
+        assert (func.Now() == 1).entity_fields() == frozenset()
+
+        # Arbitrary callables could read anything.
+        expr3 = func.Eq(lambda e: e.id, "a")
+        assert expr3.entity_fields() is None
@@ -53,6 +53,7 @@ class TestFunc(unittest.TestCase):
         assert repr(func.In("a", ["a", "b", "c"])) == "'a' In ['a', 'b', 'c']"
         assert repr(func.Concat("a", "b", "c")) == "Concat('a', 'b', 'c')"
         assert repr(func.Hash("foo")) == "Hash('foo')"
+        assert repr(func.Now()) == "Now()"
         assert repr(func.Has([1, 2, 3], 1) == "1 In [1, 2, 3]")
         assert repr(func.Matches("Foo", r".*") == "'Foo' Matches '.*'")
 
@@ -0,0 +1,97 @@
+import unittest
+from datetime import UTC, datetime
+
+from .expr import parse
+from .func import Eq, Matches
+from .profiler import Profiler, active, label
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        # Every reading advances time, so every call takes some time.
+        self.t += 1.0
+        return self.t
+
+
+class TestProfiler(unittest.TestCase):
+    def test_profile(self):
+        expr = parse("($name Matches 'a+') And ($age Gt 10)")
+        original = Matches.__call__
+
+        with Profiler(clock=FakeClock()) as profiler:
+            assert active() is profiler
+            assert Matches.__call__ is not original
+            with label("f/r"):
+                assert expr({"name": "aaa", "age": 11})
+                assert not expr({"name": "b", "age": 11})
+            assert not expr({"name": "b", "age": 11})
+
+        # Types are only instrumented while profiling.
+        assert active() is None
+        assert Matches.__call__ is original
+
+        report = profiler.report()
+        totals = [row["total"] for row in report]
+        assert totals == sorted(totals, reverse=True)
+        rows = {(row["label"], row["node"]): row for row in report}
+        top = rows["f/r", repr(expr)]
+        assert top["calls"] == 2
+        # Node times include the nodes below them.
+        assert top["total"] > rows["f/r", "$name Matches 'a+'"]["total"]
+        assert rows["f/r", "$name"]["calls"] == 2
+        assert rows[None, "$name"]["calls"] == 1
+
+        assert profiler.report(limit=1) == report[:1]
+        text = profiler.format()
+        assert text.splitlines()[1].endswith(f"f/r / {expr!r}")
+
+        profiler.reset()
+        assert profiler.report() == []
+
+    def test_nested_nodes(self):
+        """Nodes created during evaluation are counted together."""
+        expr = parse("TimeSince($ts, 'days')")
+        ts = datetime(2022, 1, 1, tzinfo=UTC)
+        now = datetime(2022, 1, 2, tzinfo=UTC)
+        with Profiler() as profiler:
+            for _ in range(3):
+                assert expr({"ts": ts}, context={"now": lambda: now}) == 1.0
+
+        rows = {row["node"]: row["calls"] for row in profiler.report()}
+        assert rows == {"TimeSince($ts, 'days')": 3, "Now()": 3, "$ts": 3}
+
+    def test_tree_unchanged(self):
+        """Profiling doesn't modify the expression tree."""
+        expr = parse("($name Matches 'a+') And ($age Gt 10)")
+        nodes = [expr, expr.left, expr.right]
+        before = [dict(vars(node)) for node in nodes]
+        with Profiler() as profiler:
+            assert expr({"name": "aaa", "age": 11})
+        assert [vars(node) for node in nodes] == before
+        assert profiler.report()
+        assert not profiler._keys
+
+    def test_record(self):
+        """Evaluators can record their own timings."""
+        profiler = Profiler()
+        node = Eq(1, 1)
+        profiler.record(node, 0.5, label="compiled")
+        profiler.record(node, 1.5, label="compiled")
+        assert profiler.report() == [
+            {
+                "label": "compiled",
+                "node": "1 Eq 1",
+                "calls": 2,
+                "total": 2.0,
+                "mean": 1.0,
+                "max": 1.5,
+            }
+        ]
+
+    def test_one_at_a_time(self):
+        with Profiler():
+            with self.assertRaises(RuntimeError):
+                Profiler().start()